@@ -0,0 +1,33 @@
+"""add hnsw index on codechunk embedding
+
+Revision ID: a3c9d1e7b254
+Revises: 8e5e54930572
+Create Date: 2025-06-20 10:12:41.508233
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c9d1e7b254'
+down_revision = '8e5e54930572'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # cosine ops to match the `<=>` ordering used by app.utils.retrieval
+    op.create_index(
+        'ix_codechunk_embedding_hnsw',
+        'codechunk',
+        ['embedding'],
+        unique=False,
+        postgresql_using='hnsw',
+        postgresql_with={'m': 16, 'ef_construction': 64},
+        postgresql_ops={'embedding': 'vector_cosine_ops'},
+    )
+
+
+def downgrade():
+    op.drop_index('ix_codechunk_embedding_hnsw', table_name='codechunk', postgresql_using='hnsw')
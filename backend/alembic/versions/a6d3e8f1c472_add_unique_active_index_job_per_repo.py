@@ -0,0 +1,35 @@
+"""add unique active index job per repo
+
+Revision ID: a6d3e8f1c472
+Revises: b7e4c2a9f615
+Create Date: 2025-07-08 10:14:37.562194
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d3e8f1c472'
+down_revision = 'b7e4c2a9f615'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # duplicates enqueued by racing reindex requests: keep each repo's oldest
+    op.execute(
+        "UPDATE indexjob SET status = 'failed', locked_by = NULL, "
+        "last_error = 'duplicate of an earlier active job' "
+        "WHERE status IN ('queued', 'running') AND id NOT IN ("
+        "  SELECT min(id) FROM indexjob WHERE status IN ('queued', 'running') GROUP BY repo_id"
+        ")"
+    )
+    op.create_index(
+        'ix_indexjob_repo_id_active', 'indexjob', ['repo_id'],
+        unique=True, postgresql_where=sa.text("status IN ('queued', 'running')"),
+    )
+
+
+def downgrade():
+    op.drop_index('ix_indexjob_repo_id_active', table_name='indexjob')
@@ -0,0 +1,57 @@
+"""record embedding model per repo
+
+Revision ID: b7e4c2a9f615
+Revises: d9a4f6b3c821
+Create Date: 2025-07-04 11:26:53.817402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e4c2a9f615'
+down_revision = 'd9a4f6b3c821'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('repo', sa.Column('embedding_model', sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+    op.add_column('repo', sa.Column('embedding_dim', sa.Integer(), nullable=True))
+    # everything indexed so far used the OpenAI default
+    op.execute(
+        "UPDATE repo SET embedding_model = 'text-embedding-3-small', embedding_dim = 1536 "
+        "WHERE EXISTS (SELECT 1 FROM file WHERE file.repo_id = repo.id)"
+    )
+
+    # Vectors of any dimension share the columns; each dimension gets its own
+    # partial HNSW index, on the column cast to that dimension
+    op.drop_index('ix_codechunk_embedding_hnsw', table_name='codechunk', postgresql_using='hnsw')
+    op.alter_column('codechunk', 'embedding', existing_type=Vector(dim=1536), type_=Vector(), existing_nullable=True)
+    op.alter_column('cachedembedding', 'embedding', existing_type=Vector(dim=1536), type_=Vector(), existing_nullable=True)
+    op.execute(
+        "CREATE INDEX ix_codechunk_embedding_hnsw_1536 ON codechunk "
+        "USING hnsw ((embedding::vector(1536)) vector_cosine_ops) WITH (m = 16, ef_construction = 64) "
+        "WHERE vector_dims(embedding) = 1536"
+    )
+
+
+def downgrade():
+    # fails while chunks or cached embeddings of another dimension exist
+    op.execute("DROP INDEX IF EXISTS ix_codechunk_embedding_hnsw_1536")
+    op.alter_column('cachedembedding', 'embedding', existing_type=Vector(), type_=Vector(dim=1536), existing_nullable=True)
+    op.alter_column('codechunk', 'embedding', existing_type=Vector(), type_=Vector(dim=1536), existing_nullable=True)
+    op.create_index(
+        'ix_codechunk_embedding_hnsw',
+        'codechunk',
+        ['embedding'],
+        unique=False,
+        postgresql_using='hnsw',
+        postgresql_with={'m': 16, 'ef_construction': 64},
+        postgresql_ops={'embedding': 'vector_cosine_ops'},
+    )
+    op.drop_column('repo', 'embedding_dim')
+    op.drop_column('repo', 'embedding_model')
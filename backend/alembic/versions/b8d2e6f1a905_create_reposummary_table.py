@@ -0,0 +1,34 @@
+"""create reposummary table
+
+Revision ID: b8d2e6f1a905
+Revises: e5b3f9c04a17
+Create Date: 2025-06-26 11:12:40.518334
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d2e6f1a905'
+down_revision = 'e5b3f9c04a17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('reposummary',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('repo_id', sa.Integer(), nullable=False),
+    sa.Column('commit', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('summary', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['repo_id'], ['repo.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('repo_id', 'commit', name='uq_reposummary_repo_id_commit')
+    )
+
+
+def downgrade():
+    op.drop_table('reposummary')
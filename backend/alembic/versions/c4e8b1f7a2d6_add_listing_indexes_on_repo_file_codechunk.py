@@ -0,0 +1,41 @@
+"""add listing indexes on repo, file and codechunk
+
+Revision ID: c4e8b1f7a2d6
+Revises: f3a7c2d85e16
+Create Date: 2025-06-30 11:05:42.518930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e8b1f7a2d6'
+down_revision = 'f3a7c2d85e16'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # CONCURRENTLY so indexing workers can keep writing to file/codechunk meanwhile;
+    # it can't run inside a transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_repo_index_status_id', 'repo', ['index_status', 'id'],
+            unique=False, postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            'ix_file_repo_id_path', 'file', ['repo_id', sa.text('path COLLATE "C"')],
+            unique=False, postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            'ix_codechunk_file_id_start_line', 'codechunk', ['file_id', 'start_line'],
+            unique=False, postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_codechunk_file_id_start_line', table_name='codechunk', postgresql_concurrently=True)
+        op.drop_index('ix_file_repo_id_path', table_name='file', postgresql_concurrently=True)
+        op.drop_index('ix_repo_index_status_id', table_name='repo', postgresql_concurrently=True)
@@ -0,0 +1,27 @@
+"""add file blob_sha and repo indexed_commit
+
+Revision ID: c71f0b2d9e48
+Revises: a3c9d1e7b254
+Create Date: 2025-06-21 14:03:27.119402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = 'c71f0b2d9e48'
+down_revision = 'a3c9d1e7b254'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('repo', sa.Column('indexed_commit', sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+    op.add_column('file', sa.Column('blob_sha', sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('file', 'blob_sha')
+    op.drop_column('repo', 'indexed_commit')
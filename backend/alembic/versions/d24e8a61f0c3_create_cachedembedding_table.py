@@ -0,0 +1,32 @@
+"""create cachedembedding table
+
+Revision ID: d24e8a61f0c3
+Revises: c71f0b2d9e48
+Create Date: 2025-06-22 09:41:55.630187
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision = 'd24e8a61f0c3'
+down_revision = 'c71f0b2d9e48'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('cachedembedding',
+    sa.Column('content_hash', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('model', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('embedding', Vector(1536), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('content_hash')
+    )
+
+
+def downgrade():
+    op.drop_table('cachedembedding')
@@ -0,0 +1,41 @@
+"""create indexprogress table
+
+Revision ID: d9a4f6b3c821
+Revises: c4e8b1f7a2d6
+Create Date: 2025-07-02 09:41:17.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9a4f6b3c821'
+down_revision = 'c4e8b1f7a2d6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('indexprogress',
+    sa.Column('repo_id', sa.Integer(), nullable=False),
+    sa.Column('commit', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('phase', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('files_unchanged', sa.Integer(), nullable=False),
+    sa.Column('files_total', sa.Integer(), nullable=False),
+    sa.Column('files_done', sa.Integer(), nullable=False),
+    sa.Column('bytes_total', sa.BigInteger(), nullable=False),
+    sa.Column('bytes_done', sa.BigInteger(), nullable=False),
+    sa.Column('chunks_done', sa.Integer(), nullable=False),
+    sa.Column('resumed', sa.Boolean(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=False),
+    sa.Column('embed_started_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['repo_id'], ['repo.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('repo_id')
+    )
+
+
+def downgrade():
+    op.drop_table('indexprogress')
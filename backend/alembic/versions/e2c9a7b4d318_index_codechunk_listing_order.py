@@ -0,0 +1,40 @@
+"""index codechunk listing order
+
+Revision ID: e2c9a7b4d318
+Revises: a6d3e8f1c472
+Create Date: 2025-07-10 09:42:18.306415
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2c9a7b4d318'
+down_revision = 'a6d3e8f1c472'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # GET .../chunks orders and pages on (coalesce(start_line, 0), id), which
+    # an index on the bare start_line can't serve
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_codechunk_file_id_line_order', 'codechunk',
+            ['file_id', sa.text('coalesce(start_line, 0)'), 'id'],
+            unique=False, postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.drop_index(
+            'ix_codechunk_file_id_start_line', table_name='codechunk',
+            postgresql_concurrently=True, if_exists=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_codechunk_file_id_start_line', 'codechunk', ['file_id', 'start_line'],
+            unique=False, postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.drop_index('ix_codechunk_file_id_line_order', table_name='codechunk', postgresql_concurrently=True)
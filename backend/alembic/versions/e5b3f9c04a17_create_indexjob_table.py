@@ -0,0 +1,41 @@
+"""create indexjob table
+
+Revision ID: e5b3f9c04a17
+Revises: d24e8a61f0c3
+Create Date: 2025-06-24 16:27:08.902311
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b3f9c04a17'
+down_revision = 'd24e8a61f0c3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('indexjob',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('repo_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.Enum('queued', 'running', 'done', 'failed', name='jobstatus'), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('max_attempts', sa.Integer(), nullable=False),
+    sa.Column('locked_by', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['repo_id'], ['repo.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_indexjob_status_created_at', 'indexjob', ['status', 'created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_indexjob_status_created_at', table_name='indexjob')
+    op.drop_table('indexjob')
+    op.execute("DROP TYPE jobstatus")
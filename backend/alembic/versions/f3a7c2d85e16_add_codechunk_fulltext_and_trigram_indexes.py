@@ -0,0 +1,43 @@
+"""add codechunk full-text and trigram indexes
+
+Revision ID: f3a7c2d85e16
+Revises: b8d2e6f1a905
+Create Date: 2025-06-28 15:40:19.227061
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a7c2d85e16'
+down_revision = 'b8d2e6f1a905'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # 'simple' to match the to_tsquery('simple', ...) used by app.utils.retrieval
+    op.add_column('codechunk', sa.Column(
+        'content_tsv',
+        postgresql.TSVECTOR(),
+        sa.Computed("to_tsvector('simple', content)", persisted=True),
+        nullable=True,
+    ))
+    op.create_index('ix_codechunk_content_tsv', 'codechunk', ['content_tsv'], unique=False, postgresql_using='gin')
+    op.create_index(
+        'ix_codechunk_content_trgm',
+        'codechunk',
+        ['content'],
+        unique=False,
+        postgresql_using='gin',
+        postgresql_ops={'content': 'gin_trgm_ops'},
+    )
+
+
+def downgrade():
+    op.drop_index('ix_codechunk_content_trgm', table_name='codechunk', postgresql_using='gin')
+    op.drop_index('ix_codechunk_content_tsv', table_name='codechunk', postgresql_using='gin')
+    op.drop_column('codechunk', 'content_tsv')
@@ -1,19 +1,41 @@
 """
 Agent graph definitions for frzn-docs, using LangGraph and OpenAI.
 Handles summarization, metadata retrieval, context fetching,
-iterative research loops, and final aggregation for a given repo.
+iterative research loops, and final aggregation for one repo or a set of repos.
+Each question runs one of three graphs, picked by choose_plan (see
+app/utils/question_router.py for the plans).
+
+Importing this module creates no models or graphs: get_llm, get_router_llm
+and get_graph build them on first use, and warm_up builds them all ahead of
+the first chat (the API calls it on startup).
 """
 
-from typing import TypedDict, Optional, Annotated, List, Dict, Any
+import asyncio
+import difflib
+import functools
+import re
+import time
+import weakref
+from uuid import UUID
+from typing import TypedDict, Optional, Annotated, List, Dict, Any, AsyncIterator, Awaitable, Callable, Tuple
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 from langchain.chat_models import init_chat_model
-from langchain_openai import OpenAIEmbeddings
-from sqlmodel import Session, select
-from math import sqrt
+from sqlalchemy import true
+from sqlmodel import select
+from langchain_core.callbacks import BaseCallbackHandler
 from langchain_core.messages import BaseMessage
-from app.models import File, CodeChunk as CodeChunkModel
-from app.db import engine
+from langchain_core.outputs import LLMResult
+from app.models import File, Repo
+from app.core.config import settings
+from app.db import async_session
+from app.utils import metrics
+from app.utils.embedding_providers import default_model, get_provider
+from app.utils.prompts import fit_sections, pack_context, prompt_tokens
+from app.utils.question_router import PLANS, Mode, Plan, classify_question, parse_plan
+from app.utils.retrieval import RetrievedChunk, hybrid_search
+from app.utils.summaries import SUMMARY_PROMPT, cached_summary, save_summary, summary_source
+from app.utils.tokens import count_tokens
 
 # -----------------------------------------------------------------------------
 # State definition
@@ -22,17 +44,23 @@ class State(TypedDict):
     """
     The global state passed between LangGraph nodes.
     Fields:
-        - repo_id: GitHub repo identifier
+        - repo_ids: Ids of the repos the question is about (one or more)
+        - repo_names: Their full names, used to label merged results
+        - repo_models: The embedding model each repo was indexed with
         - messages: Conversation history for the LLM
-        - embedding: Current question embedding
-        - context: Retrieved code snippets for relevance
-        - summary: High-level repo overview
-        - metadata: File path list in the repo
+        - embeddings: Current question embedding under each of those models
+        - chunks: Retrieved code chunks, best first
+        - context: Retrieved code packed into the context token budget
+        - summary: High-level overview of each repo
+        - metadata: File path list of each repo
         - research_logic/file/arch: Outputs from each research scope
     """
-    repo_id: int
+    repo_ids: List[int]
+    repo_names: Optional[Dict[int, str]]
+    repo_models: Optional[Dict[int, str]]
     messages: Annotated[List[BaseMessage], add_messages]
-    embedding: List[float]
+    embeddings: Dict[str, List[float]]
+    chunks: Optional[List[RetrievedChunk]]
     context: Optional[str]
     summary: Optional[str]
     metadata: Optional[List[str]]
@@ -43,11 +71,72 @@ class State(TypedDict):
 # -----------------------------------------------------------------------------
 # Model initialization
 # -----------------------------------------------------------------------------
-embeddings_model = OpenAIEmbeddings(model="text-embedding-3-small")
-llm = init_chat_model("openai:gpt-4.1", temperature=0.5, max_tokens=1000)
+class LLMMetrics(BaseCallbackHandler):
+    """
+    Records latency, token usage and cost of every chat model call, labelled
+    with the graph node that made it.
+    """
+    run_inline = True
+
+    def __init__(self):
+        self._started: Dict[UUID, Tuple[float, str, str]] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, metadata=None, **kwargs) -> None:
+        metadata = metadata or {}
+        self._started[run_id] = (
+            time.perf_counter(),
+            metadata.get("langgraph_node", "other"),
+            metadata.get("ls_model_name") or settings.CHAT_MODEL,
+        )
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs) -> None:
+        started = self._started.pop(run_id, None)
+        if started is None:
+            return
+        start, node, model = started
+        usage: Dict[str, int] = {}
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or usage
+        metrics.record_llm(
+            node, model, time.perf_counter() - start, "ok",
+            usage.get("input_tokens", 0), usage.get("output_tokens", 0),
+        )
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        started = self._started.pop(run_id, None)
+        if started is None:
+            return
+        start, node, model = started
+        outcome = "cancelled" if isinstance(error, asyncio.CancelledError) else "error"
+        metrics.record_llm(node, model, time.perf_counter() - start, outcome)
+
+# Callbacks are given to the models themselves: bound with with_config they
+# replace the ones LangGraph passes at run time, which stream the answer.
+callbacks = [LLMMetrics()] if metrics.enabled else None
+
+@functools.lru_cache(maxsize=None)
+def get_llm():
+    """
+    The agent's chat model, created on first use.
+    """
+    # stream_usage reports token usage on the last streamed chunk of every call
+    return init_chat_model(
+        f"openai:{settings.CHAT_MODEL}", temperature=0.5, max_tokens=1000, stream_usage=True, callbacks=callbacks
+    )
+
+@functools.lru_cache(maxsize=None)
+def get_router_llm():
+    """
+    The model asked for the plan of questions the routing rules can't place
+    (it answers with one word), or None without a ROUTER_MODEL.
+    """
+    if not settings.ROUTER_MODEL:
+        return None
+    return init_chat_model(f"openai:{settings.ROUTER_MODEL}", temperature=0, max_tokens=5, callbacks=callbacks)
 
 # -----------------------------------------------------------------------------
-# Utility function
+# Utility functions
 # -----------------------------------------------------------------------------
 def extract_text_from_message(msg: BaseMessage) -> str:
     """
@@ -60,114 +149,339 @@ def extract_text_from_message(msg: BaseMessage) -> str:
         return content
     return ""  # Fallback if content is unexpected
 
+def state_repo_ids(state: State) -> List[int]:
+    return [int(repo_id) for repo_id in state["repo_ids"]]
+
+def repo_label(state: State, repo_id: int) -> str:
+    return (state.get("repo_names") or {}).get(repo_id) or f"repo {repo_id}"
+
+def repo_models(state: State) -> Dict[int, str]:
+    """
+    Each repo's embedding model; repos not yet indexed get the default one.
+    """
+    models = state.get("repo_models") or {}
+    return {repo_id: models.get(repo_id) or default_model() for repo_id in state_repo_ids(state)}
+
+def node_timeout(name: str) -> float:
+    return settings.AGENT_NODE_TIMEOUTS.get(name, settings.AGENT_NODE_TIMEOUT)
+
+def with_timeout(name: str, fallback: Optional[Dict[str, Any]] = None):
+    """
+    Bounds an async node by its configured timeout and records its duration.
+    Nodes with a fallback degrade to it on timeout; the rest fail the request.
+    """
+    def decorate(fn: Callable[[State], Awaitable[Dict[str, Any]]]):
+        @functools.wraps(fn)
+        async def node(state: State) -> Dict[str, Any]:
+            with metrics.timer(metrics.NODE_SECONDS, node=name) as timer:
+                try:
+                    return await asyncio.wait_for(fn(state), node_timeout(name))
+                except asyncio.TimeoutError:
+                    if fallback is None:
+                        raise
+                    timer.outcome = "timeout"
+                    metrics.log(f"Agent node {name} timed out after {node_timeout(name)}s, continuing without it")
+                    return fallback
+        return node
+    return decorate
+
 # -----------------------------------------------------------------------------
-# Summarization section
+# Routing section
 # -----------------------------------------------------------------------------
-def summarize_repo_node(state: State) -> Dict[str, Any]:
+ROUTER_PROMPT = """Classify a question about a code repository by the work needed to answer it.
+Reply with one word:
+summary - what the repository as a whole is, does or is for
+direct - a fact found in one or two places in the code: where something is defined, what a setting, function or file is
+full - reasoning across the code: how or why something works, design, behaviour, comparisons, debugging
+
+Question: {question}"""
+
+async def ask_router(question: str) -> Optional[Plan]:
     """
-    Generates a 2–3 paragraph overview of the repo using the top 10 code chunks.
+    The plan ROUTER_MODEL picks for `question`; None when it times out, fails
+    or names no plan.
     """
-    with Session(engine) as sess:
-        stmt = (
-            select(CodeChunkModel)
-            .join(CodeChunkModel.file)           # Ensure chunks belong to this repo
-            .where(File.repo_id == state["repo_id"])
-            .limit(10)
+    prompt = ROUTER_PROMPT.format(question=question)
+    prompt_tokens.record("route", count_tokens(prompt))
+    try:
+        resp = await asyncio.wait_for(
+            get_router_llm().ainvoke(
+                [{"role": "user", "content": prompt}],
+                config={"metadata": {"langgraph_node": "route"}},
+            ),
+            settings.ROUTER_TIMEOUT,
         )
-        chunks = sess.exec(stmt).all()
-    snippet = "\n".join(c.content for c in chunks)
-    prompt = "Provide a concise 2–3 paragraph overview of this codebase:\n" + snippet
-    resp = llm.invoke([{"role": "user", "content": prompt}])
-    return {"summary": extract_text_from_message(resp)}
+    except asyncio.TimeoutError:
+        metrics.log(f"Router model timed out after {settings.ROUTER_TIMEOUT}s, using the full plan")
+        return None
+    except Exception as exc:
+        metrics.log(f"Router model failed ({exc!r}), using the full plan")
+        return None
+    return parse_plan(extract_text_from_message(resp))
+
+async def choose_plan(question: str, mode: Mode = "auto") -> Plan:
+    """
+    The plan a chat runs: the one the client forced with `mode`, else the
+    routing rules' pick, else ROUTER_MODEL's, else full.
+    """
+    if mode != "auto":
+        plan, by = mode, "client"
+    elif (plan := classify_question(question)) is not None:
+        by = "rules"
+    elif get_router_llm() is not None and question.strip() and (plan := await ask_router(question)) is not None:
+        by = "model"
+    else:
+        plan, by = "full", "default"
+    metrics.CHAT_PLANS.inc(plan=plan, by=by)
+    return plan
+
+# -----------------------------------------------------------------------------
+# Summarization section
+# -----------------------------------------------------------------------------
+async def load_summary(repo_id: int):
+    async with async_session() as sess:
+        return await sess.run_sync(cached_summary, repo_id)
+
+async def load_summary_source(repo_id: int) -> str:
+    async with async_session() as sess:
+        return await sess.run_sync(summary_source, repo_id)
+
+async def store_summary(repo_id: int, commit: str, summary: str) -> None:
+    async with async_session() as sess:
+        await sess.run_sync(save_summary, repo_id, commit, summary)
+
+async def generate_summary(repo_id: int, commit: Optional[str] = None) -> Optional[str]:
+    """
+    Writes a repo overview with the LLM, storing it for `commit` when given.
+    Returns None, without calling the LLM, if the repo has no indexed source.
+    """
+    source = await load_summary_source(repo_id)
+    if not source:
+        return None
+    prompt = SUMMARY_PROMPT + source
+    prompt_tokens.record("summarize_repo", count_tokens(prompt))
+    resp = await get_llm().ainvoke([{"role": "user", "content": prompt}])
+    summary = extract_text_from_message(resp)
+    if commit:
+        await store_summary(repo_id, commit, summary)
+    return summary
+
+# (repo id, commit) -> lock held while its summary is generated; entries go
+# once no chat holds or waits on them
+_summary_locks: "weakref.WeakValueDictionary[Tuple[int, str], asyncio.Lock]" = weakref.WeakValueDictionary()
+
+async def repo_summary(repo_id: int) -> Optional[str]:
+    """
+    Serves the repo overview written at index time for the indexed commit.
+    Repos indexed before summaries were stored get one generated, once:
+    concurrent chats on the same commit wait for the first one's summary.
+    """
+    commit, summary = await load_summary(repo_id)
+    if summary is not None or commit is None:
+        return summary
+    lock = _summary_locks.setdefault((repo_id, commit), asyncio.Lock())
+    async with lock:
+        commit, summary = await load_summary(repo_id)
+        if summary is None and commit is not None:
+            summary = await generate_summary(repo_id, commit)
+    return summary
+
+@with_timeout("summarize_repo", fallback={"summary": None})
+async def summarize_repo_node(state: State) -> Dict[str, Any]:
+    """
+    The overview of each repo, labelled with its name when there are several.
+    """
+    repo_ids = state_repo_ids(state)
+    summaries = await asyncio.gather(*(repo_summary(repo_id) for repo_id in repo_ids))
+    if len(repo_ids) == 1:
+        return {"summary": summaries[0]}
+    parts = [f"{repo_label(state, repo_id)}:\n{summary}" for repo_id, summary in zip(repo_ids, summaries) if summary]
+    return {"summary": "\n\n".join(parts) or None}
 
 # -----------------------------------------------------------------------------
 # Metadata retrieval section
 # -----------------------------------------------------------------------------
-def fetch_metadata_node(state: State) -> Dict[str, Any]:
+# aggregate_node lists this many paths of each repo
+METADATA_FILES = 10
+
+
+async def load_file_paths(repo_ids: List[int], limit: int = METADATA_FILES) -> Dict[int, List[str]]:
     """
-    Retrieves file paths in the repo for reference in final output.
+    The first `limit` paths of each repo, in one query.
     """
-    with Session(engine) as sess:
-        stmt = select(File).where(File.repo_id == state["repo_id"])
-        files = sess.exec(stmt).all()
-    paths = [f.path for f in files]
-    return {"metadata": paths}
+    async with async_session() as sess:
+        # only the path column, read in index order (ix_file_repo_id_path), per repo
+        paths = (
+            select(File.path)
+            .where(File.repo_id == Repo.id)
+            .order_by(File.path.collate("C"))
+            .limit(limit)
+            .lateral()
+        )
+        stmt = select(Repo.id, paths.c.path).join(paths, true()).where(Repo.id.in_(repo_ids))
+        by_repo: Dict[int, List[str]] = {repo_id: [] for repo_id in repo_ids}
+        for repo_id, path in (await sess.exec(stmt)).all():
+            by_repo[repo_id].append(path)
+        return by_repo
+
+
+@with_timeout("fetch_metadata", fallback={"metadata": None})
+async def fetch_metadata_node(state: State) -> Dict[str, Any]:
+    """
+    Retrieves the first file paths of each repo for reference in final output,
+    prefixed with the repo's name when there are several.
+    """
+    repo_ids = state_repo_ids(state)
+    by_repo = await load_file_paths(repo_ids)
+    if len(repo_ids) == 1:
+        return {"metadata": by_repo[repo_ids[0]]}
+    return {"metadata": [
+        f"{repo_label(state, repo_id)}/{path}" for repo_id in repo_ids for path in by_repo[repo_id]
+    ]}
 
 # -----------------------------------------------------------------------------
 # Embedding section
 # -----------------------------------------------------------------------------
-def embed_node(state: State) -> Dict[str, Any]:
+async def embed_question(text: str, model: Optional[str] = None) -> List[float]:
+    """
+    Embeds a question with a repo's embedding model (by default, the one new
+    index runs use), recording the request's latency and tokens.
+    """
+    provider = get_provider(model)
+    with metrics.timer(metrics.EMBEDDING_SECONDS, caller="chat"):
+        emb = (await provider.aembed([text]))[0]
+    if metrics.enabled:
+        metrics.record_embedding_tokens("chat", count_tokens(text), provider.name)
+    return emb
+
+@with_timeout("embed")
+async def embed_node(state: State) -> Dict[str, Any]:
     """
-    Embeds the user’s latest question to drive similarity search.
+    Embeds the user’s latest question with each embedding model among the
+    repos, to drive similarity search, skipping any the caller already did
+    (the chat router embeds it for its answer cache).
     """
-    last_msg = state["messages"][-1]
-    text = extract_text_from_message(last_msg)
-    emb = embeddings_model.embed_query(text)
-    return {"embedding": emb}
+    embeddings = dict(state.get("embeddings") or {})
+    missing = sorted(set(repo_models(state).values()) - set(embeddings))
+    if missing:
+        text = extract_text_from_message(state["messages"][-1])
+        vectors = await asyncio.gather(*(embed_question(text, model) for model in missing))
+        embeddings.update(zip(missing, vectors))
+    return {"embeddings": embeddings}
 
 # -----------------------------------------------------------------------------
 # Context fetching section
 # -----------------------------------------------------------------------------
-def fetch_context_node(state: State) -> Dict[str, Any]:
+@with_timeout("fetch_context")
+async def fetch_context_node(state: State) -> Dict[str, Any]:
     """
-    Retrieves and ranks code chunks by similarity, storing the top 3 in context.
+    Retrieves the top k chunks for the question, fusing vector similarity with
+    keyword matches so exact identifiers, paths and error strings are found.
+    Several repos are searched together; their chunks' paths are prefixed with
+    the repo's name.
     """
-    with Session(engine) as sess:
-        stmt = (
-            select(CodeChunkModel)
-            .join(CodeChunkModel.file)
-            .where(File.repo_id == state["repo_id"])
-        )
-        chunks = sess.exec(stmt).all()
-
-    texts = [c.content for c in chunks]
-    embs = embeddings_model.embed_documents(texts)
+    question = extract_text_from_message(state["messages"][-1])
+    repo_ids = state_repo_ids(state)
+    by_model: Dict[str, List[int]] = {}
+    for repo_id, model in repo_models(state).items():
+        by_model.setdefault(model, []).append(repo_id)
+    groups = [(ids, state["embeddings"][model]) for model, ids in by_model.items()]
+    chunks = await hybrid_search(repo_ids, groups[0][1] if len(groups) == 1 else groups, question)
+    if len(repo_ids) > 1:
+        chunks = [chunk._replace(path=f"{repo_label(state, chunk.repo_id)}/{chunk.path}") for chunk in chunks]
+    return {"chunks": chunks}
 
-    def cosine(a: List[float], b: List[float]) -> float:
-        dot = sum(x * y for x, y in zip(a, b))
-        na = sqrt(sum(x * x for x in a))
-        nb = sqrt(sum(y * y for y in b))
-        return dot / (na * nb) if na and nb else 0
-
-    # Pick top 3 most similar chunks
-    top_idx = sorted(
-        range(len(texts)),
-        key=lambda i: cosine(state["embedding"], embs[i]),
-        reverse=True
-    )[:3]
-
-    return {"context": "\n".join(texts[i] for i in top_idx)}
+@with_timeout("assemble_context")
+async def assemble_context_node(state: State) -> Dict[str, Any]:
+    """
+    Packs the retrieved chunks, best first, into the context token budget,
+    merging adjacent or overlapping chunks of a file and dropping duplicates.
+    """
+    return {"context": pack_context(state.get("chunks") or [], settings.CONTEXT_MAX_TOKENS)}
 
 # -----------------------------------------------------------------------------
 # Research loops section
 # -----------------------------------------------------------------------------
-def research_loop(state: State, scope: str) -> Dict[str, Any]:
+# research prompts ask for this as the last line of every answer
+CONFIDENCE_RE = re.compile(r"\n?[ \t*_]*CONFIDENCE:[ \t*_]*(high|medium|low)\W*$", re.IGNORECASE)
+
+def research_prompt(scope: str, context: str, question: str, previous: str = "") -> str:
+    """
+    Builds a research prompt within RESEARCH_PROMPT_MAX_TOKENS. The previous
+    answer follows the context, so a refinement pass sees what it wrote.
+    """
+    template = (
+        f"Research in the {scope} scope.\nContext:\n{{}}\n{{}}\nQuestion:\n{{}}\n"
+        "End with a line CONFIDENCE: high, medium or low: high only if the context "
+        "fully answers the question for this scope."
+    )
+    budget = settings.RESEARCH_PROMPT_MAX_TOKENS - count_tokens(template.format("", "", ""))
+    context, previous, question = fit_sections([context, previous, question], budget)
+    return template.format(context, previous, question)
+
+def split_confidence(text: str) -> Tuple[str, Optional[str]]:
     """
-    Runs up to two iterations of prompting on precomputed context,
-    refining until the output stabilizes.
+    A research answer without its CONFIDENCE line, and the level it gave.
+    """
+    match = CONFIDENCE_RE.search(text)
+    if match is None:
+        return text, None
+    return text[:match.start()].rstrip(), match.group(1).lower()
+
+def similarity(a: str, b: str) -> float:
+    """
+    How much of two answers' word sequences match, from 0 to 1.
+    """
+    return difflib.SequenceMatcher(None, a.split(), b.split(), autojunk=False).ratio()
+
+async def research_loop(state: State, scope: str) -> Dict[str, Any]:
+    """
+    Prompts on precomputed context up to RESEARCH_MAX_PASSES times, each pass
+    refining the previous answer. Stops once a pass reports high confidence,
+    its answer is within RESEARCH_CONVERGENCE of the previous one, or there is
+    no context to refine against.
     """
     context = state.get("context", "") or ""
+    question = extract_text_from_message(state["messages"][-1])
     answer = ""
-    for _ in range(2):
-        prompt = (
-            f"Research in the {scope} scope.\n"
-            f"Context:\n{context}\n"
-            f"Question:\n{extract_text_from_message(state['messages'][-1])}"
-        )
-        resp = llm.invoke([{"role": "user", "content": prompt}])
-        text_resp = extract_text_from_message(resp)
-        if text_resp.strip() == answer.strip():
-            break  # Stop if no change
-        answer = text_resp
-        context += "\n" + answer    # Expand context with new insight
+    stop = "limit"
+    for n in range(max(1, settings.RESEARCH_MAX_PASSES)):
+        prompt = research_prompt(scope, context, question, answer)
+        prompt_tokens.record(f"research_{scope}", count_tokens(prompt))
+        resp = await get_llm().ainvoke([{"role": "user", "content": prompt}])
+        text_resp, confidence = split_confidence(extract_text_from_message(resp))
+        converged = n > 0 and similarity(answer, text_resp) >= settings.RESEARCH_CONVERGENCE
+        answer = text_resp    # Refine with the new insight next pass
+        if confidence == "high":
+            stop = "confident"
+        elif converged:
+            stop = "converged"
+        elif not context.strip():
+            stop = "no_context"
+        else:
+            continue
+        break
+    metrics.RESEARCH_LOOPS.inc(scope=scope, stop=stop)
     return {f"research_{scope}": answer}
 
+def research_node(scope: str):
+    """
+    Builds the graph node for one research scope. The three scopes run concurrently.
+    """
+    @with_timeout(f"research_{scope}", fallback={f"research_{scope}": None})
+    async def node(state: State) -> Dict[str, Any]:
+        return await research_loop(state, scope)
+    return node
+
 # -----------------------------------------------------------------------------
 # Aggregation section
 # -----------------------------------------------------------------------------
-def aggregate_node(state: State) -> Dict[str, List[BaseMessage]]:
+@with_timeout("aggregate")
+async def aggregate_node(state: State) -> Dict[str, List[BaseMessage]]:
     """
-    Combines summary, metadata, and all research insights into one final answer.
+    Combines summary, metadata, and all research insights into one final answer,
+    within AGGREGATE_PROMPT_MAX_TOKENS. Without research (the direct plan, or
+    every loop timed out) it answers from the retrieved code itself.
     """
     user_q = extract_text_from_message(state["messages"][-1])
     parts: List[str] = []
@@ -175,42 +489,102 @@ def aggregate_node(state: State) -> Dict[str, List[BaseMessage]]:
     if state.get("summary"):
         parts.append("Overview:\n" + state["summary"])
     if state.get("metadata"):
-        parts.append("Files:\n" + ", ".join(state["metadata"][:10]) + " ...")
+        parts.append("Files:\n" + ", ".join(state["metadata"]) + " ...")
 
+    research = False
     for scope in ("logic", "file", "arch"):
         key = f"research_{scope}"
         if state.get(key):
             parts.append(f"{scope.capitalize()} Research:\n{state[key]}")
+            research = True
+    if not research and state.get("context"):
+        parts.append("Code:\n" + state["context"])
 
-    parts.append(f"Answer to '{user_q}':")
-    combined = "\n\n".join(parts)
-    resp = llm.invoke([{"role": "user", "content": combined}])
+    question = f"Answer to '{user_q}':"
+    separators = count_tokens("\n\n") * len(parts)
+    *parts, question = fit_sections(parts + [question], settings.AGGREGATE_PROMPT_MAX_TOKENS - separators)
+    combined = "\n\n".join(parts + [question])
+    prompt_tokens.record("aggregate", count_tokens(combined))
+    resp = await get_llm().ainvoke([{"role": "user", "content": combined}])
     return {"messages": [resp]}
 
 # -----------------------------------------------------------------------------
 # Graph construction section
 # -----------------------------------------------------------------------------
-builder = StateGraph(State)
-builder.add_node("summarize_repo", summarize_repo_node)
-builder.add_node("fetch_metadata", fetch_metadata_node)
-builder.add_node("embed", embed_node)
-builder.add_node("fetch_context", fetch_context_node)
-builder.add_node("research_logic_node", lambda s: research_loop(s, "logic"))
-builder.add_node("research_file_node", lambda s: research_loop(s, "file"))
-builder.add_node("research_arch_node", lambda s: research_loop(s, "arch"))
-builder.add_node("aggregate", aggregate_node)
-
-builder.add_edge(START, "summarize_repo")
-builder.add_edge(START, "fetch_metadata")
-builder.add_edge("summarize_repo", "embed")
-builder.add_edge("fetch_metadata", "embed")
-builder.add_edge("embed", "fetch_context")
-builder.add_edge("fetch_context", "research_logic_node")
-builder.add_edge("fetch_context", "research_file_node")
-builder.add_edge("fetch_context", "research_arch_node")
-builder.add_edge("research_logic_node", "aggregate")
-builder.add_edge("research_file_node", "aggregate")
-builder.add_edge("research_arch_node", "aggregate")
-builder.add_edge("aggregate", END)
-
-graph = builder.compile()
\ No newline at end of file
+@functools.lru_cache(maxsize=None)
+def get_graph(plan: Plan):
+    """
+    The compiled graph of one plan, built on first use. Each plan is compiled
+    separately, since a join edge into aggregate waits for every one of its sources.
+    """
+    builder = StateGraph(State)
+    builder.add_node("summarize_repo", summarize_repo_node)
+    builder.add_node("fetch_metadata", fetch_metadata_node)
+    builder.add_node("aggregate", aggregate_node)
+    builder.add_edge(START, "fetch_metadata")
+    builder.add_edge("aggregate", END)
+
+    if plan == "summary":
+        builder.add_edge(START, "summarize_repo")
+        builder.add_edge(["summarize_repo", "fetch_metadata"], "aggregate")
+        return builder.compile()
+
+    builder.add_node("embed", embed_node)
+    builder.add_node("fetch_context", fetch_context_node)
+    builder.add_node("assemble_context", assemble_context_node)
+    # LangGraph runs in supersteps and waits for every node of a step, so the repo
+    # summary (only needed by aggregate, and an LLM call when it isn't stored yet)
+    # runs beside the research loops instead of holding up embedding.
+    # fetch_metadata is a quick query and runs beside embed.
+    builder.add_edge(START, "embed")
+    builder.add_edge("embed", "fetch_context")
+    builder.add_edge("fetch_context", "assemble_context")
+    builder.add_edge("assemble_context", "summarize_repo")
+    sources = ["summarize_repo", "fetch_metadata"]
+    if plan == "full":
+        for scope in ("logic", "file", "arch"):
+            builder.add_node(f"research_{scope}_node", research_node(scope))
+            builder.add_edge("assemble_context", f"research_{scope}_node")
+            sources.append(f"research_{scope}_node")
+    builder.add_edge(sources, "aggregate")
+    return builder.compile()
+
+def warm_up() -> None:
+    """
+    Builds everything a chat uses on first touch: the chat models, each plan's
+    graph, the tokenizer and the default embedding provider (loading a local
+    model).
+    """
+    get_llm()
+    get_router_llm()
+    for plan in PLANS:
+        get_graph(plan)
+    count_tokens("warm up")
+    get_provider(default_model())
+
+# -----------------------------------------------------------------------------
+# Streaming
+# -----------------------------------------------------------------------------
+async def stream_answer(
+    state: Dict[str, Any], usage: Optional[Dict[str, int]] = None, plan: Plan = "full"
+) -> AsyncIterator[str]:
+    """
+    Runs the plan's graph and yields the text tokens of the final answer as they arrive.
+    Token usage of every LLM call in the graph is added up into `usage`.
+    Closing the iterator early (e.g. when the client disconnects) cancels the
+    nodes still running.
+    """
+    stream = get_graph(plan).astream(state, stream_mode="messages")
+    try:
+        async for token, metadata in stream:
+            token_usage = getattr(token, "usage_metadata", None)
+            if usage is not None and token_usage:
+                for key in ("input_tokens", "output_tokens", "total_tokens"):
+                    usage[key] = usage.get(key, 0) + token_usage.get(key, 0)
+            if metadata.get("langgraph_node") != "aggregate":
+                continue
+            text = getattr(token, "content", "") or ""
+            if text:
+                yield text
+    finally:
+        await stream.aclose()
\ No newline at end of file
@@ -1,37 +1,166 @@
 # backend/app/api/routers/chat.py
 
+import asyncio
+import functools
 import json
-from fastapi import APIRouter, Request
+import time
+from typing import List, Optional, Tuple
+from fastapi import APIRouter, HTTPException, Query, Request, status
 from fastapi.responses import StreamingResponse
-from app.agents.agent import graph
+from sqlalchemy import or_
+from sqlmodel import select
+from app.core.config import settings
+from app.db import async_session
+from app.models import Repo
+from app.utils.embedding_providers import default_model
+from app.utils import metrics
+from app.utils.answer_cache import answer_cache, message_text
+from app.utils.prompts import prompt_tokens
+from app.utils.question_router import Mode
 
 router = APIRouter()
 
+FINISH = 'd:{"finishReason":"stop","usage":{}}\n'
+
+RepoRow = Tuple[int, str, Optional[str], Optional[str]]
+
+async def load_repos(repo_ids: List[int], full_names: List[str]) -> List[RepoRow]:
+    """
+    (id, full_name, indexed_commit, embedding_model) rows of the repos with
+    the given ids or names, by id.
+    """
+    async with async_session() as sess:
+        stmt = (
+            select(Repo.id, Repo.full_name, Repo.indexed_commit, Repo.embedding_model)
+            .where(or_(Repo.id.in_(repo_ids), Repo.full_name.in_(full_names)))
+            .order_by(Repo.id)
+        )
+        return list((await sess.exec(stmt)).all())
+
+async def resolve_repos(repo_ids: List[int], group: Optional[str]) -> List[RepoRow]:
+    """
+    The repos a chat covers: the given ids plus the members of a REPO_GROUPS group.
+    """
+    full_names: List[str] = []
+    if group is not None:
+        if group not in settings.REPO_GROUPS:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Repo group {group} not found")
+        full_names = settings.REPO_GROUPS[group]
+    if not repo_ids and not full_names:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Pass repoId, repoIds or group")
+
+    repos = await load_repos(repo_ids, full_names)
+    missing = set(repo_ids) - {repo.id for repo in repos}
+    missing_names = set(full_names) - {repo.full_name for repo in repos}
+    if missing or missing_names:
+        found = ", ".join([str(r) for r in sorted(missing)] + sorted(missing_names))
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Repos not found: {found}")
+    if len(repos) > settings.CHAT_MAX_REPOS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A chat can cover at most {settings.CHAT_MAX_REPOS} repos",
+        )
+    return repos
+
 @router.post("/chat")
 async def chat(
-    repoId: str,
     request: Request,
+    repoId: Optional[int] = None,
+    repoIds: List[int] = Query([]),
+    group: Optional[str] = None,
+    mode: Mode = "auto",
 ):
+    """
+    Streams an answer about one repo (`repoId`), or one answer drawn from
+    several: `repoIds` (repeated) and/or the repos of a REPO_GROUPS `group`.
+    `mode` forces an execution plan (summary, direct or full) instead of
+    routing the question; the plan run is returned in X-Chat-Plan.
+    """
+    # Imported here so the API only loads LangChain and LangGraph once it chats
+    # (on startup, through the warm-up, unless CHAT_WARM_UP is off)
+    from app.agents.agent import choose_plan, embed_question, stream_answer
+
+    started = time.perf_counter()
+    repos = await resolve_repos(([repoId] if repoId is not None else []) + repoIds, group)
     payload = await request.json()
     messages = payload.get("messages", [])
     state = {
-        "repo_id": repoId,
+        "repo_ids": [repo.id for repo in repos],
+        "repo_names": {repo.id: repo.full_name for repo in repos},
+        "repo_models": {repo.id: repo.embedding_model for repo in repos if repo.embedding_model},
         "messages": messages,
     }
 
-    def data_stream():
-        for token, metadata in graph.stream(state, stream_mode="messages"):
-            if metadata.get("langgraph_node") != "aggregate":
-                continue
+    # Answers are cached per indexed commit of every repo, so only chats
+    # whose repos are all indexed are cached. Questions are compared under the
+    # first repo's embedding model, which the agent then reuses. Answers of a
+    # forced plan are kept apart from routed ones in a scope of their own, as a
+    # scope only keeps entries of one commit.
+    question = message_text(messages[-1]) if messages else ""
+    scope = ",".join(str(repo.id) for repo in repos)
+    if mode != "auto":
+        scope = f"{scope}/{mode}"
+    commits = [repo.indexed_commit for repo in repos]
+    model = repos[0].embedding_model or default_model()
+    commit = f"{','.join(commits)}@{model}" if answer_cache.enabled and question and all(commits) else None
+    if commit:
+        cached, embedding = await answer_cache.lookup(
+            scope, commit, question, functools.partial(embed_question, model=model)
+        )
+        if cached is not None:
+            metrics.CHAT_SECONDS.observe(time.perf_counter() - started, outcome="cache_hit")
+            async def replay():
+                yield f'0:{json.dumps(cached.answer)}\n'
+                yield FINISH
+
+            return StreamingResponse(
+                replay(),
+                media_type="text/plain; charset=utf-8",
+                headers={"X-Chat-Plan": cached.plan or "full", "X-Chat-Cache": "hit"},
+            )
+        state["embeddings"] = {model: embedding}
+    plan = await choose_plan(question, mode)
 
-            text = getattr(token, "content", "") or ""
-            if not text:
-                continue
-            yield f'0:{json.dumps(text)}\n'
+    async def data_stream():
+        # Starlette cancels this generator when the client disconnects; closing
+        # the answer stream then cancels the graph's in-flight LLM calls.
+        usage = {}
+        parts = []
+        outcome = "error"
+        answer = stream_answer(state, usage, plan)
+        try:
+            async for text in answer:
+                parts.append(text)
+                yield f'0:{json.dumps(text)}\n'
+            outcome = "answered"
+        except (asyncio.CancelledError, GeneratorExit):
+            outcome = "disconnected"
+            raise
+        finally:
+            await answer.aclose()
+            metrics.CHAT_SECONDS.observe(time.perf_counter() - started, outcome=outcome)
 
-        yield 'd:{"finishReason":"stop","usage":{}}\n'
+        # only reached when the answer completed
+        if commit:
+            answer_cache.put(scope, commit, question, embedding, "".join(parts), usage.get("total_tokens", 0), plan)
+        yield FINISH
 
     return StreamingResponse(
         data_stream(),
         media_type="text/plain; charset=utf-8",
-    )
\ No newline at end of file
+        headers={"X-Chat-Plan": plan},
+    )
+
+@router.get("/chat/cache")
+def chat_cache_stats():
+    """
+    Hit rate of the answer cache and the LLM tokens it has saved.
+    """
+    return answer_cache.stats()
+
+@router.get("/chat/prompt-tokens")
+def chat_prompt_tokens():
+    """
+    Histograms of prompt sizes per agent node, in tokens.
+    """
+    return prompt_tokens.stats()
@@ -0,0 +1,15 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from app.utils import metrics
+
+router = APIRouter()
+
+@router.get("/metrics", tags=["health"], response_class=PlainTextResponse)
+def prometheus_metrics():
+    """
+    Agent, OpenAI and request metrics of this process, in the Prometheus text format.
+    """
+    if not metrics.enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
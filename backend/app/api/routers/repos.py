@@ -1,21 +1,53 @@
 # backend/app/api/routers/repos.py
 
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
-from sqlmodel import Session, select
+import asyncio
+import json
+from typing import Any, Callable, List, Optional, Sequence, Tuple
 
-from app.db import get_session
-from app.models import Repo
-from app.schemas.repo import CreateRepo, ReadRepo
-from app.scripts.indexer import index_repo
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, literal, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.db import async_session, get_session
+from app.models import Repo, IndexProgress, IndexStatus, File, CodeChunk
+from app.schemas.file import ReadChunk, ReadFile
+from app.schemas.repo import CreateRepo, ReadIndexProgress, ReadRepo
+from app.utils.index_progress import describe
+from app.utils.job_queue import active_job, enqueue_index_job
+from app.utils.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
 
 router = APIRouter(tags=["repos"])
 
+PageSize = Query(settings.LIST_PAGE_SIZE, ge=1, le=settings.LIST_MAX_PAGE_SIZE)
+
+def _after(cursor: Optional[str], types: Sequence[type]) -> Optional[Tuple[Any, ...]]:
+    if cursor is None:
+        return None
+    try:
+        return decode_cursor(cursor, types)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+def _page(response: Response, rows: List[Any], limit: int, key: Callable[[Any], Tuple[Any, ...]]) -> List[Any]:
+    """
+    Trims the extra row fetched past `limit` and, when there was one, sets the
+    cursor of the next page in the X-Next-Cursor header.
+    """
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*key(rows[-1]))
+    return rows
+
 @router.post("/repos", response_model=ReadRepo, status_code=status.HTTP_201_CREATED)
-def create_repo(repo: CreateRepo, background_tasks: BackgroundTasks, session: Session = Depends(get_session)):
+async def create_repo(repo: CreateRepo, session: AsyncSession = Depends(get_session)):
     full_name = f"{repo.owner}/{repo.name}"
-    existing_repo = session.exec(
+    existing_repo = (await session.exec(
         select(Repo).where(Repo.full_name == full_name)
-    ).first()
+    )).first()
 
     if existing_repo:
         raise HTTPException(
@@ -34,36 +66,193 @@ def create_repo(repo: CreateRepo, background_tasks: BackgroundTasks, session: Se
         clone_url=f"{html_url}.git",
     )
     session.add(new_repo)
-    session.commit()
-    session.refresh(new_repo)
+    await session.flush()
+    await session.run_sync(enqueue_index_job, new_repo.id)
+    await session.commit()
+    await session.refresh(new_repo)
 
-    background_tasks.add_task(index_repo, new_repo.id)
-    
     return new_repo
 
-@router.get("/repos/{repo_id}", response_model=ReadRepo)
-def read_repo(repo_id: int, session: Session = Depends(get_session)):
-    repo = session.get(Repo, repo_id)
+@router.post("/repos/{repo_id}/reindex", response_model=ReadRepo, status_code=status.HTTP_202_ACCEPTED)
+async def reindex_repo(repo_id: int, session: AsyncSession = Depends(get_session)):
+    repo = await session.get(Repo, repo_id)
     if not repo:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Repo not found"
         )
+    already_queued = HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"Repository {repo.full_name} is already queued for indexing."
+    )
+    if await session.run_sync(active_job, repo.id):
+        raise already_queued
+
+    await session.run_sync(enqueue_index_job, repo.id)
+    repo.index_status = IndexStatus.pending
+    session.add(repo)
+    try:
+        await session.commit()
+    except IntegrityError:
+        # a concurrent request enqueued first (ix_indexjob_repo_id_active)
+        await session.rollback()
+        raise already_queued
+    await session.refresh(repo)
+
     return repo
 
+@router.get("/repos/{repo_id}", response_model=ReadRepo)
+async def read_repo(repo_id: int, session: AsyncSession = Depends(get_session)):
+    """
+    The repo, with the progress of its latest index run.
+    """
+    repo = await session.get(Repo, repo_id)
+    if not repo:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Repo not found"
+        )
+    progress = await session.get(IndexProgress, repo_id)
+    return {**repo.model_dump(), "progress": describe(progress) if progress else None}
+
+@router.get("/repos/{repo_id}/progress")
+async def stream_progress(repo_id: int, request: Request):
+    """
+    Server-sent events: a `progress` event with the latest index run's progress
+    (as in GET /repos/{id}) whenever it changes, then a `done` event with the
+    repo's index status once it is `complete` or `error`.
+    """
+    async def load():
+        # a session per poll, so no connection is held in between
+        async with async_session() as sess:
+            repo = await sess.get(Repo, repo_id)
+            progress = await sess.get(IndexProgress, repo_id)
+            return repo, progress
+
+    repo, _ = await load()
+    if not repo:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Repo not found"
+        )
+
+    async def events():
+        last = None
+        while not await request.is_disconnected():
+            repo, progress = await load()
+            if repo is None:
+                return
+            if progress is not None and progress.updated_at != last:
+                last = progress.updated_at
+                yield f"event: progress\ndata: {ReadIndexProgress(**describe(progress)).model_dump_json()}\n\n"
+            if repo.index_status in (IndexStatus.complete, IndexStatus.error):
+                yield f"event: done\ndata: {json.dumps({'index_status': repo.index_status.value})}\n\n"
+                return
+            await asyncio.sleep(settings.INDEX_PROGRESS_POLL_INTERVAL)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.get("/repos", response_model=list[ReadRepo])
-def list_repos(session: Session = Depends(get_session)):
-    repos = session.exec(select(Repo)).all()
-    return repos
+async def list_repos(
+    response: Response,
+    limit: int = PageSize,
+    cursor: Optional[str] = None,
+    index_status: Optional[IndexStatus] = Query(None, alias="status"),
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Repos in id order, `limit` at a time. Pass the X-Next-Cursor response
+    header back as `cursor` for the next page; it is absent on the last one.
+    """
+    stmt = select(Repo).order_by(Repo.id).limit(limit + 1)
+    if index_status is not None:
+        stmt = stmt.where(Repo.index_status == index_status)
+    after = _after(cursor, (int,))
+    if after:
+        stmt = stmt.where(Repo.id > after[0])
+    repos = (await session.exec(stmt)).all()
+    return _page(response, repos, limit, lambda r: (r.id,))
+
+@router.get("/repos/{repo_id}/files", response_model=list[ReadFile])
+async def list_files(
+    repo_id: int,
+    response: Response,
+    limit: int = PageSize,
+    cursor: Optional[str] = None,
+    prefix: Optional[str] = None,
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    A repo's indexed files in path order, optionally only those under `prefix`.
+    Paginated like GET /repos.
+    """
+    if await session.get(Repo, repo_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Repo not found"
+        )
+
+    # byte order, to match ix_file_repo_id_path
+    path = File.path.collate("C")
+    stmt = (
+        select(File.id, File.path, File.size, File.blob_sha, File.indexed_at)
+        .where(File.repo_id == repo_id)
+        .order_by(path, File.id)
+        .limit(limit + 1)
+    )
+    if prefix:
+        stmt = stmt.where(path.startswith(prefix, autoescape=True))
+    after = _after(cursor, (str, int))
+    if after:
+        stmt = stmt.where(tuple_(path, File.id) > tuple_(literal(after[0]), literal(after[1])))
+    rows = [dict(row._mapping) for row in (await session.exec(stmt)).all()]
+    return _page(response, rows, limit, lambda r: (r["path"], r["id"]))
+
+@router.get("/repos/{repo_id}/files/{file_id}/chunks", response_model=list[ReadChunk])
+async def list_chunks(
+    repo_id: int,
+    file_id: int,
+    response: Response,
+    limit: int = PageSize,
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    A file's chunks in line order, without their embeddings. Paginated like GET /repos.
+    """
+    found = (await session.exec(select(File.id).where(File.id == file_id, File.repo_id == repo_id))).first()
+    if found is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File not found"
+        )
+
+    # start_line is nullable; sorting NULL as 0 keeps the keyset and the order in step
+    start_line = func.coalesce(CodeChunk.start_line, 0)
+    stmt = (
+        select(CodeChunk.id, CodeChunk.start_line, CodeChunk.end_line, CodeChunk.content)
+        .where(CodeChunk.file_id == file_id)
+        .order_by(start_line, CodeChunk.id)
+        .limit(limit + 1)
+    )
+    after = _after(cursor, (int, int))
+    if after:
+        stmt = stmt.where(tuple_(start_line, CodeChunk.id) > tuple_(literal(after[0]), literal(after[1])))
+    rows = [dict(row._mapping) for row in (await session.exec(stmt)).all()]
+    return _page(response, rows, limit, lambda r: (r["start_line"] or 0, r["id"]))
 
 @router.delete("/repos/{repo_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_repo(repo_id: int, session: Session = Depends(get_session)):
-    repo = session.get(Repo, repo_id)
+async def delete_repo(repo_id: int, session: AsyncSession = Depends(get_session)):
+    repo = await session.get(Repo, repo_id)
     if not repo:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Repo not found"
         )
-    session.delete(repo)
-    session.commit()
+    await session.delete(repo)
+    await session.commit()
     return None
\ No newline at end of file
@@ -1,11 +1,131 @@
+from typing import Dict, List
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     DATABASE_URL: str
     OPENAI_API_KEY: str = ""
 
+    # Database
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 10.0
+    DB_POOL_RECYCLE: int = 1_800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT: float = 30.0
+
+    # Embeddings
+    # "openai" (EMBEDDING_MODEL), or "local" (LOCAL_EMBEDDING_MODEL, on CPU; poetry install -E local-embeddings)
+    EMBEDDING_PROVIDER: str = "openai"
+    EMBEDDING_MODEL: str = "text-embedding-3-small"
+    EMBEDDING_CACHE_LRU_SIZE: int = 50_000
+    EMBEDDING_CONCURRENCY: int = 4
+    EMBEDDING_BATCH_TOKENS: int = 20_000
+    EMBEDDING_BATCH_SIZE: int = 256
+    EMBEDDING_MAX_RETRIES: int = 6
+    EMBEDDING_BACKOFF_BASE: float = 0.5
+    EMBEDDING_BACKOFF_MAX: float = 30.0
+
+    # Local embeddings
+    # a directory, or Hugging Face repo, holding model.onnx (or onnx/model.onnx) and tokenizer.json
+    LOCAL_EMBEDDING_MODEL: str = "BAAI/bge-small-en-v1.5"
+    # inference threads (0: one per core, up to 4); the cores are split between them
+    LOCAL_EMBEDDING_THREADS: int = 0
+    # peak memory grows with batch size x LOCAL_EMBEDDING_MAX_TOKENS^2 (attention)
+    LOCAL_EMBEDDING_BATCH_SIZE: int = 8
+    # extra seconds a batch of chat questions waits for more once an inference thread is free
+    LOCAL_EMBEDDING_MAX_WAIT: float = 0.0
+    LOCAL_EMBEDDING_MAX_TOKENS: int = 512
+
+    # Indexing
+    CHUNK_MAX_TOKENS: int = 400
+    CHUNK_OVERLAP_LINES: int = 0
+    # larger .py files are split at blank lines rather than parsed: an AST takes many times the source's memory
+    CHUNK_MAX_PARSE_CHARS: int = 200_000
+    INDEX_MAX_FILE_BYTES: int = 1_000_000
+    INDEX_MAX_DATA_FILE_BYTES: int = 200_000
+    INDEX_MAX_LINE_CHARS: int = 10_000
+    INDEX_READ_AHEAD: int = 64
+    INDEX_WRITE_BATCH_FILES: int = 200
+    INDEX_WRITE_BATCH_CHUNKS: int = 5_000
+    INDEX_WRITE_FLUSH_SECONDS: float = 30.0
+    # where per-repo git mirrors are kept between runs (default: a dir under the system temp dir)
+    INDEX_MIRROR_DIR: str = ""
+
+    # Index job queue
+    INDEX_WORKER_PROCESSES: int = 2
+    INDEX_JOB_MAX_ATTEMPTS: int = 3
+    INDEX_JOB_POLL_INTERVAL: float = 2.0
+    INDEX_JOB_HEARTBEAT_INTERVAL: float = 15.0
+    INDEX_JOB_STALE_AFTER: float = 120.0
+    # seconds between polls of GET /repos/{id}/progress
+    INDEX_PROGRESS_POLL_INTERVAL: float = 1.0
+
+    # Agent
+    # off for API processes that only serve repos: /api/chat is not mounted and
+    # the agent (LangChain, LangGraph) is never imported
+    CHAT_ENABLED: bool = True
+    # build the chat models, graphs and embedding provider on startup rather
+    # than on the first chat
+    CHAT_WARM_UP: bool = True
+    CHAT_MODEL: str = "gpt-4.1"
+    SUMMARY_SOURCE_TOKENS: int = 6_000
+    AGENT_NODE_TIMEOUT: float = 60.0
+    AGENT_NODE_TIMEOUTS: Dict[str, float] = {}
+    CONTEXT_MAX_TOKENS: int = 3_000
+    RESEARCH_PROMPT_MAX_TOKENS: int = 4_500
+    AGGREGATE_PROMPT_MAX_TOKENS: int = 6_000
+    # small model asked for the plan of questions the routing rules can't
+    # place; empty sends them down the full plan
+    ROUTER_MODEL: str = "gpt-4.1-nano"
+    ROUTER_TIMEOUT: float = 3.0
+    # LLM passes per research loop; a pass that reports high confidence, or
+    # whose answer is this similar (word sequence ratio) to the previous one, ends it
+    RESEARCH_MAX_PASSES: int = 2
+    RESEARCH_CONVERGENCE: float = 0.9
+    CHAT_MAX_REPOS: int = 20
+    # named sets of repos one chat can cover (?group=), by full name
+    REPO_GROUPS: Dict[str, List[str]] = {}
+
+    # Answer cache
+    ANSWER_CACHE_SIZE: int = 1_000
+    ANSWER_CACHE_TTL: float = 86_400.0
+    ANSWER_CACHE_MIN_SIMILARITY: float = 0.95
+
+    # Retrieval
+    RETRIEVAL_TOP_K: int = 8
+    RETRIEVAL_CANDIDATES: int = 20
+    RETRIEVAL_MAX_PER_FILE: int = 2
+    RETRIEVAL_MAX_PER_REPO: int = 4
+    RETRIEVAL_RRF_K: int = 60
+    HNSW_EF_SEARCH: int = 40
+    # seconds a repo set's share of indexed files, which scales ef_search, is reused
+    RETRIEVAL_SHARE_TTL: float = 300.0
+    # what the HNSW index holds: "vector" (float32), "halfvec" (float16), "binary"
+    # (sign bits) or "truncated" (the first VECTOR_INDEX_DIMENSIONS); see app.utils.retrieval
+    VECTOR_INDEX_MODE: str = "vector"
+    VECTOR_INDEX_DIMENSIONS: int = 256
+    # candidates per result fetched from a compact index and re-ranked exactly
+    VECTOR_RERANK_FACTOR: int = 4
+
+    # Listing endpoints
+    LIST_PAGE_SIZE: int = 100
+    LIST_MAX_PAGE_SIZE: int = 1_000
+
+    # Metrics
+    METRICS_ENABLED: bool = True
+    WORKER_METRICS_PORT: int = 0
+    # USD per million input and output tokens, by model name prefix
+    MODEL_PRICES: Dict[str, List[float]] = {
+        "gpt-4.1-mini": [0.40, 1.60],
+        "gpt-4.1": [2.00, 8.00],
+        "gpt-4.1-nano": [0.10, 0.40],
+        "text-embedding-3-small": [0.02, 0.0],
+    }
+
     class Config:
         env_file = "../../.env"
         env_file_encoding = "utf-8"
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
@@ -1,10 +1,46 @@
-from sqlmodel import create_engine, Session
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel import create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.core.config import settings
 
-# Create the SQLModel/SQLAlchemy engine
-engine = create_engine(settings.DATABASE_URL, echo=True)
+# Create the SQLModel/SQLAlchemy engine, used by the indexer, the worker and scripts
+engine = create_engine(
+    settings.DATABASE_URL,
+    echo=settings.DB_ECHO,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+)
+
+def async_url(url: str) -> URL:
+    """
+    DATABASE_URL with the asyncpg driver. libpq's `sslmode` is passed on as
+    asyncpg's `ssl`, which takes the same values.
+    """
+    parsed = make_url(url).set(drivername="postgresql+asyncpg")
+    query = dict(parsed.query)
+    if "sslmode" in query:
+        query["ssl"] = query.pop("sslmode")
+    return parsed.set(query=query)
+
+# Async engine for the API and the agent. Sessions only hold a connection while
+# they query, so a chat stream waiting on the LLM holds neither a connection
+# nor a thread.
+async_engine = create_async_engine(
+    async_url(settings.DATABASE_URL),
+    echo=settings.DB_ECHO,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    connect_args={
+        "server_settings": {"statement_timeout": str(int(settings.DB_STATEMENT_TIMEOUT * 1000))},
+    },
+)
+
+async_session = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
 
 # Dependency for FastAPI endpoints to get a session
-def get_session():
-    with Session(engine) as session:
-        yield session
\ No newline at end of file
+async def get_session():
+    async with async_session() as session:
+        yield session
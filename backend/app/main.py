@@ -1,12 +1,50 @@
-from fastapi import FastAPI
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.routers.health import router as health_router
+from app.api.routers.metrics import router as metrics_router
 from app.api.routers.repos import router as repos_router
-from app.api.routers.chat import router as chat_router
+from app.core.config import settings
+from app.db import async_engine
+from app.utils import metrics
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.CHAT_ENABLED and settings.CHAT_WARM_UP:
+        # Imported here so API-only processes never load the agent
+        from app.agents.agent import warm_up
+
+        started = time.perf_counter()
+        warm_up()
+        metrics.log(f"Chat agent warmed up in {time.perf_counter() - started:.1f}s")
+    yield
+    # close pooled connections on shutdown
+    await async_engine.dispose()
 
-app = FastAPI(title="frzn-docs-backend")
+app = FastAPI(title="frzn-docs-backend", lifespan=lifespan)
+
+@app.middleware("http")
+async def request_id(request: Request, call_next):
+    """
+    Tags each request with an id (the caller's X-Request-ID, or a new one),
+    used as the prefix of its log lines and returned in the response.
+    """
+    rid = request.headers.get("x-request-id") or metrics.new_request_id()
+    token = metrics.request_id.set(rid)
+    try:
+        response = await call_next(request)
+    finally:
+        metrics.request_id.reset(token)
+    response.headers["X-Request-ID"] = rid
+    return response
 
 app.include_router(health_router)
+app.include_router(metrics_router)
 app.include_router(repos_router, prefix="/api", tags=["repos"])
-app.include_router(chat_router, prefix="/api", tags=["chat"])
\ No newline at end of file
+if settings.CHAT_ENABLED:
+    from app.api.routers.chat import router as chat_router
+
+    app.include_router(chat_router, prefix="/api", tags=["chat"])
@@ -4,7 +4,8 @@ from datetime import datetime, timezone
 from typing import Optional, List, TYPE_CHECKING
 
 from sqlmodel import SQLModel, Field, Column, Relationship
-from sqlalchemy import String, ForeignKey
+from sqlalchemy import BigInteger, String, ForeignKey, Index, UniqueConstraint, Computed, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from pgvector.sqlalchemy import Vector
 from enum import Enum
 
@@ -19,6 +20,10 @@ class IndexStatus(str, Enum):
 
 class Repo(SQLModel, table=True):
     __tablename__ = "repo"
+    __table_args__ = (
+        # keyset pages of GET /repos, optionally filtered by status
+        Index("ix_repo_index_status_id", "index_status", "id"),
+    )
 
     id: int = Field(None, primary_key=True)
     owner: str
@@ -30,6 +35,10 @@ class Repo(SQLModel, table=True):
     clone_url: Optional[str] = None
     indexed_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     index_status: IndexStatus = Field(default=IndexStatus.pending)
+    indexed_commit: Optional[str] = None
+    # the embedding provider (app.utils.embedding_providers) its chunks were embedded with
+    embedding_model: Optional[str] = None
+    embedding_dim: Optional[int] = None
 
     files: List["File"] = Relationship(
         back_populates="repo",
@@ -42,6 +51,11 @@ class Repo(SQLModel, table=True):
 
 class File(SQLModel, table=True):
     __tablename__ = "file"
+    __table_args__ = (
+        # Byte-order ("C") paths, so path-prefix LIKE filters and keyset pages by
+        # path can both use the index; also serves every lookup by repo_id
+        Index("ix_file_repo_id_path", "repo_id", text('path COLLATE "C"')),
+    )
 
     id: int = Field(None, primary_key=True)
     repo_id: int = Field(
@@ -49,6 +63,7 @@ class File(SQLModel, table=True):
     )
     path: str
     size: Optional[int] = None
+    blob_sha: Optional[str] = None
     indexed_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
     repo: "Repo" = Relationship(
@@ -66,6 +81,26 @@ class File(SQLModel, table=True):
 
 class CodeChunk(SQLModel, table=True):
     __tablename__ = "codechunk"
+    __table_args__ = (
+        # One partial HNSW index per embedding dimension (see
+        # app.utils.retrieval.ensure_vector_index); this is the OpenAI default's.
+        Index(
+            "ix_codechunk_embedding_hnsw_1536",
+            text("(embedding::vector(1536)) vector_cosine_ops"),
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_where=text("vector_dims(embedding) = 1536"),
+        ),
+        # line order of a file's chunks, as listed and paged by GET .../chunks
+        Index("ix_codechunk_file_id_line_order", "file_id", text("coalesce(start_line, 0)"), "id"),
+        Index("ix_codechunk_content_tsv", "content_tsv", postgresql_using="gin"),
+        Index(
+            "ix_codechunk_content_trgm",
+            "content",
+            postgresql_using="gin",
+            postgresql_ops={"content": "gin_trgm_ops"},
+        ),
+    )
 
     id: int = Field(None, primary_key=True)
     file_id: int = Field(
@@ -74,9 +109,96 @@ class CodeChunk(SQLModel, table=True):
     start_line: Optional[int] = None
     end_line: Optional[int] = None
     content: str
-    embedding: List[float] = Field(sa_column=Column(Vector(1536)))
+    # no fixed dimension: repos indexed with different models share the table
+    embedding: List[float] = Field(sa_column=Column(Vector()))
+    # 'simple' keeps identifiers as-is (no stemming or stop words); filled in by Postgres
+    content_tsv: Optional[str] = Field(
+        default=None,
+        sa_column=Column(TSVECTOR, Computed("to_tsvector('simple', content)", persisted=True)),
+    )
 
     file: "File" = Relationship(
         back_populates="chunks",
         sa_relationship_kwargs={"passive_deletes": True},
-    )
\ No newline at end of file
+    )
+
+class CachedEmbedding(SQLModel, table=True):
+    __tablename__ = "cachedembedding"
+
+    content_hash: str = Field(primary_key=True)
+    model: str
+    embedding: List[float] = Field(sa_column=Column(Vector()))
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class RepoSummary(SQLModel, table=True):
+    __tablename__ = "reposummary"
+    __table_args__ = (
+        UniqueConstraint("repo_id", "commit", name="uq_reposummary_repo_id_commit"),
+    )
+
+    id: int = Field(None, primary_key=True)
+    repo_id: int = Field(
+        sa_column=Column(ForeignKey("repo.id", ondelete="CASCADE"), nullable=False)
+    )
+    commit: str
+    summary: str
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class JobStatus(str, Enum):
+    queued = "queued"
+    running = "running"
+    done = "done"
+    failed = "failed"
+
+class IndexJob(SQLModel, table=True):
+    __tablename__ = "indexjob"
+    __table_args__ = (
+        Index("ix_indexjob_status_created_at", "status", "created_at"),
+        # at most one queued or running job per repo, however many reindex requests race
+        Index(
+            "ix_indexjob_repo_id_active",
+            "repo_id",
+            unique=True,
+            postgresql_where=text("status IN ('queued', 'running')"),
+        ),
+    )
+
+    id: int = Field(None, primary_key=True)
+    repo_id: int = Field(
+        sa_column=Column(ForeignKey("repo.id", ondelete="CASCADE"), nullable=False)
+    )
+    status: JobStatus = Field(default=JobStatus.queued)
+    attempts: int = 0
+    max_attempts: int = 3
+    locked_by: Optional[str] = None
+    heartbeat_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class IndexProgress(SQLModel, table=True):
+    """
+    How far the repo's latest index run got. Written in the same transactions
+    as the indexed files, so it never runs ahead of what a restart would keep.
+    """
+    __tablename__ = "indexprogress"
+
+    repo_id: int = Field(
+        sa_column=Column(ForeignKey("repo.id", ondelete="CASCADE"), primary_key=True)
+    )
+    commit: Optional[str] = None
+    phase: str
+    # files already indexed at `commit` when the run started, e.g. by an interrupted run
+    files_unchanged: int = 0
+    files_total: int = 0
+    files_done: int = 0
+    bytes_total: int = Field(default=0, sa_type=BigInteger)
+    bytes_done: int = Field(default=0, sa_type=BigInteger)
+    chunks_done: int = 0
+    resumed: bool = False
+    started_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    embed_started_at: Optional[datetime] = None
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -0,0 +1,23 @@
+# backend/app/schemas/file.py
+
+from datetime import datetime
+from pydantic import BaseModel
+
+class ReadFile(BaseModel):
+    id: int
+    path: str
+    size: int | None = None
+    blob_sha: str | None = None
+    indexed_at: datetime
+
+    class Config:
+        orm_mode = True
+
+class ReadChunk(BaseModel):
+    id: int
+    start_line: int | None = None
+    end_line: int | None = None
+    content: str
+
+    class Config:
+        orm_mode = True
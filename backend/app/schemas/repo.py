@@ -7,6 +7,21 @@ class CreateRepo(BaseModel):
     owner: str
     name: str
 
+class ReadIndexProgress(BaseModel):
+    commit: str | None = None
+    phase: str
+    files_unchanged: int
+    files_total: int
+    files_done: int
+    bytes_total: int
+    bytes_done: int
+    chunks_done: int
+    resumed: bool
+    started_at: datetime
+    embed_started_at: datetime | None = None
+    updated_at: datetime
+    eta_seconds: float | None = None
+
 class ReadRepo(CreateRepo):
     id: int
     full_name: str
@@ -16,6 +31,11 @@ class ReadRepo(CreateRepo):
     clone_url: str | None = None
     indexed_at: datetime
     index_status: str
-    
+    indexed_commit: str | None = None
+    embedding_model: str | None = None
+    embedding_dim: int | None = None
+    # only filled in by GET /repos/{id}
+    progress: ReadIndexProgress | None = None
+
     class Config:
         orm_mode = True
\ No newline at end of file
@@ -1,56 +1,260 @@
 # app/scripts/indexer.py
 
-import os
-import shutil
-import tempfile
+import contextvars
+import functools
+import queue
+import resource
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from git import Repo as GitPythonRepo
-from sqlmodel import Session
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+from sqlalchemy import delete
+from sqlmodel import Session, select
 from openai import OpenAI
 
-from app.models import Repo as RepoModel, IndexStatus, File as FileModel, CodeChunk as CodeChunkModel
+from app.core.config import settings
+from app.models import Repo as RepoModel, IndexStatus, File as FileModel
 from app.db import engine
-from app.utils.index_rules import should_index
+from app.utils import metrics
+from app.utils.bulk_writer import BulkWriter
+from app.utils.chunking import Chunk, chunk_file
+from app.utils.embedding_cache import EmbeddingCache
+from app.utils.embedding_providers import get_provider
+from app.utils.embeddings import EmbeddingPipeline
+from app.utils.file_reader import SAMPLE_BYTES, BoundedLineReader, size_reason, sniff
+from app.utils.git_source import GitSource, mirror_filter
+from app.utils.index_progress import DONE, record_batch, set_phase, start_progress
+from app.utils.index_rules import IndexRules
+from app.utils.retrieval import ensure_vector_index
+from app.utils.summaries import ensure_summary, prune_summaries
 
-client = OpenAI()
+T = TypeVar("T")
 
-def create_code_chunks(file_model: FileModel, tmpdir: str, session: Session, code_chunk_size: int = 1000, batch_size: int = 100):
-    file_path = os.path.join(tmpdir, file_model.path)
-    if not os.path.exists(file_path):
-        print(f"File {file_path} does not exist, skipping chunk creation.")
-        return
+@functools.lru_cache(maxsize=None)
+def summary_client() -> OpenAI:
+    """
+    Chat completions for repo summaries, created on first use; embeddings go
+    through app.utils.embedding_providers.
+    """
+    return OpenAI(max_retries=3)
 
-    with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-        content = f.read()
+class IndexCancelled(Exception):
+    """
+    Raised inside index_repo once its `cancel` event is set, e.g. by an index
+    worker that lost the run's job to another worker.
+    """
 
-    chunks = [content[i:i + code_chunk_size] for i in range(0, len(content), code_chunk_size)]
-    chunk_tuples = [(idx, chunk.strip()) for idx, chunk in enumerate(chunks) if chunk.strip()]
+def check_cancelled(cancel: Optional[threading.Event]) -> None:
+    if cancel is not None and cancel.is_set():
+        raise IndexCancelled("index run cancelled")
 
-    for i in range(0, len(chunk_tuples), batch_size):
-        batch = chunk_tuples[i:i + batch_size]
-        texts = [chunk for _, chunk in batch]
+@dataclass
+class PendingFile:
+    """
+    A file whose chunks are being embedded. It is written, with all its chunks,
+    only once every embedding is back.
+    """
+    path: str
+    # None when the blob couldn't be read, so the next run's diff retries it
+    blob_sha: Optional[str]
+    chunks: List[Chunk]
+    size: Optional[int] = None
+    embeddings: List[Optional[List[float]]] = field(default_factory=list)
+    remaining: int = 0
 
-        try:
-            response = client.embeddings.create(
-                input=texts,
-                model="text-embedding-3-small"
-            )
-            embeddings = [item.embedding for item in response.data]
-        except Exception as e:
-            print(f"Embedding batch failed for file {file_model.path}: {e}")
+    def __post_init__(self):
+        self.embeddings = [None] * len(self.chunks)
+        self.remaining = len(self.chunks)
+
+def chunk_files(source: GitSource, blobs: Dict[str, str]) -> Iterator[PendingFile]:
+    """
+    Streams and chunks each blob in turn, straight from git's object database.
+    Oversized, binary, minified and generated files are recorded with no chunks,
+    so re-indexing doesn't retry them. Oversized blobs are never read, and the
+    mirror filter leaves them out of the mirror. Each
+    file's chunks are listed whole, as it's written only once all are embedded;
+    the size limits bound them.
+    """
+    for path, blob_sha in blobs.items():
+        if source.omitted(blob_sha):
+            # over every size limit, or the mirror filter would have fetched it
+            metrics.log(f"Skipping {path}: larger than {mirror_filter()}")
+            metrics.INDEX_FILES.inc(outcome="skipped")
+            yield PendingFile(path=path, blob_sha=blob_sha, chunks=[])
             continue
 
-        for (idx, chunk), embedding in zip(batch, embeddings):
-            code_chunk = CodeChunkModel(
-                file_id=file_model.id,
-                start_line=idx * code_chunk_size + 1,
-                end_line=(idx + 1) * code_chunk_size,
-                content=chunk,
-                embedding=embedding
-            )
-            session.add(code_chunk)
+        size = source.size(blob_sha)
+        if size is None:
+            metrics.log(f"Blob {blob_sha[:7]} of {path} is missing, skipping chunk creation.")
+            metrics.INDEX_FILES.inc(outcome="missing")
+            yield PendingFile(path=path, blob_sha=None, chunks=[])
+            continue
+
+        reason = size_reason(path, size)
+        blob = None
+        if not reason:
+            blob = source.open_blob(blob_sha)
+            # peeked bytes stay buffered for the chunker
+            reason = sniff(path, blob.peek(SAMPLE_BYTES)[:SAMPLE_BYTES])
+        if reason:
+            if blob is not None:
+                blob.close()
+            metrics.log(f"Skipping {path}: {reason}")
+            metrics.INDEX_FILES.inc(outcome="skipped")
+            yield PendingFile(path=path, blob_sha=blob_sha, chunks=[], size=size)
+            continue
+
+        reopen = functools.partial(source.open_blob, blob_sha)
+        with metrics.timer(metrics.INDEX_CHUNK_SECONDS), BoundedLineReader(blob, reopen=reopen) as f:
+            chunks = list(chunk_file(path, f))
+        metrics.INDEX_FILES.inc(outcome="chunked")
+        yield PendingFile(path=path, blob_sha=blob_sha, chunks=chunks, size=size)
+
+def read_ahead(items: Iterable[T], maxsize: int) -> Iterator[T]:
+    """
+    Runs `items` on a background thread, buffering up to `maxsize` results,
+    so file reading and chunking overlap with embedding and DB writes.
+    """
+    buffer: "queue.Queue" = queue.Queue(maxsize)
+    done = object()
+    stop = threading.Event()
+
+    def put(item) -> None:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def produce() -> None:
+        try:
+            for item in items:
+                put(item)
+                if stop.is_set():
+                    return
+            put(done)
+        except BaseException as e:
+            put(e)
+
+    # in a copy of the caller's context so log lines keep its job id
+    threading.Thread(
+        target=contextvars.copy_context().run, args=(produce,), name="read-ahead", daemon=True
+    ).start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+def write_file(writer: BulkWriter, pending: PendingFile) -> None:
+    writer.add(
+        pending.path,
+        pending.blob_sha,
+        [
+            (start_line, end_line, content, embedding)
+            for (start_line, end_line, content), embedding in zip(pending.chunks, pending.embeddings)
+        ],
+        size=pending.size,
+    )
+
+def embed_files(
+    session: Session,
+    writer: BulkWriter,
+    source: GitSource,
+    blobs: Dict[str, str],
+    pipeline: EmbeddingPipeline,
+    cancel: Optional[threading.Event] = None,
+) -> None:
+    """
+    Streams every chunk of `blobs` through the embedding pipeline, batching across
+    files, and hands each file to the writer as soon as its last chunk is embedded.
+    Stops with IndexCancelled before the next file once `cancel` is set.
+    """
+    def items() -> Iterator[Tuple[Tuple[PendingFile, int], str]]:
+        for pending in read_ahead(chunk_files(source, blobs), settings.INDEX_READ_AHEAD):
+            check_cancelled(cancel)
+            if not pending.chunks:
+                write_file(writer, pending)
+                continue
+            for idx, (_, _, text) in enumerate(pending.chunks):
+                yield (pending, idx), text
+
+    for (pending, idx), embedding in pipeline.run(session, items()):
+        pending.embeddings[idx] = embedding
+        pending.remaining -= 1
+        if pending.remaining == 0:
+            write_file(writer, pending)
+    writer.flush()
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def load_indexed_files(session: Session, repo_id: int) -> Dict[str, List[Tuple[int, Optional[str]]]]:
+    """
+    Maps each indexed path of a repo to its (file id, blob sha) rows.
+    """
+    rows = session.exec(
+        select(FileModel.id, FileModel.path, FileModel.blob_sha).where(FileModel.repo_id == repo_id)
+    ).all()
+    existing: Dict[str, List[Tuple[int, Optional[str]]]] = defaultdict(list)
+    for file_id, path, blob_sha in rows:
+        existing[path].append((file_id, blob_sha))
+    return existing
+
+def diff_index(existing: Dict[str, List[Tuple[int, Optional[str]]]], current: Dict[str, str]) -> Tuple[List[str], List[int]]:
+    """
+    Compares the indexable blobs at HEAD with the files already indexed.
+    Returns the paths to (re)index and the ids of stale file rows to delete.
+    A path is unchanged only if it has exactly one row with the same blob sha.
+    """
+    def unchanged(path: str) -> bool:
+        rows = existing.get(path)
+        return bool(rows) and len(rows) == 1 and rows[0][1] == current.get(path)
+
+    to_index = [path for path in current if not unchanged(path)]
+    stale_ids = [
+        file_id
+        for path, rows in existing.items() if not unchanged(path)
+        for file_id, _ in rows
+    ]
+    return to_index, stale_ids
+
+def write_summary(repo: RepoModel, commit: str) -> None:
+    """
+    Writes the repo overview served by the chat agent. A failure here doesn't
+    fail the index run; the agent writes the summary on first use instead.
+    """
+    session = Session(engine)
+    try:
+        ensure_summary(session, summary_client(), repo.id, commit)
+    except Exception as e:
+        metrics.log(f"Could not summarize {repo.full_name} @ {commit[:7]}: {e}")
+    finally:
+        session.close()
 
-def index_repo(repo_id: int):
+def progress(repo_id: int, phase: str, **values) -> None:
+    session = Session(engine)
+    try:
+        set_phase(session, repo_id, phase, **values)
+        session.commit()
+    finally:
+        session.close()
+
+def index_repo(repo_id: int, cancel: Optional[threading.Event] = None):
+    """
+    Indexes the repo's default branch. Once `cancel` is set, the run stops with
+    IndexCancelled before its next file or write batch, leaving the repo's
+    status to whoever runs it next.
+    """
     session = Session(engine)
     repo = session.get(RepoModel, repo_id)
     if not repo:
@@ -59,58 +263,134 @@ def index_repo(repo_id: int):
     try:
         repo.index_status = IndexStatus.indexing
         session.add(repo)
+        previous_commit, previous_phase = start_progress(session, repo.id)
         session.commit()
         session.refresh(repo)
     finally:
         session.close()
 
-    with tempfile.TemporaryDirectory(prefix=f"{repo.owner}_{repo.name}_") as tmpdir:
-        try:
-            git_repo = GitPythonRepo.clone_from(repo.clone_url, tmpdir, depth=1)
-
-            head_commit = git_repo.head.commit
-            latest_sha = head_commit.hexsha
-            print(f"Cloned (shallow) {repo.full_name} @ {latest_sha[:7]}")
+    source = None
+    try:
+        with metrics.timer(metrics.INDEX_PHASE_SECONDS, phase="clone"):
+            # a bare, partial mirror: no checkout and no oversized blobs
+            source = GitSource.open(repo.id, repo.full_name, repo.clone_url)
 
-            file_list = [blob.path for blob in head_commit.tree.traverse() if blob.type == "blob"]
-            print("Files at HEAD:", file_list)
+        head_commit = source.commit
+        latest_sha = head_commit.hexsha
+        metrics.log(f"Fetched {repo.full_name} @ {latest_sha[:7]}")
 
+        provider = get_provider()
+        # chunks embedded by another model can't be searched with this one's vectors
+        model_changed = repo.embedding_model not in (None, provider.name)
+        if repo.indexed_commit == latest_sha and not model_changed:
+            metrics.log(f"{repo.full_name} already indexed @ {latest_sha[:7]}, nothing to do")
+        else:
+            progress(repo.id, "diff", commit=latest_sha)
+            cache = EmbeddingCache(provider.name)
+            pipeline = EmbeddingPipeline(provider, cache)
+            started = time.perf_counter()
             session = Session(engine)
             try:
-                for file_path in file_list:
-                    if should_index(file_path):
-                        file_model = FileModel(
-                            repo_id=repo.id,
-                            path=file_path,
-                            indexed_at=datetime.now(timezone.utc)
-                        )
-                        session.add(file_model)
-                        session.flush()
-                        create_code_chunks(file_model, tmpdir, session)
-                session.commit()
-            finally:
-                session.close()
+                with metrics.timer(metrics.INDEX_PHASE_SECONDS, phase="diff"):
+                    # Blob shas identify file contents, so comparing them with the stored
+                    # ones finds added/modified/removed paths without the old commit's history.
+                    rules = IndexRules.from_tree(head_commit.tree)
+                    current = {blob.path: blob.hexsha for blob in rules.indexable_blobs(head_commit.tree)}
+                    existing = load_indexed_files(session, repo.id)
+                    if model_changed:
+                        metrics.log(f"{repo.full_name}: re-embedding every file with {provider.name} (was {repo.embedding_model})")
+                        existing = {path: [(file_id, None) for file_id, _ in rows] for path, rows in existing.items()}
+                    to_index, stale_ids = diff_index(existing, current)
+                metrics.log(
+                    f"{repo.full_name}: {len(to_index)} added/modified, "
+                    f"{len(current) - len(to_index)} unchanged, {len(stale_ids)} stale rows removed"
+                )
+                # Files are committed batch by batch, so the diff of a run that
+                # died at this commit leaves out everything it wrote
+                resumed = previous_commit == latest_sha and previous_phase != DONE
+                if resumed:
+                    metrics.log(f"Resuming an interrupted run @ {latest_sha[:7]}")
 
-        except Exception as e:
-            print(f"Error cloning repository {repo.full_name}: {e}")
-            session = Session(engine)
-            try:
-                repo.index_status = IndexStatus.error
-                session.add(repo)
-                session.commit()
-                session.refresh(repo)
+                progress(
+                    repo.id,
+                    "embed_write",
+                    files_unchanged=len(current) - len(to_index),
+                    resumed=resumed,
+                    files_total=len(to_index),
+                    bytes_total=sum(source.size(current[p]) or 0 for p in to_index),
+                    embed_started_at=datetime.now(timezone.utc),
+                )
+
+                # chunking, embedding and writes overlap, so they're timed as one phase;
+                # frzn_index_chunk_seconds, frzn_embedding_request_seconds and
+                # frzn_index_write_seconds break it down
+                with metrics.timer(metrics.INDEX_PHASE_SECONDS, phase="embed_write"):
+                    ensure_vector_index(provider.dimension)
+                    if stale_ids:
+                        # codechunk rows go with them via ON DELETE CASCADE
+                        session.execute(delete(FileModel).where(FileModel.id.in_(stale_ids)))
+
+                    def on_flush(sess: Session, files: int, chunks: int, size: int) -> None:
+                        # a cancelled run commits no further batches
+                        check_cancelled(cancel)
+                        record_batch(sess, repo.id, files, chunks, size)
+
+                    writer = BulkWriter(session, repo.id, on_flush=on_flush)
+                    embed_files(session, writer, source, {p: current[p] for p in to_index}, pipeline, cancel)
+                    check_cancelled(cancel)
+                    session.commit()
             finally:
                 session.close()
-            return repo
 
+            elapsed = time.perf_counter() - started
+            metrics.log(
+                f"Embedded {pipeline.chunks} chunks in {elapsed:.1f}s "
+                f"({pipeline.chunks / elapsed:.0f} chunks/s, {pipeline.tokens_sent / elapsed:.0f} tokens/s, "
+                f"{pipeline.requests} requests, {pipeline.retries} retries)"
+            )
+            metrics.log(
+                f"Embedding cache: {cache.hits}/{cache.hits + cache.misses} chunks hit "
+                f"({cache.hit_rate:.1%})"
+            )
+            metrics.log(f"Peak worker RSS: {peak_rss_mb():.0f} MB")
+
+        check_cancelled(cancel)
+        progress(repo.id, "summary", commit=latest_sha)
+        with metrics.timer(metrics.INDEX_PHASE_SECONDS, phase="summary"):
+            write_summary(repo, latest_sha)
+
+    except IndexCancelled:
+        metrics.log(f"Stopped indexing {repo.full_name}: run cancelled")
+        raise
+    except Exception as e:
+        metrics.log(f"Error indexing repository {repo.full_name}: {e}")
+        session = Session(engine)
+        try:
+            repo.index_status = IndexStatus.error
+            session.add(repo)
+            session.commit()
+            session.refresh(repo)
+        finally:
+            session.close()
+        raise
+    finally:
+        if source is not None:
+            source.close()
+
+    check_cancelled(cancel)
     session = Session(engine)
     try:
         repo.indexed_at = datetime.now(timezone.utc)
+        repo.indexed_commit = latest_sha
         repo.index_status = IndexStatus.complete
+        repo.embedding_model = provider.name
+        repo.embedding_dim = provider.dimension
         session.add(repo)
+        set_phase(session, repo.id, DONE)
+        prune_summaries(session, repo.id, latest_sha)
         session.commit()
         session.refresh(repo)
     finally:
         session.close()
 
-    return repo
\ No newline at end of file
+    return repo
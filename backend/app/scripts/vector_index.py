@@ -0,0 +1,82 @@
+# app/scripts/vector_index.py
+"""
+Builds the HNSW indexes a VECTOR_INDEX_MODE searches, for every embedding
+dimension repos have been indexed with, and optionally drops the others.
+
+Switching modes on a database that already has chunks: run this with the new
+mode, then set VECTOR_INDEX_MODE, then run it again with --drop-others, which
+keeps the indexes app.models declares so the schema stays what migrations
+expect. The
+indexes are built over the stored embeddings with CREATE INDEX CONCURRENTLY,
+so the API and index workers keep running; no rows are rewritten.
+
+    python -m app.scripts.vector_index --mode halfvec
+    python -m app.scripts.vector_index --mode halfvec --drop-others
+"""
+
+import argparse
+import time
+from typing import List, Set
+
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.db import engine
+from app.models import CodeChunk
+from app.utils.retrieval import VECTOR_INDEX_MODES, ensure_vector_index
+
+
+def indexed_dimensions(sess: Session) -> List[int]:
+    return list(sess.execute(text(
+        "SELECT DISTINCT embedding_dim FROM repo WHERE embedding_dim IS NOT NULL ORDER BY 1"
+    )).scalars())
+
+
+def vector_indexes(sess: Session) -> List[str]:
+    return list(sess.execute(text(
+        "SELECT indexname FROM pg_indexes WHERE tablename = 'codechunk' "
+        "AND indexname LIKE 'ix\\_codechunk\\_embedding\\_%' ORDER BY 1"
+    )).scalars())
+
+
+def declared_indexes() -> Set[str]:
+    return {index.name for index in CodeChunk.__table__.indexes}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=sorted(VECTOR_INDEX_MODES), default=settings.VECTOR_INDEX_MODE)
+    parser.add_argument("--dimensions", type=int, default=settings.VECTOR_INDEX_DIMENSIONS, help="of --mode truncated")
+    parser.add_argument("--drop-others", action="store_true", help="drop vector indexes --mode doesn't use, except those app.models declares")
+    args = parser.parse_args()
+    settings.VECTOR_INDEX_DIMENSIONS = args.dimensions
+
+    with Session(engine) as sess:
+        dimensions = indexed_dimensions(sess)
+    keep = set()
+    for dimension in dimensions:
+        started = time.perf_counter()
+        name = ensure_vector_index(dimension, args.mode)
+        if name:
+            keep.add(name)
+            print(f"{name}: ready in {time.perf_counter() - started:.1f}s")
+
+    if args.drop_others:
+        with Session(engine) as sess:
+            drop = [name for name in vector_indexes(sess) if name not in keep | declared_indexes()]
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            for name in drop:
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+                print(f"{name}: dropped")
+
+    with Session(engine) as sess:
+        for name in vector_indexes(sess):
+            size = sess.execute(
+                text("SELECT pg_size_pretty(pg_relation_size(CAST(:name AS regclass)))"), {"name": name}
+            ).scalar_one()
+            print(f"{name}: {size}")
+
+
+if __name__ == "__main__":
+    main()
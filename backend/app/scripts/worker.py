@@ -0,0 +1,146 @@
+# app/scripts/worker.py
+"""
+Index worker entry point. Runs a pool of processes that claim jobs from the
+indexjob table and index the corresponding repos.
+
+    python -m app.scripts.worker --processes 4
+"""
+
+import argparse
+import contextvars
+import multiprocessing as mp
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+from multiprocessing.connection import wait
+
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.db import engine
+from app.utils import metrics
+from app.utils.job_queue import claim_job, complete_job, fail_job, heartbeat
+
+
+# seconds between a worker process dying and its replacement starting
+WORKER_RESTART_DELAY = 1.0
+
+
+def _heartbeat_loop(job_id: int, worker_id: str, stop: threading.Event, lost: threading.Event) -> None:
+    while not stop.wait(settings.INDEX_JOB_HEARTBEAT_INTERVAL):
+        try:
+            with Session(engine) as session:
+                if not heartbeat(session, job_id, worker_id):
+                    metrics.log(f"{worker_id} lost the job to another worker, cancelling its index run")
+                    lost.set()
+                    return
+        except Exception as e:
+            metrics.log(f"Heartbeat from {worker_id} failed: {e}")
+
+
+def run_worker(index: int) -> None:
+    """
+    Claims and runs jobs until told to stop.
+    """
+    # Imported here so the parent process never loads the indexing stack
+    from app.scripts.indexer import IndexCancelled, index_repo
+
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    shutdown = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: shutdown.set())
+    signal.signal(signal.SIGINT, lambda *_: shutdown.set())
+    # lines logged between jobs carry the worker's id instead of a job's
+    metrics.request_id.set(worker_id)
+    metrics.log(f"Index worker {index} started")
+    if metrics.enabled and settings.WORKER_METRICS_PORT:
+        # one port per worker process, as each keeps its own metrics
+        port = settings.WORKER_METRICS_PORT + index
+        metrics.serve(port)
+        metrics.log(f"Serving metrics on :{port}/metrics")
+
+    while not shutdown.is_set():
+        with Session(engine) as session:
+            job = claim_job(session, worker_id)
+        if job is None:
+            shutdown.wait(settings.INDEX_JOB_POLL_INTERVAL)
+            continue
+
+        # the job id prefixes this job's log lines, the indexer's and the heartbeat's
+        token = metrics.request_id.set(f"job-{job.id}")
+        metrics.log(f"{worker_id} indexing repo {job.repo_id} (attempt {job.attempts}/{job.max_attempts})")
+        stop_heartbeat = threading.Event()
+        lost = threading.Event()
+        beat = threading.Thread(
+            target=contextvars.copy_context().run,
+            args=(_heartbeat_loop, job.id, worker_id, stop_heartbeat, lost),
+            daemon=True,
+        )
+        beat.start()
+        try:
+            with metrics.timer(metrics.INDEX_RUN_SECONDS):
+                index_repo(job.repo_id, cancel=lost)
+        except IndexCancelled:
+            metrics.log("Abandoned to its new owner")
+        except Exception as e:
+            metrics.log(f"Failed: {traceback.format_exc().rstrip()}")
+            with Session(engine) as session:
+                if not fail_job(session, job.id, worker_id, f"{type(e).__name__}: {e}"):
+                    metrics.log("Failed after another worker reclaimed it")
+        else:
+            with Session(engine) as session:
+                if not complete_job(session, job.id, worker_id):
+                    metrics.log("Finished after another worker reclaimed it")
+        finally:
+            stop_heartbeat.set()
+            beat.join()
+            metrics.request_id.reset(token)
+
+    metrics.log(f"Index worker {index} stopped")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run index worker processes.")
+    parser.add_argument("--processes", type=int, default=settings.INDEX_WORKER_PROCESSES)
+    args = parser.parse_args()
+
+    # spawn so each worker opens its own DB connections instead of sharing the parent's
+    ctx = mp.get_context("spawn")
+    stopping = threading.Event()
+
+    def start(index: int) -> mp.Process:
+        proc = ctx.Process(target=run_worker, args=(index,), name=f"index-worker-{index}")
+        proc.start()
+        return proc
+
+    def stop(*_):
+        stopping.set()
+        for p in procs.values():
+            if p.is_alive():
+                p.terminate()
+
+    procs = {i: start(i) for i in range(args.processes)}
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    # Replace workers that die (OOM kill, segfault, ...) so the pool keeps its
+    # size; their jobs are reclaimed once their heartbeats go stale
+    while not stopping.is_set():
+        wait([p.sentinel for p in procs.values()], timeout=settings.INDEX_JOB_POLL_INTERVAL)
+        for index, p in list(procs.items()):
+            if p.is_alive() or stopping.is_set():
+                continue
+            metrics.log(f"Index worker {index} (pid {p.pid}) exited with code {p.exitcode}, starting a replacement")
+            # don't spin on a worker that dies at startup
+            time.sleep(WORKER_RESTART_DELAY)
+            if not stopping.is_set():
+                procs[index] = start(index)
+
+    for p in procs.values():
+        p.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+# -------------------------------------------------------------------------
+# Question normalization
+# -------------------------------------------------------------------------
+
+def message_text(message: Dict[str, Any]) -> str:
+    """
+    Text of a chat message as sent by the frontend: a string or a list of parts.
+    """
+    content = message.get("content", "")
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if part.get("type") == "text")
+    return content if isinstance(content, str) else ""
+
+
+def normalize_question(question: str) -> str:
+    """
+    Folds case, whitespace and trailing punctuation so trivially different
+    phrasings of a question share an exact-match key.
+    """
+    return re.sub(r"\s+", " ", question).strip().rstrip("?.!").strip().lower()
+
+# -------------------------------------------------------------------------
+# Answer cache
+# -------------------------------------------------------------------------
+
+@dataclass
+class CachedAnswer:
+    question: str
+    embedding: np.ndarray
+    answer: str
+    tokens: int
+    created_at: float
+    # the agent's execution plan that produced the answer
+    plan: Optional[str] = None
+
+
+Scope = Tuple[str, str]  # (repo ids, their indexed commits @ the embedding model questions are compared under)
+
+
+class AnswerCache:
+    """
+    In-process cache of finished chat answers, scoped to a repo's indexed commit
+    so a re-index invalidates it. Lookups try the normalized question first, then
+    the nearest cached question of the same scope by cosine similarity.
+    Entries expire after `ttl` seconds and the least recently used are evicted
+    beyond `max_entries`.
+    """
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        ttl: Optional[float] = None,
+        min_similarity: Optional[float] = None,
+    ):
+        self.max_entries = settings.ANSWER_CACHE_SIZE if max_entries is None else max_entries
+        self.ttl = settings.ANSWER_CACHE_TTL if ttl is None else ttl
+        self.min_similarity = settings.ANSWER_CACHE_MIN_SIMILARITY if min_similarity is None else min_similarity
+
+        # LRU order over every entry; each scope also indexes its own entries
+        self._lru: "OrderedDict[Tuple[Scope, str], None]" = OrderedDict()
+        self._scopes: Dict[Scope, Dict[str, CachedAnswer]] = {}
+
+        self.lookups = 0
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.saved_tokens = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.exact_hits + self.semantic_hits
+        return {
+            "entries": len(self._lru),
+            "lookups": self.lookups,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "hit_rate": hits / self.lookups if self.lookups else 0.0,
+            "saved_tokens": self.saved_tokens,
+        }
+
+    def _touch(self, scope: Scope, key: str) -> None:
+        self._lru.move_to_end((scope, key))
+
+    def _remove(self, scope: Scope, key: str) -> None:
+        self._lru.pop((scope, key), None)
+        entries = self._scopes.get(scope)
+        if entries is not None:
+            entries.pop(key, None)
+            if not entries:
+                del self._scopes[scope]
+
+    def _live_entries(self, repo_id: str, commit: str) -> Dict[str, CachedAnswer]:
+        """
+        Entries of the current scope, after dropping expired ones and any left
+        over from the repo's previous commits.
+        """
+        for scope in [s for s in self._scopes if s[0] == repo_id and s[1] != commit]:
+            for key in list(self._scopes[scope]):
+                self._remove(scope, key)
+
+        scope = (repo_id, commit)
+        entries = self._scopes.get(scope, {})
+        cutoff = time.time() - self.ttl
+        for key in [k for k, e in entries.items() if e.created_at < cutoff]:
+            self._remove(scope, key)
+        return self._scopes.get(scope, {})
+
+    def _hit(self, scope: Scope, key: str, entry: CachedAnswer, semantic: bool) -> CachedAnswer:
+        self._touch(scope, key)
+        if semantic:
+            self.semantic_hits += 1
+        else:
+            self.exact_hits += 1
+        self.saved_tokens += entry.tokens
+        return entry
+
+    async def lookup(
+        self,
+        repo_id: str,
+        commit: str,
+        question: str,
+        embed: Callable[[str], Awaitable[List[float]]],
+    ) -> Tuple[Optional[CachedAnswer], Optional[List[float]]]:
+        """
+        Returns (cached answer or None, question embedding). The question is only
+        embedded when the exact match misses; the embedding is returned so the
+        graph doesn't compute it again.
+        """
+        self.lookups += 1
+        scope = (repo_id, commit)
+        key = normalize_question(question)
+        entries = self._live_entries(repo_id, commit)
+        if key in entries:
+            return self._hit(scope, key, entries[key], semantic=False), None
+
+        embedding = await embed(question)
+        if entries:
+            keys = list(entries)
+            matrix = np.stack([entries[k].embedding for k in keys])
+            query = np.asarray(embedding, dtype=np.float32)
+            sims = matrix @ (query / (np.linalg.norm(query) or 1.0))
+            best = int(np.argmax(sims))
+            if sims[best] >= self.min_similarity:
+                return self._hit(scope, keys[best], entries[keys[best]], semantic=True), embedding
+        return None, embedding
+
+    def put(
+        self,
+        repo_id: str,
+        commit: str,
+        question: str,
+        embedding: List[float],
+        answer: str,
+        tokens: int,
+        plan: Optional[str] = None,
+    ) -> None:
+        if not self.enabled or not answer:
+            return
+        scope = (repo_id, commit)
+        key = normalize_question(question)
+        vec = np.asarray(embedding, dtype=np.float32)
+        vec = vec / (np.linalg.norm(vec) or 1.0)
+        self._scopes.setdefault(scope, {})[key] = CachedAnswer(question, vec, answer, tokens, time.time(), plan)
+        self._lru[(scope, key)] = None
+        self._touch(scope, key)
+        while len(self._lru) > self.max_entries:
+            (old_scope, old_key), _ = self._lru.popitem(last=False)
+            self._remove(old_scope, old_key)
+
+
+answer_cache = AnswerCache()
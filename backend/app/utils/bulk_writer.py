@@ -0,0 +1,161 @@
+import io
+import struct
+import time
+from datetime import datetime, timezone
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import insert
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.models import File
+from app.utils import metrics
+
+# -------------------------------------------------------------------------
+# Binary COPY encoding
+# -------------------------------------------------------------------------
+
+COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+COPY_TRAILER = struct.pack("!h", -1)
+CHUNK_COLUMNS = ("file_id", "start_line", "end_line", "content", "embedding")
+
+
+def _int4(value: Optional[int]) -> bytes:
+    if value is None:
+        return struct.pack("!i", -1)
+    return struct.pack("!ii", 4, value)
+
+
+def _text(value: str) -> bytes:
+    # Postgres text can't hold NUL bytes
+    data = value.replace("\x00", "").encode("utf-8")
+    return struct.pack("!i", len(data)) + data
+
+
+def _vector(value: Optional[Sequence[float]]) -> bytes:
+    """
+    pgvector's binary format: int16 dimensions, int16 unused, then big-endian float4s.
+    """
+    if value is None:
+        return struct.pack("!i", -1)
+    arr = np.asarray(value, dtype=">f4")
+    data = struct.pack("!hh", arr.shape[0], 0) + arr.tobytes()
+    return struct.pack("!i", len(data)) + data
+
+
+def encode_chunk_rows(rows: Sequence[Tuple[int, int, int, str, Sequence[float]]]) -> bytes:
+    """
+    Encodes (file_id, start_line, end_line, content, embedding) rows as a binary COPY stream.
+    """
+    buf = io.BytesIO()
+    buf.write(COPY_HEADER)
+    field_count = struct.pack("!h", len(CHUNK_COLUMNS))
+    for file_id, start_line, end_line, content, embedding in rows:
+        buf.write(field_count)
+        buf.write(_int4(file_id))
+        buf.write(_int4(start_line))
+        buf.write(_int4(end_line))
+        buf.write(_text(content))
+        buf.write(_vector(embedding))
+    buf.write(COPY_TRAILER)
+    return buf.getvalue()
+
+# -------------------------------------------------------------------------
+# Writer
+# -------------------------------------------------------------------------
+
+class BulkWriter:
+    """
+    Buffers finished files and writes them in batches: the file rows in one
+    INSERT ... RETURNING, their chunks with a binary COPY, then a commit.
+
+    Committing per batch keeps memory flat and means a crash only loses the
+    files still in the buffer. A batch is also written once its oldest file has
+    waited `flush_seconds`, so slow embedding doesn't hold finished files back.
+
+    `on_flush(session, files, chunks, bytes)` runs before each commit, so
+    anything it writes is committed with the batch.
+    """
+    def __init__(
+        self,
+        session: Session,
+        repo_id: int,
+        batch_files: Optional[int] = None,
+        batch_chunks: Optional[int] = None,
+        flush_seconds: Optional[float] = None,
+        on_flush: Optional[Callable[[Session, int, int, int], None]] = None,
+    ):
+        self.session = session
+        self.repo_id = repo_id
+        self.batch_files = batch_files or settings.INDEX_WRITE_BATCH_FILES
+        self.batch_chunks = batch_chunks or settings.INDEX_WRITE_BATCH_CHUNKS
+        self.flush_seconds = flush_seconds or settings.INDEX_WRITE_FLUSH_SECONDS
+        self.on_flush = on_flush
+
+        self.files_written = 0
+        self.chunks_written = 0
+        self._files: List[dict] = []
+        self._chunks: List[List[Tuple[int, int, str, Sequence[float]]]] = []
+        self._buffered_chunks = 0
+        self._buffered_since = 0.0
+
+    def add(
+        self,
+        path: str,
+        blob_sha: Optional[str],
+        chunks: List[Tuple[int, int, str, Sequence[float]]],
+        size: Optional[int] = None,
+    ) -> None:
+        """
+        Queues one file with its (start_line, end_line, content, embedding) chunks.
+        """
+        if not self._files:
+            self._buffered_since = time.monotonic()
+        self._files.append({
+            "repo_id": self.repo_id,
+            "path": path,
+            "blob_sha": blob_sha,
+            "size": size,
+            "indexed_at": datetime.now(timezone.utc),
+        })
+        self._chunks.append(chunks)
+        self._buffered_chunks += len(chunks)
+        if (
+            len(self._files) >= self.batch_files
+            or self._buffered_chunks >= self.batch_chunks
+            or time.monotonic() - self._buffered_since >= self.flush_seconds
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._files:
+            return
+
+        with metrics.timer(metrics.INDEX_WRITE_SECONDS):
+            file_ids = self.session.execute(
+                insert(File).returning(File.id, sort_by_parameter_order=True),
+                self._files,
+            ).scalars().all()
+
+            rows = [
+                (file_id, start_line, end_line, content, embedding)
+                for file_id, chunks in zip(file_ids, self._chunks)
+                for start_line, end_line, content, embedding in chunks
+            ]
+            if rows:
+                dbapi_conn = self.session.connection().connection
+                with dbapi_conn.cursor() as cur:
+                    cur.copy_expert(
+                        f"COPY codechunk ({', '.join(CHUNK_COLUMNS)}) FROM STDIN WITH (FORMAT binary)",
+                        io.BytesIO(encode_chunk_rows(rows)),
+                    )
+            if self.on_flush:
+                size = sum(f["size"] or 0 for f in self._files)
+                self.on_flush(self.session, len(self._files), len(rows), size)
+            self.session.commit()
+
+        metrics.INDEX_CHUNKS_WRITTEN.inc(len(rows))
+        self.files_written += len(self._files)
+        self.chunks_written += len(rows)
+        self._files, self._chunks, self._buffered_chunks = [], [], 0
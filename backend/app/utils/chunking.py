@@ -0,0 +1,319 @@
+import ast
+import re
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, TextIO, Tuple
+
+from app.core.config import settings
+from app.utils.tokens import CHARS_PER_TOKEN
+
+# -------------------------------------------------------------------------
+# Chunks and splitters
+# -------------------------------------------------------------------------
+
+class Chunk(NamedTuple):
+    start_line: int
+    end_line: int
+    content: str
+
+
+# A splitter streams a file's lines, each tagged with the nesting level at which
+# a unit (definition, statement, section) ends after it, or None if none does.
+# Level 0 is top level; deeper levels are only cut when a unit is over budget.
+Splitter = Callable[[TextIO], Iterator[Tuple[str, Optional[int]]]]
+
+
+def paragraph_splitter(f: TextIO) -> Iterator[Tuple[str, Optional[int]]]:
+    """
+    Cuts at blank lines. Fallback for anything without a smarter splitter.
+    """
+    for line in f:
+        yield line, 0 if not line.strip() else None
+
+
+def heading_splitter(pattern: str) -> Splitter:
+    """
+    Cuts before each line matching `pattern` (a heading or section header),
+    then at blank lines. Fenced code blocks are never cut.
+    """
+    heading = re.compile(pattern)
+    fence = re.compile(r"^\s*(```|~~~)")
+
+    def split(f: TextIO) -> Iterator[Tuple[str, Optional[int]]]:
+        prev: Optional[str] = None
+        in_fence = False
+        for line in f:
+            starts_section = not in_fence and bool(heading.match(line))
+            if fence.match(line):
+                in_fence = not in_fence
+            if prev is not None:
+                yield prev, 0 if starts_section else (1 if not prev.strip() else None)
+            prev = line
+        if prev is not None:
+            yield prev, 0
+
+    return split
+
+
+def python_splitter(f: TextIO) -> Iterator[Tuple[str, Optional[int]]]:
+    """
+    Cuts after each statement, using `ast` for exact statement spans, so a
+    top-level def/class (with its decorators and leading comments) stays whole.
+    Statement bodies are one level deeper. Falls back to blank lines when the
+    file doesn't parse, or is over CHUNK_MAX_PARSE_CHARS: parsing holds the
+    whole file and its AST in memory.
+    """
+    limit = settings.CHUNK_MAX_PARSE_CHARS
+    source = f.read(limit + 1)
+    levels = None
+    if len(source) <= limit:
+        try:
+            levels = _python_levels(ast.parse(source))
+        except (SyntaxError, ValueError, RecursionError):
+            pass
+    del source
+    f.seek(0)
+    if levels is None:
+        yield from paragraph_splitter(f)
+        return
+
+    for lineno, line in enumerate(f, 1):
+        yield line, levels.get(lineno)
+
+
+def _python_levels(tree: ast.Module) -> Dict[int, int]:
+    """
+    Maps each line a statement ends on to the shallowest nesting level ending there.
+    """
+    levels: Dict[int, int] = {}
+    stack: List[Tuple[list, int]] = [(tree.body, 0)]
+    while stack:
+        body, depth = stack.pop()
+        for node in body:
+            end = node.end_lineno
+            levels[end] = min(levels.get(end, depth), depth)
+            for name in ("body", "orelse", "finalbody", "handlers"):
+                child = getattr(node, name, None)
+                if isinstance(child, list) and child and isinstance(child[0], ast.AST):
+                    stack.append((child, depth + 1))
+    return levels
+
+
+def brace_splitter(char_literals: bool = False, multiline_quotes: str = "`") -> Splitter:
+    """
+    Cuts brace languages with a lightweight tokenizer that tracks bracket depth
+    while skipping strings and comments. A line ends a unit at its closing depth
+    when it is blank or its last token is one of `; , } ) ]`, so a top-level
+    function or class ends at its closing brace.
+
+    With `char_literals`, `'` only opens a short char literal (C, Java, Rust, Go),
+    so Rust lifetimes and similar don't swallow the rest of the line.
+    """
+    def split(f: TextIO) -> Iterator[Tuple[str, Optional[int]]]:
+        depth = 0
+        quote: Optional[str] = None
+        in_comment = False
+        for line in f:
+            last: Optional[str] = None
+            i, n = 0, len(line)
+            while i < n:
+                c = line[i]
+                if in_comment:
+                    end = line.find("*/", i)
+                    if end == -1:
+                        break
+                    in_comment = False
+                    i = end + 2
+                    continue
+                if quote:
+                    if c == "\\":
+                        i += 2
+                        continue
+                    if c == quote:
+                        quote = None
+                        last = c
+                    i += 1
+                    continue
+                nxt = line[i + 1] if i + 1 < n else ""
+                if c == "/" and nxt == "/":
+                    break
+                if c == "/" and nxt == "*":
+                    in_comment = True
+                    i += 2
+                    continue
+                if c == "'" and char_literals:
+                    end = line.find("'", i + 1, i + 12)
+                    if end != -1 and (end == i + 2 or line[i + 1] == "\\"):
+                        i = end + 1
+                        last = "'"
+                        continue
+                elif c in "\"'`":
+                    quote = c
+                elif c in "{([":
+                    depth += 1
+                elif c in "})]":
+                    depth = max(0, depth - 1)
+                if not c.isspace():
+                    last = c
+                i += 1
+            if quote and quote not in multiline_quotes:
+                # unterminated single-line string: don't let it leak into the next line
+                quote = None
+
+            if quote or in_comment:
+                level = None
+            elif not line.strip() or (last is not None and last in ";,})]"):
+                level = depth
+            else:
+                level = None
+            yield line, level
+
+    return split
+
+
+# -------------------------------------------------------------------------
+# Splitters by file type
+# -------------------------------------------------------------------------
+
+MARKDOWN_SPLITTER = heading_splitter(r"^#{1,6}\s")
+SECTION_SPLITTER = heading_splitter(r"^\s*\[")
+C_LIKE_SPLITTER = brace_splitter(char_literals=True)
+SCRIPT_SPLITTER = brace_splitter()
+
+SPLITTERS_BY_EXTENSION: Dict[str, Splitter] = {
+    ".py": python_splitter,
+    ".js": SCRIPT_SPLITTER,
+    ".ts": SCRIPT_SPLITTER,
+    ".jsx": SCRIPT_SPLITTER,
+    ".tsx": SCRIPT_SPLITTER,
+    ".php": SCRIPT_SPLITTER,
+    ".css": SCRIPT_SPLITTER,
+    ".json": SCRIPT_SPLITTER,
+    ".graphql": SCRIPT_SPLITTER,
+    ".java": C_LIKE_SPLITTER,
+    ".go": C_LIKE_SPLITTER,
+    ".rs": C_LIKE_SPLITTER,
+    ".cpp": C_LIKE_SPLITTER,
+    ".c": C_LIKE_SPLITTER,
+    ".h": C_LIKE_SPLITTER,
+    ".swift": C_LIKE_SPLITTER,
+    ".kt": C_LIKE_SPLITTER,
+    ".md": MARKDOWN_SPLITTER,
+    ".toml": SECTION_SPLITTER,
+    ".ini": SECTION_SPLITTER,
+}
+
+
+def register_splitter(extension: str, splitter: Splitter) -> None:
+    SPLITTERS_BY_EXTENSION[extension.lower()] = splitter
+
+
+def splitter_for(path: str) -> Splitter:
+    return SPLITTERS_BY_EXTENSION.get(Path(path).suffix.lower(), paragraph_splitter)
+
+
+# -------------------------------------------------------------------------
+# Packing units into chunks
+# -------------------------------------------------------------------------
+
+# (line number, text, level)
+Line = Tuple[int, str, Optional[int]]
+
+
+def _make_chunk(lines: List[Line]) -> Optional[Chunk]:
+    start, end = 0, len(lines)
+    while start < end and not lines[start][1].strip():
+        start += 1
+    while end > start and not lines[end - 1][1].strip():
+        end -= 1
+    if start == end:
+        return None
+    content = "".join(text for _, text, _ in lines[start:end]).rstrip()
+    return Chunk(lines[start][0], lines[end - 1][0], content)
+
+
+def _cut(buf: List[Line], max_chars: int, carried: int) -> int:
+    """
+    Picks where to end the next chunk: after the shallowest cut point that keeps
+    the chunk within `max_chars` (the latest one among equals), else after as
+    many lines as fit. Never cuts inside the `carried` overlap lines.
+    Returns 0 if not even one new line fits.
+    """
+    best, best_level, fits = 0, None, 0
+    size = 0
+    for i, (_, text, level) in enumerate(buf):
+        size += len(text)
+        if size > max_chars:
+            break
+        fits = i + 1
+        if i >= carried and level is not None and (best_level is None or level <= best_level):
+            best, best_level = i + 1, level
+    if best:
+        return best
+    return fits if fits > carried else 0
+
+
+def _pack(lines: Iterable[Line], max_chars: int, overlap_lines: int) -> Iterator[Chunk]:
+    """
+    Buffers lines until they overflow `max_chars`, then emits a chunk up to the
+    best cut point and keeps the rest, so at most one chunk (plus one line) is
+    held at a time however large the file or its top-level units are. Each chunk
+    starts with the last `overlap_lines` lines of the previous one.
+    """
+    buf: List[Line] = []
+    size = 0
+    carried = 0
+    for line in lines:
+        buf.append(line)
+        size += len(line[1])
+        while size > max_chars:
+            cut = _cut(buf, max_chars, carried)
+            if cut == 0 and carried:
+                # the overlap leaves no room for the next line: drop it
+                buf = buf[carried:]
+                carried = 0
+                size = sum(len(text) for _, text, _ in buf)
+                continue
+            if cut == 0:
+                # a single line over budget: emit it in slices
+                lineno, text, level = buf[0]
+                chunk = _make_chunk([(lineno, text[:max_chars], None)])
+                if chunk:
+                    yield chunk
+                buf[0] = (lineno, text[max_chars:], level)
+                size -= min(len(text), max_chars)
+                continue
+
+            chunk = _make_chunk(buf[:cut])
+            if chunk:
+                yield chunk
+            tail = buf[max(0, cut - overlap_lines):cut] if overlap_lines else []
+            buf = tail + buf[cut:]
+            carried = len(tail)
+            size = sum(len(text) for _, text, _ in buf)
+
+    if len(buf) > carried:
+        chunk = _make_chunk(buf)
+        if chunk:
+            yield chunk
+
+
+def chunk_file(
+    path: str,
+    f: TextIO,
+    max_tokens: Optional[int] = None,
+    overlap_lines: Optional[int] = None,
+) -> Iterator[Chunk]:
+    """
+    Streams the chunks of an open, seekable text file. Chunks break at the
+    definition boundaries of the file's language under a token budget, and
+    carry the 1-based first and last line they cover.
+    """
+    max_chars = (max_tokens or settings.CHUNK_MAX_TOKENS) * CHARS_PER_TOKEN
+    if overlap_lines is None:
+        overlap_lines = settings.CHUNK_OVERLAP_LINES
+
+    lines = (
+        (lineno, text, level)
+        for lineno, (text, level) in enumerate(splitter_for(path)(f), 1)
+    )
+    yield from _pack(lines, max_chars, overlap_lines)
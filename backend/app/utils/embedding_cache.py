@@ -0,0 +1,107 @@
+import hashlib
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.models import CachedEmbedding
+
+# -------------------------------------------------------------------------
+# Content-addressed embedding cache
+# -------------------------------------------------------------------------
+
+def content_hash(model: str, text: str) -> str:
+    """
+    Cache key for a chunk: identical text embedded with the same model shares a key.
+    """
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class LRU:
+    """
+    Small in-process LRU of hash -> embedding, shared by all index runs in a process.
+    """
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[List[float]]:
+        value = self._items.get(key)
+        if value is not None:
+            self._items.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: List[float]) -> None:
+        if self.max_size <= 0:
+            return
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+
+_lru = LRU(settings.EMBEDDING_CACHE_LRU_SIZE)
+
+
+class EmbeddingCache:
+    """
+    Looks embeddings up in the in-process LRU, then in Postgres, and counts hits
+    and misses so each index run can report its hit rate.
+    """
+    def __init__(self, model: str, lru: LRU = _lru):
+        self.model = model
+        self.lru = lru
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get_many(self, session: Session, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """
+        Returns the cached embedding for each text, or None on a miss.
+        All LRU misses are looked up in a single query.
+        """
+        hashes = [content_hash(self.model, t) for t in texts]
+        found: Dict[str, List[float]] = {}
+        for h in hashes:
+            emb = self.lru.get(h)
+            if emb is not None:
+                found[h] = emb
+
+        lookup = {h for h in hashes if h not in found}
+        if lookup:
+            rows = session.exec(
+                select(CachedEmbedding.content_hash, CachedEmbedding.embedding)
+                .where(CachedEmbedding.content_hash.in_(lookup))
+            ).all()
+            for h, emb in rows:
+                emb = emb.tolist() if hasattr(emb, "tolist") else list(emb)
+                found[h] = emb
+                self.lru.put(h, emb)
+
+        result = [found.get(h) for h in hashes]
+        hits = sum(1 for emb in result if emb is not None)
+        self.hits += hits
+        self.misses += len(result) - hits
+        return result
+
+    def put_many(self, session: Session, texts: Sequence[str], embeddings: Sequence[List[float]]) -> None:
+        """
+        Stores freshly computed embeddings; concurrent writers of the same key are ignored.
+        """
+        now = datetime.now(timezone.utc)
+        rows = {}
+        for text, emb in zip(texts, embeddings):
+            h = content_hash(self.model, text)
+            rows[h] = {"content_hash": h, "model": self.model, "embedding": emb, "created_at": now}
+            self.lru.put(h, emb)
+        if rows:
+            session.execute(
+                insert(CachedEmbedding).values(list(rows.values())).on_conflict_do_nothing()
+            )
@@ -0,0 +1,284 @@
+import asyncio
+import json
+import os
+import queue
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from openai import AsyncOpenAI, OpenAI
+
+from app.core.config import settings
+from app.utils import metrics
+from app.utils.embeddings import embed_with_retry
+
+# -------------------------------------------------------------------------
+# Interface
+# -------------------------------------------------------------------------
+
+class EmbeddingProvider(ABC):
+    """
+    Turns texts into embeddings, for the indexer (`embed`, called from its
+    pipeline's worker threads) and for chat questions (`aembed`).
+
+    `name` is recorded on every repo indexed with the provider and keys the
+    embedding cache, so indexes built with different models can coexist;
+    `dimension` is the length of its vectors.
+    """
+    name: str
+    dimension: int
+    # defaults for the indexer's EmbeddingPipeline
+    batch_size: int
+    concurrency: int
+
+    @abstractmethod
+    def embed(self, texts: List[str], on_retry: Optional[Callable[[], None]] = None) -> List[List[float]]:
+        """
+        One embedding per text, in order; `on_retry` is called before each retry.
+        """
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.to_thread(self.embed, texts)
+
+# -------------------------------------------------------------------------
+# OpenAI
+# -------------------------------------------------------------------------
+
+OPENAI_DIMENSIONS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """
+    The OpenAI embeddings API. Its name is the bare model name, as the
+    embedding cache was keyed before providers were pluggable.
+    """
+    def __init__(self, model: str, client: Optional[OpenAI] = None, async_client: Optional[AsyncOpenAI] = None):
+        self.name = model
+        self.batch_size = settings.EMBEDDING_BATCH_SIZE
+        self.concurrency = settings.EMBEDDING_CONCURRENCY
+        # Index retries are handled by embed_with_retry so they can honour Retry-After with jitter
+        self.client = client or OpenAI(max_retries=0)
+        self.async_client = async_client or AsyncOpenAI()
+        self._dimension = OPENAI_DIMENSIONS.get(model)
+
+    @property
+    def dimension(self) -> int:
+        if self._dimension is None:
+            self._dimension = len(self.embed(["dimension probe"])[0])
+        return self._dimension
+
+    def embed(self, texts: List[str], on_retry: Optional[Callable[[], None]] = None) -> List[List[float]]:
+        return embed_with_retry(self.client, texts, self.name, settings.EMBEDDING_MAX_RETRIES, on_retry)
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        response = await self.async_client.embeddings.create(input=texts, model=self.name)
+        return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+
+# -------------------------------------------------------------------------
+# Local ONNX model on CPU
+# -------------------------------------------------------------------------
+
+LOCAL_PREFIX = "local:"
+
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """
+    A sentence-embedding model exported to ONNX, run on CPU with onnxruntime.
+
+    `model` is a directory, or a Hugging Face repo id to download, holding
+    tokenizer.json and model.onnx (or onnx/model.onnx), plus the optional
+    sentence-transformers 1_Pooling/config.json that picks CLS or mean
+    pooling. Embeddings are normalized to unit length.
+
+    The indexer's batches run on its own pipeline threads. Chat questions
+    arrive one at a time, so they are queued and run on a pool of `threads`
+    inference threads. A batch is taken from the queue when a thread is
+    free: up to `batch_size` questions that arrived while the previous
+    batches ran, after waiting up to `max_wait` seconds for more.
+    """
+    def __init__(
+        self,
+        model: str,
+        threads: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        max_wait: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+    ):
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise RuntimeError(
+                "EMBEDDING_PROVIDER=local needs the local-embeddings extra: poetry install -E local-embeddings"
+            ) from e
+
+        self.name = LOCAL_PREFIX + model
+        self.concurrency = threads or settings.LOCAL_EMBEDDING_THREADS or min(4, os.cpu_count() or 1)
+        self.batch_size = batch_size or settings.LOCAL_EMBEDDING_BATCH_SIZE
+        self.max_wait = settings.LOCAL_EMBEDDING_MAX_WAIT if max_wait is None else max_wait
+        max_tokens = max_tokens or settings.LOCAL_EMBEDDING_MAX_TOKENS
+
+        model_file, tokenizer_file, pooling_file = _model_files(model)
+        self.tokenizer = Tokenizer.from_file(tokenizer_file)
+        self.tokenizer.enable_truncation(max_tokens)
+        self.tokenizer.enable_padding()
+        self.pooling = "mean"
+        if pooling_file:
+            with open(pooling_file) as f:
+                if json.load(f).get("pooling_mode_cls_token"):
+                    self.pooling = "cls"
+
+        options = onnxruntime.SessionOptions()
+        # the pool's threads split the cores between them
+        options.intra_op_num_threads = max(1, (os.cpu_count() or 1) // self.concurrency)
+        options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(model_file, options, providers=["CPUExecutionProvider"])
+        self.inputs = {i.name for i in self.session.get_inputs()}
+        self.dimension = self.session.get_outputs()[0].shape[-1]
+        if not isinstance(self.dimension, int):
+            self.dimension = len(self._run(["dimension probe"])[0])
+        self._start_batcher()
+
+    def _start_batcher(self) -> None:
+        self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="local-embed")
+        self._free = threading.Semaphore(self.concurrency)
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._batcher = threading.Thread(target=self._batch_loop, name="local-embed-batcher", daemon=True)
+        self._batcher.start()
+
+    def _run(self, texts: List[str]) -> List[List[float]]:
+        encodings = self.tokenizer.encode_batch(texts)
+        ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feed = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self.inputs:
+            feed["token_type_ids"] = np.zeros_like(ids)
+        hidden = self.session.run(None, {k: v for k, v in feed.items() if k in self.inputs})[0]
+        if self.pooling == "cls":
+            pooled = hidden[:, 0]
+        else:
+            weights = mask[:, :, None].astype(hidden.dtype)
+            pooled = (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+        pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return pooled.tolist()
+
+    def embed(self, texts: List[str], on_retry: Optional[Callable[[], None]] = None) -> List[List[float]]:
+        """
+        Embeds on the calling thread, `batch_size` texts at a time. Texts are
+        sorted by length first, so each batch pads to a similar length.
+        """
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        out: List[Optional[List[float]]] = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            idx = order[start:start + self.batch_size]
+            with metrics.timer(metrics.EMBEDDING_SECONDS, caller="index"):
+                vectors = self._run([texts[i] for i in idx])
+            for i, vec in zip(idx, vectors):
+                out[i] = vec
+        return out
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        futures = []
+        for text in texts:
+            future: Future = Future()
+            self._queue.put((text, future))
+            futures.append(asyncio.wrap_future(future))
+        return list(await asyncio.gather(*futures))
+
+    def _batch_loop(self) -> None:
+        while True:
+            self._free.acquire()
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.perf_counter())))
+                except queue.Empty:
+                    break
+            self._pool.submit(self._run_batch, batch)
+
+    def _run_batch(self, batch: List[Tuple[str, Future]]) -> None:
+        try:
+            # drops callers cancelled while queued; the rest can no longer be cancelled
+            batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                return
+            vectors = self._run([text for text, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        finally:
+            self._free.release()
+        for (_, future), vec in zip(batch, vectors):
+            future.set_result(vec)
+
+
+def _model_files(model: str) -> Tuple[str, str, Optional[str]]:
+    """
+    (model.onnx, tokenizer.json, pooling config or None) of a local directory
+    or, failing that, a Hugging Face repo.
+    """
+    if os.path.isdir(model):
+        def find(*names: str) -> Optional[str]:
+            return next((os.path.join(model, n) for n in names if os.path.exists(os.path.join(model, n))), None)
+    else:
+        from huggingface_hub import hf_hub_download
+        from huggingface_hub.utils import EntryNotFoundError
+
+        def find(*names: str) -> Optional[str]:
+            for n in names:
+                try:
+                    return hf_hub_download(model, n)
+                except EntryNotFoundError:
+                    continue
+            return None
+
+    model_file = find("model.onnx", "onnx/model.onnx")
+    tokenizer_file = find("tokenizer.json")
+    if not model_file or not tokenizer_file:
+        raise RuntimeError(f"No model.onnx and tokenizer.json found for local embedding model {model}")
+    return model_file, tokenizer_file, find("1_Pooling/config.json")
+
+# -------------------------------------------------------------------------
+# Registry
+# -------------------------------------------------------------------------
+
+_providers: Dict[str, EmbeddingProvider] = {}
+_lock = threading.Lock()
+
+
+def default_model() -> str:
+    """
+    The name of the provider new index runs use: EMBEDDING_PROVIDER's model.
+    """
+    if settings.EMBEDDING_PROVIDER == "local":
+        return LOCAL_PREFIX + settings.LOCAL_EMBEDDING_MODEL
+    if settings.EMBEDDING_PROVIDER != "openai":
+        raise ValueError(f"Unknown EMBEDDING_PROVIDER {settings.EMBEDDING_PROVIDER!r}")
+    return settings.EMBEDDING_MODEL
+
+
+def get_provider(name: Optional[str] = None) -> EmbeddingProvider:
+    """
+    The provider for a recorded name (a repo's embedding_model), or the
+    default one. Providers are created once per process; a local model is
+    loaded on first use.
+    """
+    name = name or default_model()
+    with _lock:
+        provider = _providers.get(name)
+        if provider is None:
+            if name.startswith(LOCAL_PREFIX):
+                provider = LocalEmbeddingProvider(name[len(LOCAL_PREFIX):])
+            else:
+                provider = OpenAIEmbeddingProvider(name)
+            _providers[name] = provider
+        return provider
@@ -0,0 +1,202 @@
+import contextvars
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import openai
+from openai import OpenAI
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.utils import metrics
+from app.utils.embedding_cache import EmbeddingCache
+from app.utils.tokens import estimate_tokens
+
+if TYPE_CHECKING:
+    from app.utils.embedding_providers import EmbeddingProvider
+
+# -------------------------------------------------------------------------
+# Retries
+# -------------------------------------------------------------------------
+
+# 429s, 5xx responses, timeouts and dropped connections are worth retrying;
+# anything else (bad request, auth) fails the same way every time.
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APIConnectionError,
+)
+
+
+def parse_retry_after(exc: Exception) -> Optional[float]:
+    """
+    Reads the server's requested delay, in seconds, from a failed response.
+    """
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """
+    Full-jitter exponential backoff, or the server's Retry-After when it sent one.
+    """
+    cap = settings.EMBEDDING_BACKOFF_MAX
+    if retry_after is not None:
+        return min(retry_after, cap) + random.uniform(0, settings.EMBEDDING_BACKOFF_BASE)
+    return random.uniform(0, min(cap, settings.EMBEDDING_BACKOFF_BASE * 2 ** attempt))
+
+
+def embed_with_retry(client: OpenAI, texts: List[str], model: str, max_retries: int, on_retry=None) -> List[List[float]]:
+    """
+    Embeds one request's worth of texts, retrying transient failures.
+    Raises the last error once retries are exhausted, so no chunk is dropped silently.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            with metrics.timer(metrics.EMBEDDING_SECONDS, caller="index"):
+                response = client.embeddings.create(input=texts, model=model)
+            if response.usage is not None:
+                metrics.record_embedding_tokens("index", response.usage.prompt_tokens)
+            return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+        except RETRYABLE_ERRORS as e:
+            if attempt == max_retries:
+                raise
+            delay = backoff_delay(attempt, parse_retry_after(e))
+            metrics.log(f"Embedding request failed ({type(e).__name__}), retry {attempt + 1}/{max_retries} in {delay:.1f}s")
+            metrics.EMBEDDING_RETRIES.inc(caller="index")
+            if on_retry:
+                on_retry()
+            time.sleep(delay)
+    raise AssertionError("unreachable")
+
+# -------------------------------------------------------------------------
+# Batching
+# -------------------------------------------------------------------------
+
+def pack_batches(
+    items: Iterable[Tuple[Any, str]],
+    max_tokens: int,
+    max_items: int,
+) -> Iterator[List[Tuple[Any, str]]]:
+    """
+    Groups (key, text) pairs into batches under a token budget and item cap,
+    regardless of which file each text came from.
+    """
+    batch: List[Tuple[Any, str]] = []
+    tokens = 0
+    for key, text in items:
+        n = estimate_tokens(text)
+        if batch and (tokens + n > max_tokens or len(batch) >= max_items):
+            yield batch
+            batch, tokens = [], 0
+        batch.append((key, text))
+        tokens += n
+    if batch:
+        yield batch
+
+# -------------------------------------------------------------------------
+# Pipeline
+# -------------------------------------------------------------------------
+
+class EmbeddingPipeline:
+    """
+    Embeds a stream of (key, text) pairs with up to `concurrency` provider
+    calls in flight (by default the provider's own concurrency and batch size).
+
+    Cache lookups and writes happen on the calling thread (they share its session);
+    only the provider calls run on the worker threads. Results are yielded as
+    (key, embedding) in completion order.
+    """
+    def __init__(
+        self,
+        provider: "EmbeddingProvider",
+        cache: EmbeddingCache,
+        concurrency: Optional[int] = None,
+        batch_tokens: Optional[int] = None,
+        batch_size: Optional[int] = None,
+    ):
+        self.provider = provider
+        self.cache = cache
+        self.concurrency = concurrency or provider.concurrency
+        self.batch_tokens = batch_tokens or settings.EMBEDDING_BATCH_TOKENS
+        self.batch_size = batch_size or provider.batch_size
+
+        self.chunks = 0
+        self.requests = 0
+        self.tokens_sent = 0
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def _count_retry(self) -> None:
+        with self._lock:
+            self.retries += 1
+
+    def _submit(self, pool: ThreadPoolExecutor, texts: List[str]) -> Future:
+        self.requests += 1
+        self.tokens_sent += sum(estimate_tokens(t) for t in texts)
+        # run in a copy of the caller's context so log lines keep its job id
+        return pool.submit(contextvars.copy_context().run, self.provider.embed, texts, self._count_retry)
+
+    def _complete(self, session: Session, future: Future, pending: Tuple[List[Tuple[Any, str]], List[str]]):
+        misses, texts = pending
+        embeddings = future.result()
+        self.cache.put_many(session, texts, embeddings)
+        by_text = dict(zip(texts, embeddings))
+        for key, text in misses:
+            self.chunks += 1
+            yield key, by_text[text]
+
+    def run(self, session: Session, items: Iterable[Tuple[Any, str]]) -> Iterator[Tuple[Any, List[float]]]:
+        in_flight: Dict[Future, Tuple[List[Tuple[Any, str]], List[str]]] = {}
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="embed") as pool:
+            try:
+                for batch in pack_batches(items, self.batch_tokens, self.batch_size):
+                    cached = self.cache.get_many(session, [text for _, text in batch])
+                    misses = []
+                    for (key, text), emb in zip(batch, cached):
+                        if emb is None:
+                            misses.append((key, text))
+                        else:
+                            self.chunks += 1
+                            yield key, emb
+                    if not misses:
+                        continue
+
+                    texts = list(dict.fromkeys(text for _, text in misses))
+                    in_flight[self._submit(pool, texts)] = (misses, texts)
+
+                    if len(in_flight) >= self.concurrency:
+                        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            yield from self._complete(session, future, in_flight.pop(future))
+
+                for future in as_completed(list(in_flight)):
+                    yield from self._complete(session, future, in_flight.pop(future))
+            except BaseException:
+                for future in in_flight:
+                    future.cancel()
+                raise
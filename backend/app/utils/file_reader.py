@@ -0,0 +1,139 @@
+import io
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterator, Optional, Union
+
+from app.core.config import settings
+
+# -------------------------------------------------------------------------
+# Size, binary and generated-file guards
+# -------------------------------------------------------------------------
+
+# Extensions that are as often data dumps and fixtures as hand-written text
+DATA_EXTENSIONS = {".json", ".txt", ".sql", ".html"}
+
+# Prose legitimately has long unwrapped lines, so it is never treated as minified
+PROSE_EXTENSIONS = {".md", ".rst", ".adoc"}
+
+SAMPLE_BYTES = 8192
+GENERATED_MARKERS = (b"@generated", b"do not edit", b"auto-generated", b"autogenerated", b"code generated by")
+MINIFIED_AVG_LINE = 300
+
+# Control bytes that show up in text files
+TEXT_CONTROL_BYTES = set(b"\t\n\r\f\b")
+
+
+def size_limit(path: str) -> int:
+    if Path(path).suffix.lower() in DATA_EXTENSIONS:
+        return settings.INDEX_MAX_DATA_FILE_BYTES
+    return settings.INDEX_MAX_FILE_BYTES
+
+
+def sniff(path: str, sample: bytes) -> Optional[str]:
+    """
+    Classifies a file from its first bytes. Returns why it shouldn't be indexed, or None.
+    """
+    if not sample:
+        return None
+    if b"\x00" in sample:
+        return "binary"
+    control = sum(1 for b in sample if b < 32 and b not in TEXT_CONTROL_BYTES)
+    if control / len(sample) > 0.1:
+        return "binary"
+
+    head = sample[:1024].lower()
+    if any(marker in head for marker in GENERATED_MARKERS):
+        return "generated"
+
+    name = Path(path).name.lower()
+    if ".min." in name:
+        return "minified"
+    if len(sample) >= 1024 and Path(path).suffix.lower() not in PROSE_EXTENSIONS:
+        if len(sample) / (sample.count(b"\n") + 1) > MINIFIED_AVG_LINE:
+            return "minified"
+    return None
+
+
+def size_reason(path: str, size: int) -> Optional[str]:
+    limit = size_limit(path)
+    if size > limit:
+        return f"{size} bytes exceeds the {limit} byte limit"
+    return None
+
+
+# -------------------------------------------------------------------------
+# Bounded reader
+# -------------------------------------------------------------------------
+
+class BoundedLineReader:
+    """
+    Streams a text file line by line without ever holding more than one line,
+    capped at `max_line_chars`, in memory. The rest of an overlong line is
+    dropped, so line numbers stay correct.
+
+    Supports what the chunkers need: iteration, read() and seek(0). Reads a
+    path, or a binary stream such as a blob streamed from git; a stream that
+    can't seek is rewound by closing it and calling `reopen`.
+    """
+    def __init__(
+        self,
+        file: Union[str, BinaryIO],
+        max_line_chars: Optional[int] = None,
+        reopen: Optional[Callable[[], BinaryIO]] = None,
+    ):
+        self.max_line_chars = max_line_chars or settings.INDEX_MAX_LINE_CHARS
+        self._reopen = reopen
+        if isinstance(file, str):
+            self._f = open(file, "r", encoding="utf-8", errors="ignore")
+        else:
+            self._f = self._wrap(file)
+
+    @staticmethod
+    def _wrap(stream: BinaryIO) -> io.TextIOWrapper:
+        return io.TextIOWrapper(stream, encoding="utf-8", errors="ignore")
+
+    def __iter__(self) -> Iterator[str]:
+        while True:
+            line = self._f.readline(self.max_line_chars)
+            if not line:
+                return
+            if not line.endswith("\n"):
+                # skip to the end of the line
+                rest = line
+                while rest and not rest.endswith("\n"):
+                    rest = self._f.readline(self.max_line_chars)
+                if rest:
+                    line += "\n"
+            yield line
+
+    def read(self, size: int = -1) -> str:
+        """
+        The rest of the file or, given `size`, whole lines up to at least
+        `size` characters of it.
+        """
+        if size < 0:
+            return "".join(self)
+        lines, total = [], 0
+        for line in self:
+            lines.append(line)
+            total += len(line)
+            if total >= size:
+                break
+        return "".join(lines)
+
+    def seek(self, offset: int) -> int:
+        if self._f.seekable() or self._reopen is None:
+            return self._f.seek(offset)
+        if offset != 0:
+            raise io.UnsupportedOperation("can only rewind a reopened stream to 0")
+        self._f.close()
+        self._f = self._wrap(self._reopen())
+        return 0
+
+    def close(self) -> None:
+        self._f.close()
+
+    def __enter__(self) -> "BoundedLineReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
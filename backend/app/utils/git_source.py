@@ -0,0 +1,171 @@
+"""
+Reads the repo to index straight from git's object database, with no working
+tree. Remote repos get a bare, depth-1 partial mirror under INDEX_MIRROR_DIR
+that later runs update with `git fetch`; blobs over the size limits are never
+downloaded. A clone_url that is a local repository is read in place.
+"""
+
+import io
+import os
+import re
+import shutil
+import tempfile
+from typing import Optional, Set
+
+from git import Repo as GitPythonRepo
+from git.exc import GitCommandError, InvalidGitRepositoryError, NoSuchPathError
+
+from app.core.config import settings
+from app.utils import metrics
+from app.utils.file_reader import SAMPLE_BYTES
+
+# The mirror's ref for the remote HEAD it last fetched
+MIRROR_REF = "refs/frzn/head"
+
+
+def mirror_dir() -> str:
+    return settings.INDEX_MIRROR_DIR or os.path.join(tempfile.gettempdir(), "frzn-docs-mirrors")
+
+
+def mirror_path(repo_id: int, full_name: str) -> str:
+    safe = re.sub(r"[^A-Za-z0-9._-]", "_", full_name)
+    return os.path.join(mirror_dir(), f"{repo_id}-{safe}.git")
+
+
+def local_repo(url: str) -> Optional[GitPythonRepo]:
+    """
+    The repository at `url` if it is a local path to one, bare or not.
+    """
+    if not os.path.isdir(url):
+        return None
+    try:
+        return GitPythonRepo(url)
+    except (InvalidGitRepositoryError, NoSuchPathError):
+        return None
+
+
+def mirror_filter() -> str:
+    """
+    The partial clone filter mirrors are fetched with: no blob larger than any
+    file that can be indexed. Git ignores filters for blobs fetched by id, so
+    this is the only point where a blob's size can keep it from being sent.
+    """
+    return f"blob:limit={max(settings.INDEX_MAX_FILE_BYTES, settings.INDEX_MAX_DATA_FILE_BYTES)}"
+
+
+def update_mirror(path: str, url: str) -> GitPythonRepo:
+    """
+    Creates or updates the mirror at `path`: fetches the remote HEAD's commit,
+    its trees and the blobs within mirror_filter(), with no history. Raises
+    ValueError for a mirror fetched with another filter.
+    """
+    spec = mirror_filter()
+    if os.path.isdir(path):
+        git_repo = GitPythonRepo(path)
+        current = git_repo.git.config("--get", "remote.origin.partialclonefilter")
+        if current != spec:
+            git_repo.close()
+            raise ValueError(f"it was fetched with --filter={current}, not {spec}")
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        git_repo = GitPythonRepo.init(path, bare=True)
+        # what `git clone --filter=...` sets up: origin is a promisor remote
+        git_repo.git.config("remote.origin.promisor", "true")
+        git_repo.git.config("remote.origin.partialclonefilter", spec)
+    git_repo.git.config("remote.origin.url", url)
+    # A shallow fetch after the first one only brings what the new HEAD adds
+    git_repo.git.fetch("--depth=1", "--no-tags", f"--filter={spec}", "origin", f"+HEAD:{MIRROR_REF}")
+    return git_repo
+
+
+class BlobReader(io.RawIOBase):
+    """
+    A raw stream over one blob of `git cat-file --batch`. All blobs share that
+    process's pipe, so closing drains what wasn't read, a piece at a time.
+    """
+    def __init__(self, stream):
+        self._stream = stream
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self) -> None:
+        if not self.closed:
+            while self._stream.read(SAMPLE_BYTES):
+                pass
+        super().close()
+
+
+class GitSource:
+    """
+    The commit to index and the contents of its blobs.
+    """
+    def __init__(self, git_repo: GitPythonRepo, ref: str, promisor: bool):
+        self.repo = git_repo
+        self.commit = git_repo.commit(ref)
+        # whether the commit's blobs over the mirror filter are left out
+        self.promisor = promisor
+        self._omitted: Optional[Set[str]] = None
+
+    @classmethod
+    def open(cls, repo_id: int, full_name: str, url: str) -> "GitSource":
+        """
+        Reads a local repository in place, or brings the repo's mirror up to date.
+        A mirror git can't update (e.g. left locked by a killed worker) is cloned again.
+        """
+        git_repo = local_repo(url)
+        if git_repo is not None:
+            return cls(git_repo, "HEAD", promisor=False)
+
+        path = mirror_path(repo_id, full_name)
+        try:
+            return cls(update_mirror(path, url), MIRROR_REF, promisor=True)
+        except (GitCommandError, InvalidGitRepositoryError, ValueError) as e:
+            if not os.path.isdir(path):
+                raise
+            metrics.log(f"Mirror {path} could not be updated ({e}), cloning it again")
+            shutil.rmtree(path, ignore_errors=True)
+            return cls(update_mirror(path, url), MIRROR_REF, promisor=True)
+
+    def omitted(self, sha: str) -> bool:
+        """
+        Whether the mirror filter left this blob of the commit out, i.e. it is
+        larger than any file that gets indexed.
+        """
+        if not self.promisor:
+            return False
+        if self._omitted is None:
+            # --missing=print lists the objects that aren't here instead of fetching them
+            proc = self.repo.git.rev_list("--objects", "--missing=print", self.commit.hexsha, as_process=True)
+            self._omitted = {line[1:41].decode("ascii") for line in proc.stdout if line.startswith(b"?")}
+            proc.wait()
+        return sha in self._omitted
+
+    def size(self, sha: str) -> Optional[int]:
+        """
+        A blob's size in bytes, read from its header, or None if it was omitted
+        by the mirror filter or can't be read.
+        """
+        if self.omitted(sha):
+            # reading its header would fetch it from origin
+            return None
+        try:
+            return self.repo.odb.info(bytes.fromhex(sha)).size
+        except (ValueError, GitCommandError):
+            return None
+
+    def open_blob(self, sha: str) -> io.BufferedReader:
+        """
+        A blob's contents as a stream from the object database, read in
+        SAMPLE_BYTES pieces; peek() returns its first bytes without consuming them.
+        Close it before opening the next blob.
+        """
+        return io.BufferedReader(BlobReader(self.repo.odb.stream(bytes.fromhex(sha))), buffer_size=SAMPLE_BYTES)
+
+    def close(self) -> None:
+        self.repo.close()
@@ -0,0 +1,89 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session
+
+from app.models import IndexProgress
+
+# -------------------------------------------------------------------------
+# Persisted progress of index runs
+# -------------------------------------------------------------------------
+
+# the phases of frzn_index_phase_seconds, then "done"
+DONE = "done"
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _utc(value: datetime) -> datetime:
+    # timestamp columns come back naive, in UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def start_progress(session: Session, repo_id: int) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Resets the repo's progress for a new run and returns the (commit, phase)
+    the previous run reached, if there was one. The caller commits.
+    """
+    previous = session.get(IndexProgress, repo_id)
+    reached = (previous.commit, previous.phase) if previous else (None, None)
+    now = _now()
+    row = dict(
+        commit=None, phase="clone", files_unchanged=0, files_total=0, files_done=0,
+        bytes_total=0, bytes_done=0, chunks_done=0, resumed=False, started_at=now,
+        embed_started_at=None, updated_at=now,
+    )
+    stmt = insert(IndexProgress).values(repo_id=repo_id, **row)
+    session.execute(stmt.on_conflict_do_update(index_elements=[IndexProgress.repo_id], set_=row))
+    return reached
+
+
+def set_phase(session: Session, repo_id: int, phase: str, **values: Any) -> None:
+    """
+    Moves the run on to `phase`, with any other columns to set. The caller commits.
+    """
+    session.execute(
+        update(IndexProgress)
+        .where(IndexProgress.repo_id == repo_id)
+        .values(phase=phase, updated_at=_now(), **values)
+    )
+
+
+def record_batch(session: Session, repo_id: int, files: int, chunks: int, size: int) -> None:
+    """
+    Adds a written batch to the counts, in the transaction that writes it.
+    """
+    session.execute(
+        update(IndexProgress)
+        .where(IndexProgress.repo_id == repo_id)
+        .values(
+            files_done=IndexProgress.files_done + files,
+            chunks_done=IndexProgress.chunks_done + chunks,
+            bytes_done=IndexProgress.bytes_done + size,
+            updated_at=_now(),
+        )
+    )
+
+
+def eta_seconds(progress: IndexProgress, now: Optional[datetime] = None) -> Optional[float]:
+    """
+    Seconds left in the embed_write phase at the byte rate it has run at so far.
+    """
+    if progress.phase != "embed_write" or not progress.bytes_done or progress.embed_started_at is None:
+        return None
+    elapsed = ((now or _now()) - _utc(progress.embed_started_at)).total_seconds()
+    remaining = max(0, progress.bytes_total - progress.bytes_done)
+    return round(elapsed * remaining / progress.bytes_done, 1)
+
+
+def describe(progress: IndexProgress, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    The progress as served by the API, with its ETA.
+    """
+    out = progress.model_dump(exclude={"repo_id"})
+    out["eta_seconds"] = eta_seconds(progress, now)
+    return out
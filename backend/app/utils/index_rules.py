@@ -1,5 +1,5 @@
-import os
-from pathlib import Path
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 # -------------------------------------------------------------------------
 # Constants for indexing rules
@@ -56,26 +56,213 @@ INDEXABLE_PATH_PREFIXES = (
     ".gitlab-ci.yml",      # GitLab CI
 )
 
+# 4. Excluded by default (gitignore syntax). Repos can re-include with `!pattern`
+#    in their REPO_RULES_FILE.
+DEFAULT_EXCLUDES = (
+    ".git/",
+    "node_modules/",
+    "bower_components/",
+    "vendor/",
+    "third_party/",
+    "dist/",
+    "build/",
+    "out/",
+    "target/",
+    "coverage/",
+    "__pycache__/",
+    ".venv/",
+    "venv/",
+    ".tox/",
+    ".next/",
+    "*.min.js",
+    "*.min.css",
+    "package-lock.json",
+    "npm-shrinkwrap.json",
+    "yarn.lock",
+    "pnpm-lock.yaml",
+    "poetry.lock",
+    "Pipfile.lock",
+    "composer.lock",
+    "Gemfile.lock",
+    "Cargo.lock",
+    "go.sum",
+)
+
+# 5. Per-repo overrides, read from the repo root. Same syntax as .gitignore:
+#    `pattern` excludes, `!pattern` forces a path to be indexed.
+REPO_RULES_FILE = ".frzndocsignore"
+
 
 # -------------------------------------------------------------------------
-# Helper functions
+# Pattern compilation
 # -------------------------------------------------------------------------
 
-def should_index(path: str) -> bool:
-    name = os.path.basename(path)
-    suffix = Path(path).suffix.lower()
+EXCLUDE = "exclude"
+INCLUDE = "include"
+NEUTRAL = "neutral"
+
+
+def glob_to_regex(pattern: str) -> str:
+    """
+    Translates one gitignore pattern (without its `!`) into a regex matched
+    against a repo-relative path, with directories given a trailing slash.
+    """
+    dir_only = pattern.endswith("/")
+    pattern = pattern.rstrip("/")
+    anchored = "/" in pattern
+    pattern = pattern.lstrip("/")
+
+    out: List[str] = []
+    i, n = 0, len(pattern)
+    while i < n:
+        if pattern.startswith("**/", i) and (i == 0 or pattern[i - 1] == "/"):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i) and i + 2 == n and (i == 0 or pattern[i - 1] == "/"):
+            out.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            out.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 2:]:
+            end = pattern.index("]", i + 2)
+            body = pattern[i + 1:end]
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            out.append("[" + body.replace("\\", "\\\\") + "]")
+            i = end + 1
+        elif pattern[i] == "\\" and i + 1 < n:
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+
+    prefix = "" if anchored else "(?:.*/)?"
+    suffix = "/" if dir_only else "/?"
+    return prefix + "".join(out) + suffix
+
+
+def parse_rules(text: str, negated: str) -> List[Tuple[str, str]]:
+    """
+    Parses gitignore-style lines into (action, regex) rules. Plain patterns
+    exclude; `!pattern` gets the `negated` action.
+    """
+    rules = []
+    for line in text.splitlines():
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        action = EXCLUDE
+        if line.startswith("!"):
+            action, line = negated, line[1:]
+        elif line.startswith("\\"):
+            line = line[1:]
+        if line.strip("/"):
+            rules.append((action, glob_to_regex(line)))
+    return rules
+
+
+def _include_regex() -> "re.Pattern[str]":
+    names = "|".join(re.escape(name) for name in sorted(INDEXABLE_FILENAMES))
+    exts = "|".join(re.escape(ext[1:]) for ext in sorted(INDEXABLE_EXTENSIONS))
+    prefixes = "|".join(re.escape(prefix) for prefix in INDEXABLE_PATH_PREFIXES)
+    return re.compile(f"(?:.*/)?(?:{names})|.*\\.(?i:{exts})|(?:.*/)?(?:{prefixes}).*")
+
+
+# -------------------------------------------------------------------------
+# Rule engine
+# -------------------------------------------------------------------------
+
+class IndexRules:
+    """
+    Decides which paths of a repo get indexed. The built-in excludes, the repo's
+    .gitignore and its REPO_RULES_FILE are layered in that order, and the last
+    matching pattern wins, as in git. All patterns are compiled into a single
+    regex: its alternatives run from the last rule to the first, so the first
+    alternative that matches is the rule that applies.
+
+    A path no rule excludes is indexed if it has an indexable name, extension
+    or prefix, or if REPO_RULES_FILE re-includes it with `!pattern`.
+    """
+    def __init__(self, gitignore: str = "", repo_rules: str = "", excludes: Iterable[str] = DEFAULT_EXCLUDES):
+        rules = (
+            parse_rules("\n".join(excludes), NEUTRAL)
+            # a `!` in .gitignore re-includes a path for git, not for us
+            + parse_rules(gitignore, NEUTRAL)
+            + parse_rules(repo_rules, INCLUDE)
+        )
+        rules.reverse()
+        self._actions = [action for action, _ in rules]
+        self._matcher = re.compile("|".join(f"({regex})" for _, regex in rules)) if rules else None
+        self._include = _include_regex()
+        self._dirs: Dict[str, bool] = {}
+
+    @classmethod
+    def from_tree(cls, tree) -> "IndexRules":
+        """
+        Reads .gitignore and REPO_RULES_FILE from the root of a GitPython tree.
+        Nested .gitignore files are not read.
+        """
+        def read(name: str) -> str:
+            try:
+                return tree[name].data_stream.read().decode("utf-8", errors="ignore")
+            except KeyError:
+                return ""
+
+        return cls(gitignore=read(".gitignore"), repo_rules=read(REPO_RULES_FILE))
+
+    def _action(self, path: str) -> Optional[str]:
+        if self._matcher is None:
+            return None
+        m = self._matcher.fullmatch(path)
+        return self._actions[m.lastindex - 1] if m else None
+
+    def excluded_dir(self, path: str) -> bool:
+        """
+        True if a directory and everything under it is excluded.
+        """
+        excluded = self._dirs.get(path)
+        if excluded is None:
+            parent = path.rpartition("/")[0]
+            excluded = (bool(parent) and self.excluded_dir(parent)) or self._action(path + "/") == EXCLUDE
+            self._dirs[path] = excluded
+        return excluded
 
-    if name in INDEXABLE_FILENAMES:
-        # print(f"Matched filename: {name}")
-        return True
+    def should_index(self, path: str, check_parents: bool = True) -> bool:
+        """
+        `check_parents=False` skips the ancestor directory checks, for callers
+        that have already pruned excluded directories.
+        """
+        if check_parents:
+            parent = path.rpartition("/")[0]
+            if parent and self.excluded_dir(parent):
+                return False
+        action = self._action(path)
+        if action == EXCLUDE:
+            return False
+        return action == INCLUDE or self._include.fullmatch(path) is not None
 
-    if suffix in INDEXABLE_EXTENSIONS:
-        # print(f"Matched extension: {suffix} in {path}")
-        return True
+    def indexable_blobs(self, tree) -> Iterator:
+        """
+        Walks a GitPython tree, skipping excluded directories without descending
+        into them, and yields the blobs to index.
+        """
+        return tree.traverse(
+            predicate=lambda item, depth: item.type == "blob" and self.should_index(item.path, check_parents=False),
+            prune=lambda item, depth: item.type == "tree" and self.excluded_dir(item.path),
+        )
 
-    for prefix in INDEXABLE_PATH_PREFIXES:
-        if prefix in path:
-            # print(f"Matched path prefix: {prefix} in {path}")
-            return True
 
-    return False
+# -------------------------------------------------------------------------
+# Helper functions
+# -------------------------------------------------------------------------
+
+DEFAULT_RULES = IndexRules()
+
+
+def should_index(path: str) -> bool:
+    return DEFAULT_RULES.should_index(path)
@@ -0,0 +1,154 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from sqlalchemy import and_, case, cast, or_, update
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.models import IndexJob, IndexStatus, JobStatus, Repo
+
+# -------------------------------------------------------------------------
+# Postgres-backed index job queue
+# -------------------------------------------------------------------------
+
+ACTIVE_STATUSES = (JobStatus.queued, JobStatus.running)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def active_job(session: Session, repo_id: int) -> Optional[IndexJob]:
+    """
+    Returns the queued or running job for a repo, if any.
+    """
+    return session.exec(
+        select(IndexJob)
+        .where(IndexJob.repo_id == repo_id)
+        .where(IndexJob.status.in_(ACTIVE_STATUSES))
+    ).first()
+
+
+def enqueue_index_job(session: Session, repo_id: int) -> IndexJob:
+    """
+    Adds an index job for the repo; the caller commits.
+    """
+    job = IndexJob(repo_id=repo_id, max_attempts=settings.INDEX_JOB_MAX_ATTEMPTS)
+    session.add(job)
+    return job
+
+
+def claim_job(session: Session, worker_id: str) -> Optional[IndexJob]:
+    """
+    Claims the oldest runnable job: a queued one, or a running one whose worker
+    stopped heartbeating. SKIP LOCKED lets any number of workers poll at once.
+    """
+    stale_before = _now() - timedelta(seconds=settings.INDEX_JOB_STALE_AFTER)
+    while True:
+        job = session.exec(
+            select(IndexJob)
+            .where(or_(
+                IndexJob.status == JobStatus.queued,
+                and_(IndexJob.status == JobStatus.running, IndexJob.heartbeat_at < stale_before),
+            ))
+            .order_by(IndexJob.created_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).first()
+        if job is None:
+            session.rollback()
+            return None
+
+        if job.attempts >= job.max_attempts:
+            # a worker died on its last attempt
+            _mark_failed(session, job, job.last_error or "worker stopped heartbeating")
+            session.commit()
+            continue
+
+        job.status = JobStatus.running
+        job.attempts += 1
+        job.locked_by = worker_id
+        job.heartbeat_at = _now()
+        job.updated_at = _now()
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+        return job
+
+
+def heartbeat(session: Session, job_id: int, worker_id: str) -> bool:
+    """
+    Refreshes the job's heartbeat. Returns False if another worker has reclaimed it.
+    """
+    result = session.execute(
+        update(IndexJob)
+        .where(IndexJob.id == job_id)
+        .where(IndexJob.locked_by == worker_id)
+        .where(IndexJob.status == JobStatus.running)
+        .values(heartbeat_at=_now())
+    )
+    session.commit()
+    return result.rowcount == 1
+
+
+def _release(session: Session, job_id: int, worker_id: str, **values) -> Optional[Tuple[int, JobStatus]]:
+    """
+    Updates a running job only while `worker_id` still holds it, so a worker
+    that lost the job to another can't overwrite the new owner's state.
+    Returns the job's repo id and new status, or None if it was lost.
+    """
+    row = session.execute(
+        update(IndexJob)
+        .where(IndexJob.id == job_id)
+        .where(IndexJob.locked_by == worker_id)
+        .where(IndexJob.status == JobStatus.running)
+        .values(locked_by=None, updated_at=_now(), **values)
+        .returning(IndexJob.repo_id, IndexJob.status)
+    ).first()
+    return tuple(row) if row else None
+
+
+def complete_job(session: Session, job_id: int, worker_id: str) -> bool:
+    """
+    Marks the job done. Returns False if another worker has reclaimed it.
+    """
+    released = _release(session, job_id, worker_id, status=JobStatus.done)
+    session.commit()
+    return released is not None
+
+
+def fail_job(session: Session, job_id: int, worker_id: str, error: str) -> bool:
+    """
+    Puts the job back in the queue, or marks it (and its repo) failed once it
+    has used up its attempts. Returns False if another worker has reclaimed it.
+    """
+    released = _release(
+        session,
+        job_id,
+        worker_id,
+        status=cast(
+            case((IndexJob.attempts >= IndexJob.max_attempts, JobStatus.failed.value), else_=JobStatus.queued.value),
+            IndexJob.status.type,
+        ),
+        last_error=error,
+    )
+    if released is not None:
+        repo_id, job_status = released
+        repo = session.get(Repo, repo_id)
+        if repo:
+            repo.index_status = IndexStatus.error if job_status == JobStatus.failed else IndexStatus.pending
+            session.add(repo)
+    session.commit()
+    return released is not None
+
+
+def _mark_failed(session: Session, job: IndexJob, error: str) -> None:
+    job.status = JobStatus.failed
+    job.locked_by = None
+    job.last_error = error
+    job.updated_at = _now()
+    session.add(job)
+    repo = session.get(Repo, job.repo_id)
+    if repo:
+        repo.index_status = IndexStatus.error
+        session.add(repo)
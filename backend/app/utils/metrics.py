@@ -0,0 +1,363 @@
+"""
+Request ids for log lines, and Prometheus metrics for the chat agent, OpenAI
+calls and the indexer.
+
+Metrics are kept in process and rendered in the Prometheus text format by
+`render()`: the API serves them on /metrics, index workers on their own port
+(WORKER_METRICS_PORT). With METRICS_ENABLED off every record call returns
+immediately.
+"""
+
+import asyncio
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+
+enabled = settings.METRICS_ENABLED
+
+# -------------------------------------------------------------------------
+# Request ids
+# -------------------------------------------------------------------------
+
+# Set per API request (X-Request-ID) and per index job; copied into tasks and
+# asyncio.to_thread calls, and explicitly into the indexer's threads
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def log(message: str) -> None:
+    """
+    Prints a log line, prefixed with the current request or job id.
+    """
+    rid = request_id.get()
+    print(f"[{rid}] {message}" if rid else message)
+
+# -------------------------------------------------------------------------
+# Metric types
+# -------------------------------------------------------------------------
+
+_registry: List["_Metric"] = []
+
+LabelKey = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> LabelKey:
+        return tuple(str(labels[name]) for name in self.labels)
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """
+        The metric's sample lines in the text format, without HELP and TYPE.
+        """
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        return "\n".join(lines + self.samples())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        if not enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}_total{_format_labels(self.labels, key)} {_format_value(v)}" for key, v in values]
+
+
+# Seconds; covers a fast DB read up to a slow LLM call or index phase
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (count per bucket, with a last +Inf bucket; sum)
+        self._values: Dict[LabelKey, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        if not enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[bisect_left(self.buckets, value)] += 1
+            total[0] += value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, (list(counts), total[0])) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, n in zip(list(self.buckets) + ["+Inf"], counts):
+                cumulative += n
+                le = bound if bound == "+Inf" else _format_value(bound)
+                bucket_labels = _format_labels(self.labels, key, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Timer:
+    """
+    Observes the seconds spent in a `with` block into a histogram, labelled
+    with `outcome`: "ok", "timeout", "cancelled" or "error" from how the block
+    exited, unless the block sets `timer.outcome` itself.
+    """
+    __slots__ = ("metric", "labels", "outcome", "start")
+
+    def __init__(self, metric: Histogram, labels: Dict[str, str]):
+        self.metric = metric
+        self.labels = labels
+        self.outcome: Optional[str] = None
+
+    def __enter__(self) -> "Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        outcome = self.outcome
+        if outcome is None:
+            if exc_type is None:
+                outcome = "ok"
+            elif issubclass(exc_type, (asyncio.TimeoutError, TimeoutError)):
+                outcome = "timeout"
+            elif issubclass(exc_type, (asyncio.CancelledError, GeneratorExit)):
+                outcome = "cancelled"
+            else:
+                outcome = "error"
+        self.metric.observe(time.perf_counter() - self.start, outcome=outcome, **self.labels)
+        return False
+
+
+class _NullTimer:
+    outcome = None
+
+    def __enter__(self) -> "_NullTimer":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(metric: Histogram, **labels: str):
+    """
+    Context manager timing a block into `metric`, which must have an "outcome" label.
+    """
+    return Timer(metric, labels) if enabled else _NULL_TIMER
+
+# -------------------------------------------------------------------------
+# Metrics
+# -------------------------------------------------------------------------
+
+CHAT_SECONDS = Histogram(
+    "frzn_chat_request_seconds",
+    "Time from a chat request to the end of its answer stream.",
+    ["outcome"],
+)
+NODE_SECONDS = Histogram(
+    "frzn_agent_node_seconds",
+    "Time spent in each agent graph node.",
+    ["node", "outcome"],
+)
+CHAT_PLANS = Counter(
+    "frzn_chat_plans",
+    "Chat requests by the plan they ran and what picked it: client, rules, model or default.",
+    ["plan", "by"],
+)
+RESEARCH_LOOPS = Counter(
+    "frzn_research_loops",
+    "Research loops by scope and why they stopped: confident, converged, no_context or limit.",
+    ["scope", "stop"],
+)
+PROMPT_TOKENS = Histogram(
+    "frzn_prompt_tokens",
+    "Prompt size of each LLM call, counted locally before sending.",
+    ["node"],
+    buckets=(256, 512, 1_024, 2_048, 4_096, 8_192, 16_384),
+)
+LLM_SECONDS = Histogram(
+    "frzn_llm_request_seconds",
+    "Latency of chat model calls.",
+    ["caller", "model", "outcome"],
+)
+LLM_TOKENS = Counter(
+    "frzn_llm_tokens",
+    "Tokens used by chat model calls, as reported by the API.",
+    ["caller", "model", "kind"],
+)
+EMBEDDING_SECONDS = Histogram(
+    "frzn_embedding_request_seconds",
+    "Latency of embedding requests, per attempt.",
+    ["caller", "outcome"],
+)
+EMBEDDING_TOKENS = Counter(
+    "frzn_embedding_tokens",
+    "Tokens sent for embedding.",
+    ["caller"],
+)
+EMBEDDING_RETRIES = Counter(
+    "frzn_embedding_retries",
+    "Embedding requests retried after a transient error.",
+    ["caller"],
+)
+COST = Counter(
+    "frzn_openai_cost_usd",
+    "Estimated OpenAI spend, from token counts and MODEL_PRICES.",
+    ["caller", "model"],
+)
+INDEX_RUN_SECONDS = Histogram(
+    "frzn_index_run_seconds",
+    "Duration of whole index runs.",
+    ["outcome"],
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1_200, 3_600),
+)
+INDEX_PHASE_SECONDS = Histogram(
+    "frzn_index_phase_seconds",
+    "Duration of each phase of an index run: clone, diff, embed_write, summary.",
+    ["phase", "outcome"],
+    buckets=(0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600, 1_200, 3_600),
+)
+INDEX_CHUNK_SECONDS = Histogram(
+    "frzn_index_chunk_seconds",
+    "Time to read and chunk one file.",
+    ["outcome"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5),
+)
+INDEX_FILES = Counter(
+    "frzn_index_files",
+    "Files read by the indexer, by whether they were chunked or skipped.",
+    ["outcome"],
+)
+INDEX_WRITE_SECONDS = Histogram(
+    "frzn_index_write_seconds",
+    "Time to write and commit one batch of files and chunks.",
+    ["outcome"],
+)
+INDEX_CHUNKS_WRITTEN = Counter(
+    "frzn_index_chunks_written",
+    "Chunks written by the indexer.",
+)
+
+
+def _price(model: str) -> Optional[List[float]]:
+    # API responses name dated snapshots ("gpt-4.1-2025-04-14"): match the longest prefix
+    matches = [name for name in settings.MODEL_PRICES if model.startswith(name)]
+    return settings.MODEL_PRICES[max(matches, key=len)] if matches else None
+
+
+def record_llm(caller: str, model: str, seconds: float, outcome: str, input_tokens: int = 0, output_tokens: int = 0) -> None:
+    if not enabled:
+        return
+    LLM_SECONDS.observe(seconds, caller=caller, model=model, outcome=outcome)
+    LLM_TOKENS.inc(input_tokens, caller=caller, model=model, kind="input")
+    LLM_TOKENS.inc(output_tokens, caller=caller, model=model, kind="output")
+    price = _price(model)
+    if price:
+        COST.inc((input_tokens * price[0] + output_tokens * price[1]) / 1_000_000, caller=caller, model=model)
+
+
+def record_embedding_tokens(caller: str, tokens: int, model: Optional[str] = None) -> None:
+    if not enabled:
+        return
+    model = model or settings.EMBEDDING_MODEL
+    EMBEDDING_TOKENS.inc(tokens, caller=caller)
+    price = _price(model)
+    if price:
+        COST.inc(tokens * price[0] / 1_000_000, caller=caller, model=model)
+
+# -------------------------------------------------------------------------
+# Exposition
+# -------------------------------------------------------------------------
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def render() -> str:
+    """
+    Every metric with at least one sample, in the Prometheus text format.
+    """
+    return "\n".join(m.render() for m in _registry if m.samples()) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(port: int) -> ThreadingHTTPServer:
+    """
+    Serves render() on `port` from a daemon thread, for processes without the API.
+    """
+    server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
@@ -0,0 +1,34 @@
+import base64
+import json
+from typing import Any, Sequence, Tuple
+
+# -------------------------------------------------------------------------
+# Keyset cursors
+# -------------------------------------------------------------------------
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*values: Any) -> str:
+    """
+    Opaque cursor for the sort key of the last row of a page.
+    """
+    raw = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> Tuple[Any, ...]:
+    """
+    Sort key from a cursor made by encode_cursor. Raises ValueError if the
+    cursor is malformed or doesn't hold one value of each of `types`.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(values, list) or len(values) != len(types):
+        raise ValueError("Invalid cursor")
+    if not all(isinstance(v, t) and not isinstance(v, bool) for v, t in zip(values, types)):
+        raise ValueError("Invalid cursor")
+    return tuple(values)
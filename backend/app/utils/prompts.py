@@ -0,0 +1,168 @@
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.utils import metrics
+from app.utils.retrieval import RetrievedChunk
+from app.utils.tokens import count_tokens, truncate_tokens
+
+# -------------------------------------------------------------------------
+# Context assembly
+# -------------------------------------------------------------------------
+
+# (start line, end line, lines, whether later chunks may be merged into it)
+Span = Tuple[Optional[int], Optional[int], List[str], bool]
+
+
+def _lines(chunk: RetrievedChunk) -> Optional[List[str]]:
+    # Only chunks whose content covers their line range line for line can be
+    # merged; slices of one overlong line share a line number and can't.
+    if chunk.start_line is None or chunk.end_line is None:
+        return None
+    lines = chunk.content.split("\n")
+    return lines if len(lines) == chunk.end_line - chunk.start_line + 1 else None
+
+
+def _spans(chunks: Iterable[RetrievedChunk]) -> List[Span]:
+    """
+    Chunks of one file in line order, with overlapping and adjacent chunks
+    merged into one span and chunks inside another span dropped.
+    """
+    spans: List[Span] = []
+    for chunk in sorted(chunks, key=lambda c: (c.start_line or 0, c.end_line or 0)):
+        lines = _lines(chunk)
+        if lines is None:
+            spans.append((chunk.start_line, chunk.end_line, chunk.content.split("\n"), False))
+            continue
+        if spans and spans[-1][3] and chunk.start_line <= spans[-1][1] + 1:
+            start, end, body, _ = spans[-1]
+            if chunk.end_line <= end:
+                continue
+            spans[-1] = (start, chunk.end_line, body + lines[end - chunk.start_line + 1:], True)
+        else:
+            spans.append((chunk.start_line, chunk.end_line, lines, True))
+    return spans
+
+
+def render_chunks(chunks: Sequence[RetrievedChunk]) -> str:
+    """
+    Formats chunks as context, one `# path:start-end` block per span. Files keep
+    the order of their best ranked chunk; spans within a file are in line order.
+    """
+    by_file: Dict[int, List[RetrievedChunk]] = {}
+    for chunk in chunks:
+        by_file.setdefault(chunk.file_id, []).append(chunk)
+
+    blocks: List[str] = []
+    for file_chunks in by_file.values():
+        path = file_chunks[0].path
+        for start, end, lines, _ in _spans(file_chunks):
+            where = f":{start}-{end}" if start is not None else ""
+            blocks.append(f"# {path}{where}\n" + "\n".join(lines))
+    return "\n\n".join(blocks)
+
+
+def pack_context(chunks: Sequence[RetrievedChunk], max_tokens: int) -> str:
+    """
+    Packs ranked chunks into at most `max_tokens` of context: takes them best
+    first, skipping duplicates (same content in another file) and any chunk
+    that no longer fits, so a smaller one further down can still get in.
+    """
+    selected: List[RetrievedChunk] = []
+    seen = set()
+    context = ""
+    for chunk in chunks:
+        key = " ".join(chunk.content.split())
+        if key in seen:
+            continue
+        seen.add(key)
+        candidate = render_chunks(selected + [chunk])
+        if count_tokens(candidate) <= max_tokens:
+            selected.append(chunk)
+            context = candidate
+
+    if not selected and chunks:
+        # not even the best chunk fits: keep as much of it as does
+        return truncate_tokens(render_chunks(chunks[:1]), max_tokens)
+    return context
+
+# -------------------------------------------------------------------------
+# Prompt budgets
+# -------------------------------------------------------------------------
+
+def fit_sections(sections: Sequence[str], max_tokens: int) -> List[str]:
+    """
+    Truncates sections so together they fit in `max_tokens`. Sections smaller
+    than an even share are kept whole and their unused share goes to the rest.
+    """
+    sizes = [count_tokens(s) for s in sections]
+    if sum(sizes) <= max_tokens:
+        return list(sections)
+
+    allowance = [0] * len(sections)
+    remaining = max(0, max_tokens)
+    order = sorted(range(len(sections)), key=sizes.__getitem__)
+    for i, idx in enumerate(order):
+        allowance[idx] = min(sizes[idx], remaining // (len(order) - i))
+        remaining -= allowance[idx]
+    return [
+        s if sizes[i] <= allowance[i] else truncate_tokens(s, allowance[i])
+        for i, s in enumerate(sections)
+    ]
+
+# -------------------------------------------------------------------------
+# Prompt size statistics
+# -------------------------------------------------------------------------
+
+# Upper bounds of the histogram buckets, in tokens
+PROMPT_TOKEN_BUCKETS = (256, 512, 1_024, 2_048, 4_096, 8_192, 16_384)
+
+# A node's histogram is printed every this many prompts
+LOG_EVERY = 100
+
+
+class PromptTokenStats:
+    """
+    Per-node histograms of prompt sizes, counted locally before each LLM call.
+    Also recorded in the frzn_prompt_tokens Prometheus histogram.
+    """
+    def __init__(self, buckets: Sequence[int] = PROMPT_TOKEN_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts: Dict[str, List[int]] = {}
+        self._totals: Dict[str, int] = {}
+        self._max: Dict[str, int] = {}
+
+    def record(self, node: str, tokens: int) -> None:
+        counts = self._counts.setdefault(node, [0] * (len(self.buckets) + 1))
+        counts[bisect_left(self.buckets, tokens)] += 1
+        self._totals[node] = self._totals.get(node, 0) + tokens
+        self._max[node] = max(self._max.get(node, 0), tokens)
+        metrics.PROMPT_TOKENS.observe(tokens, node=node)
+        if sum(counts) % LOG_EVERY == 0:
+            metrics.log(self.format(node))
+
+    def histogram(self, node: str) -> Dict[str, int]:
+        labels = [f"<={b}" for b in self.buckets] + [f">{self.buckets[-1]}"]
+        return dict(zip(labels, self._counts.get(node, [0] * len(labels))))
+
+    def stats(self) -> Dict[str, Dict[str, object]]:
+        out = {}
+        for node, counts in self._counts.items():
+            n = sum(counts)
+            out[node] = {
+                "prompts": n,
+                "mean_tokens": self._totals[node] / n,
+                "max_tokens": self._max[node],
+                "histogram": self.histogram(node),
+            }
+        return out
+
+    def format(self, node: str) -> str:
+        stats = self.stats()[node]
+        bars = " ".join(f"{label}:{n}" for label, n in stats["histogram"].items() if n)
+        return (
+            f"Prompt tokens {node}: {stats['prompts']} prompts, "
+            f"mean {stats['mean_tokens']:.0f}, max {stats['max_tokens']} [{bars}]"
+        )
+
+
+prompt_tokens = PromptTokenStats()
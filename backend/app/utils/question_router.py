@@ -0,0 +1,79 @@
+"""
+Rules that pick the agent's execution plan for a question without an LLM call.
+
+  summary  what the repo is or does as a whole: the stored overview and file
+           listing answer it, with no retrieval and no research
+  direct   a lookup ("where is X defined?", "which file ..."): retrieval, then
+           one answer over the retrieved code, with no research loops
+  full     everything else that explains, compares or debugs: retrieval and the
+           three research loops
+
+`classify_question` only answers when a rule is confident; the agent asks
+ROUTER_MODEL about the rest (app.agents.agent.choose_plan).
+"""
+
+import re
+from typing import Literal, Optional
+
+Plan = Literal["summary", "direct", "full"]
+# what clients pass as /api/chat?mode=; "auto" routes the question
+Mode = Literal["auto", "summary", "direct", "full"]
+PLANS = ("summary", "direct", "full")
+
+# Questions longer than this are rarely a plain overview or lookup
+MAX_WORDS = 20
+
+_REPO = r"(?:repo|repository|project|codebase|code base|library|package|app|application|service|tool)"
+_OVERVIEW = re.compile(
+    r"^(?:(?:can|could) you |please )?(?:"
+    rf"what(?:'s| is| does)? (?:this|the) {_REPO}(?: do| for| about| used for)?"
+    rf"|what is this(?: {_REPO})?"
+    rf"|(?:give me |write |provide )?(?:an? |a short )?(?:overview|summary|high[- ]level (?:overview|summary|description)) of (?:this|the) {_REPO}"
+    rf"|(?:summari[sz]e|describe) (?:this|the) {_REPO}"
+    rf"|what(?:'s| is) (?:this|the) {_REPO}'?s? (?:purpose|goal)"
+    r")\W*$",
+    re.IGNORECASE,
+)
+_LOOKUP = re.compile(
+    r"^(?:"
+    r"where(?:'s| is| are| do| does)?\b.*\b(?:defined|declared|implemented|located|configured|registered|set|created|called|raised|thrown|imported|stored|parsed|handled|validated|live|lives)\b"
+    r"|where(?:'s| is| are) (?:the |a )?[`'\"]?[\w./:-]+[`'\"]?\W*$"
+    r"|(?:which|what) (?:file|files|module|modules|class|function|method|endpoint|route|table|env(?:ironment)? var(?:iable)?s?|setting)\b"
+    r"|(?:find|locate|show me|list)\b"
+    r"|what(?:'s| is) the (?:default|value|signature|return type|type|path|name|port|url) of\b"
+    r")",
+    re.IGNORECASE,
+)
+_REASONING = re.compile(
+    r"\b(?:how|why|explain|walk me through|design|architecture|trade-?offs?|compare|comparison|differences?|differ"
+    r"|interact|interacts|flow|lifecycle|refactor|improve|should|debug|fix|bug|fails?|failing|performance"
+    r"|scale|scaling|secure|security|race|deadlock|what happens|relationship)\b",
+    re.IGNORECASE,
+)
+
+
+def classify_question(question: str) -> Optional[Plan]:
+    """
+    The plan the rules pick for `question`, or None when none is confident.
+    Reasoning words win over lookup phrasing ("where and why is X called?").
+    """
+    text = " ".join(question.split())
+    if not text:
+        return None
+    if _REASONING.search(text):
+        return "full"
+    if len(text.split()) > MAX_WORDS:
+        return None
+    if _OVERVIEW.match(text):
+        return "summary"
+    if _LOOKUP.match(text):
+        return "direct"
+    return None
+
+
+def parse_plan(reply: str) -> Optional[Plan]:
+    """
+    The plan named by the first word of a router model's reply, if any.
+    """
+    words = re.findall(r"[a-z]+", reply.lower())
+    return words[0] if words and words[0] in PLANS else None
@@ -0,0 +1,417 @@
+import asyncio
+import math
+import re
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from pgvector.sqlalchemy import BIT, HALFVEC, Vector
+from sqlalchemy import Select, cast, column, func, literal, literal_column, or_, text
+from sqlalchemy.dialects.postgresql import ARRAY, REAL
+from sqlalchemy.sql.elements import Grouping
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.db import async_session, engine
+from app.models import File, CodeChunk
+from app.utils import metrics
+
+# -------------------------------------------------------------------------
+# Results
+# -------------------------------------------------------------------------
+
+class RetrievedChunk(NamedTuple):
+    id: int
+    file_id: int
+    path: str
+    start_line: Optional[int]
+    end_line: Optional[int]
+    content: str
+    repo_id: Optional[int] = None
+
+
+# Everything a caller needs, without loading the 1536-float embedding
+RESULT_COLUMNS = (
+    CodeChunk.id,
+    CodeChunk.file_id,
+    File.path,
+    CodeChunk.start_line,
+    CodeChunk.end_line,
+    CodeChunk.content,
+    File.repo_id,
+)
+
+# One repo id, or the ids of all the repos a chat searches
+RepoIds = Union[int, Sequence[int]]
+
+
+def repo_filter(repo_ids: RepoIds):
+    """
+    The WHERE clause on File.repo_id: one query covers every repo in the set.
+    """
+    if isinstance(repo_ids, int):
+        return File.repo_id == repo_ids
+    ids = list(repo_ids)
+    return File.repo_id == ids[0] if len(ids) == 1 else File.repo_id.in_(ids)
+
+# -------------------------------------------------------------------------
+# Vector search over stored chunk embeddings
+# -------------------------------------------------------------------------
+
+# Chunks embedded by different models share codechunk.embedding. Each
+# dimension has its own partial HNSW index on an expression of the column,
+# and queries order by the same expression, under the same predicate, so the
+# planner can use it. VECTOR_INDEX_MODE picks the expression:
+#
+#   vector     the embedding cast to vector(<dim>)
+#   halfvec    cast to halfvec(<dim>): 2 bytes a dimension (pgvector >= 0.7)
+#   binary     binary_quantize(): 1 bit a dimension (pgvector >= 0.7)
+#   truncated  its first VECTOR_INDEX_DIMENSIONS dimensions
+#
+# The table keeps the full float32 embedding whatever the mode. The compact
+# modes take VECTOR_RERANK_FACTOR times k candidates from their index and
+# re-rank those exactly.
+
+class VectorIndexMode(NamedTuple):
+    opclass: str
+    operator: str
+    # pgvector's limit on the dimensions an HNSW index of this type takes
+    max_dimensions: int
+    # the indexed expression of a vector of `dimension` dimensions
+    expression: Callable[[Any, int], Any]
+
+
+def _truncated(vector: Any, dimension: int) -> Any:
+    # an array slice rather than subvector(), which needs pgvector 0.7
+    n = settings.VECTOR_INDEX_DIMENSIONS
+    return cast(Grouping(cast(vector, ARRAY(REAL)))[1:n], Vector(n))
+
+
+VECTOR_INDEX_MODES = {
+    "vector": VectorIndexMode("vector_cosine_ops", "<=>", 2_000, lambda v, d: cast(v, Vector(d))),
+    "halfvec": VectorIndexMode("halfvec_cosine_ops", "<=>", 4_000, lambda v, d: cast(v, HALFVEC(d))),
+    "binary": VectorIndexMode("bit_hamming_ops", "<~>", 64_000, lambda v, d: cast(func.binary_quantize(v), BIT(d))),
+    "truncated": VectorIndexMode("vector_cosine_ops", "<=>", 2_000, _truncated),
+}
+
+
+def index_mode(dimension: int, mode: Optional[str] = None) -> Optional[str]:
+    """
+    The mode (VECTOR_INDEX_MODE unless given) chunks of this dimension are
+    indexed in, or None when they are too long for its HNSW index and are
+    searched exactly. Truncating to as many dimensions or more is `vector`.
+    """
+    mode = mode or settings.VECTOR_INDEX_MODE
+    if mode not in VECTOR_INDEX_MODES:
+        raise ValueError(f"Unknown VECTOR_INDEX_MODE {mode!r}")
+    indexed = dimension
+    if mode == "truncated":
+        if settings.VECTOR_INDEX_DIMENSIONS >= dimension:
+            mode = "vector"
+        else:
+            indexed = settings.VECTOR_INDEX_DIMENSIONS
+    return mode if indexed <= VECTOR_INDEX_MODES[mode].max_dimensions else None
+
+
+def vector_index_name(mode: str, dimension: int) -> str:
+    if mode == "vector":
+        return f"ix_codechunk_embedding_hnsw_{dimension}"
+    if mode == "truncated":
+        mode = f"truncated{settings.VECTOR_INDEX_DIMENSIONS}"
+    return f"ix_codechunk_embedding_{mode}_{dimension}"
+
+
+def ensure_vector_index(dimension: int, mode: Optional[str] = None) -> Optional[str]:
+    """
+    Builds the HNSW index for chunks of this dimension in `mode`
+    (VECTOR_INDEX_MODE unless given) unless it exists, without blocking
+    writes to codechunk. Returns its name, or None if it can't be built.
+    """
+    mode = index_mode(dimension, mode)
+    if mode is None:
+        metrics.log(f"{dimension}-dimension embeddings can't be HNSW-indexed; they are searched exactly")
+        return None
+    name = vector_index_name(mode, dimension)
+    spec = VECTOR_INDEX_MODES[mode]
+    expression = spec.expression(column("embedding", Vector()), dimension).compile(
+        dialect=engine.dialect, compile_kwargs={"literal_binds": True}
+    )
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON codechunk "
+            f"USING hnsw (({expression}) {spec.opclass}) WITH (m = 16, ef_construction = 64) "
+            f"WHERE vector_dims(embedding) = {dimension}"
+        ))
+    return name
+
+def set_search_params(sess: Session, ef_search: int | None = None) -> None:
+    """
+    Tunes the HNSW index for the current transaction only.
+    Higher ef_search trades latency for recall.
+    """
+    ef = int(ef_search or settings.HNSW_EF_SEARCH)
+    sess.execute(text(f"SET LOCAL hnsw.ef_search = {ef}"))
+
+
+# pgvector's ceiling on hnsw.ef_search
+MAX_EF_SEARCH = 1000
+
+
+# repo set -> (time.monotonic() it expires at, share)
+_shares: Dict[frozenset, Tuple[float, float]] = {}
+_SHARES_MAX = 1_024
+
+
+def repo_share(sess: Session, repo_ids: RepoIds) -> float:
+    """
+    The set's share of all indexed files, as a stand-in for its share of
+    chunks: its files counted, over the table's size from its stats. Shares
+    only move as repos are indexed, so the count is reused for
+    RETRIEVAL_SHARE_TTL seconds rather than run on every search.
+    """
+    ids = [repo_ids] if isinstance(repo_ids, int) else list(repo_ids)
+    key = frozenset(ids)
+    now = time.monotonic()
+    cached = _shares.get(key)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+    share = sess.execute(
+        text(
+            "SELECT count(*)::float / greatest("
+            "(SELECT reltuples FROM pg_class WHERE oid = 'file'::regclass), count(*), 1) "
+            "FROM file WHERE repo_id = ANY(:ids)"
+        ),
+        {"ids": ids},
+    ).scalar_one()
+    if len(_shares) >= _SHARES_MAX:
+        _shares.clear()
+    _shares[key] = (now + settings.RETRIEVAL_SHARE_TTL, share)
+    return share
+
+
+def vector_query(repo_ids: RepoIds, embedding: List[float], k: int, exact: bool = False) -> Select:
+    """
+    The query for the k chunks of a set of repos closest to `embedding`: in
+    the index's order, re-ranked exactly when the index is compact, or
+    exactly throughout with `exact` (for plans without index scans).
+    """
+    dimension = len(embedding)
+    distance = cast(CodeChunk.embedding, Vector(dimension)).cosine_distance(embedding)
+    # the dimension is inlined so the partial index's predicate can be matched
+    stmt = (
+        select(*RESULT_COLUMNS)
+        .join(CodeChunk.file)
+        .where(repo_filter(repo_ids))
+        .where(func.vector_dims(CodeChunk.embedding) == literal_column(str(dimension)))
+    )
+    mode = index_mode(dimension)
+    if exact or mode in (None, "vector"):
+        return stmt.order_by(distance).limit(k)
+
+    spec = VECTOR_INDEX_MODES[mode]
+    # typed, so overloaded functions like binary_quantize() resolve
+    query = spec.expression(cast(literal(embedding, Vector(dimension)), Vector(dimension)), dimension)
+    candidates = (
+        stmt.add_columns(CodeChunk.embedding)
+        .order_by(spec.expression(CodeChunk.embedding, dimension).op(spec.operator)(query))
+        .limit(k * settings.VECTOR_RERANK_FACTOR)
+        .subquery()
+    )
+    return (
+        select(*[candidates.c[name] for name in RetrievedChunk._fields])
+        .order_by(cast(candidates.c.embedding, Vector(dimension)).cosine_distance(embedding))
+        .limit(k)
+    )
+
+
+def search_code_chunks(
+    sess: Session,
+    repo_ids: RepoIds,
+    embedding: List[float],
+    k: int | None = None,
+    ef_search: int | None = None,
+) -> List[RetrievedChunk]:
+    """
+    Returns the k chunks of a repo, or of a set of repos, closest to `embedding`
+    by cosine distance. The ordering runs in Postgres against the HNSW index on
+    codechunk.embedding.
+    """
+    k = k or settings.RETRIEVAL_TOP_K
+    mode = index_mode(len(embedding))
+    fetched = k if mode in (None, "vector") else k * settings.VECTOR_RERANK_FACTOR
+    # An HNSW scan returns at most ef_search rows of the whole table, and the
+    # repo filter runs on those, so ef_search grows as the set's share shrinks.
+    # Sets too small for that to fit are scanned exactly.
+    ef = max(ef_search or settings.HNSW_EF_SEARCH, fetched) / max(repo_share(sess, repo_ids), 1e-6)
+    exact = mode is None or ef > MAX_EF_SEARCH
+    if exact:
+        sess.execute(text("SET LOCAL enable_indexscan = off"))
+    else:
+        set_search_params(sess, math.ceil(ef))
+    stmt = vector_query(repo_ids, embedding, k, exact=exact)
+    return [RetrievedChunk(*row) for row in sess.exec(stmt).all()]
+
+# -------------------------------------------------------------------------
+# Keyword search over codechunk.content_tsv and pg_trgm
+# -------------------------------------------------------------------------
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from",
+    "how", "i", "in", "is", "it", "of", "on", "or", "the", "this", "to", "what", "when",
+    "where", "which", "who", "why", "with", "you", "get", "there", "that", "have", "has",
+}
+
+# Things worth matching literally: `quoted` or "quoted" text, and identifiers
+# that can't be plain English words: snake_case, camelCase, dotted.names, call()s
+QUOTED_RE = re.compile(r"`([^`]+)`|\"([^\"]+)\"")
+IDENTIFIER_RE = re.compile(r"[A-Za-z_][\w.]*(?:_\w|[a-z][A-Z]|\.\w|\(\))[\w.()]*")
+
+
+def keyword_terms(question: str) -> List[str]:
+    """
+    Lower-cased word terms of a question, split the way to_tsvector('simple') splits code.
+    """
+    seen: Dict[str, None] = {}
+    for word in re.findall(r"[A-Za-z0-9]+", question.lower()):
+        if len(word) > 1 and word not in STOPWORDS:
+            seen.setdefault(word, None)
+    return list(seen)
+
+
+def literal_needle(question: str) -> Optional[str]:
+    """
+    The longest identifier, path or quoted string in a question, if any.
+    """
+    found = ["".join(groups) for groups in QUOTED_RE.findall(question)]
+    found += [m.rstrip(".") for m in IDENTIFIER_RE.findall(QUOTED_RE.sub(" ", question))]
+    found = [s.strip() for s in found if len(s.strip()) >= 3]
+    return max(found, key=len) if found else None
+
+
+def keyword_search(sess: Session, repo_ids: RepoIds, question: str, k: int) -> List[RetrievedChunk]:
+    """
+    Ranks the chunks of a repo, or of a set of repos, by full-text match on any question term (GIN on
+    content_tsv), plus trigram word similarity to an identifier or quoted
+    string in the question (GIN trigram index on content).
+    """
+    terms = keyword_terms(question)
+    needle = literal_needle(question)
+    if not terms and not needle:
+        return []
+
+    matches = []
+    score = literal(0.0)
+    if terms:
+        tsquery = func.to_tsquery("simple", " | ".join(terms))
+        matches.append(CodeChunk.content_tsv.op("@@")(tsquery))
+        score = score + func.ts_rank_cd(CodeChunk.content_tsv, tsquery)
+    if needle:
+        matches.append(literal(needle).op("<%")(CodeChunk.content))
+        score = score + func.word_similarity(needle, CodeChunk.content)
+
+    stmt = (
+        select(*RESULT_COLUMNS)
+        .join(CodeChunk.file)
+        .where(repo_filter(repo_ids))
+        .where(or_(*matches))
+        .order_by(score.desc())
+        .limit(k)
+    )
+    return [RetrievedChunk(*row) for row in sess.exec(stmt).all()]
+
+# -------------------------------------------------------------------------
+# Hybrid search
+# -------------------------------------------------------------------------
+
+def fuse(
+    rankings: List[List[RetrievedChunk]],
+    k: int,
+    max_per_file: int,
+    rrf_k: int = 60,
+    max_per_repo: Optional[int] = None,
+) -> List[RetrievedChunk]:
+    """
+    Reciprocal rank fusion: each chunk scores sum(1 / (rrf_k + rank)) over the
+    rankings it appears in. Keeps the best k, at most `max_per_file` per file.
+
+    With `max_per_repo`, no repo takes more than that many of the k places
+    while chunks of other repos are left; places still free afterwards go to
+    the best chunks passed over.
+    """
+    scores: Dict[int, float] = {}
+    chunks: Dict[int, RetrievedChunk] = {}
+    for ranking in rankings:
+        for rank, chunk in enumerate(ranking, 1):
+            scores[chunk.id] = scores.get(chunk.id, 0.0) + 1.0 / (rrf_k + rank)
+            chunks[chunk.id] = chunk
+
+    result: List[RetrievedChunk] = []
+    per_file: Dict[int, int] = {}
+    per_repo: Dict[Optional[int], int] = {}
+    over_quota: List[RetrievedChunk] = []
+    for chunk_id in sorted(scores, key=scores.get, reverse=True):
+        chunk = chunks[chunk_id]
+        if per_file.get(chunk.file_id, 0) >= max_per_file:
+            continue
+        if max_per_repo and per_repo.get(chunk.repo_id, 0) >= max_per_repo:
+            over_quota.append(chunk)
+            continue
+        per_file[chunk.file_id] = per_file.get(chunk.file_id, 0) + 1
+        per_repo[chunk.repo_id] = per_repo.get(chunk.repo_id, 0) + 1
+        result.append(chunk)
+        if len(result) == k:
+            return result
+
+    for chunk in over_quota:
+        if len(result) == k:
+            break
+        if per_file.get(chunk.file_id, 0) >= max_per_file:
+            continue
+        per_file[chunk.file_id] = per_file.get(chunk.file_id, 0) + 1
+        result.append(chunk)
+    result.sort(key=lambda c: scores[c.id], reverse=True)
+    return result
+
+
+async def _vector_candidates(repo_ids: RepoIds, embedding: List[float], n: int) -> List[RetrievedChunk]:
+    async with async_session() as sess:
+        return await sess.run_sync(search_code_chunks, repo_ids, embedding, n)
+
+
+async def _keyword_candidates(repo_ids: RepoIds, question: str, n: int) -> List[RetrievedChunk]:
+    async with async_session() as sess:
+        return await sess.run_sync(keyword_search, repo_ids, question, n)
+
+
+# The question's embedding, or [(repo ids, embedding)], one per embedding
+# model, when the repos were indexed with different models
+QueryEmbedding = Union[List[float], List[Tuple[RepoIds, List[float]]]]
+
+
+async def hybrid_search(
+    repo_ids: RepoIds,
+    embedding: QueryEmbedding,
+    question: str,
+    k: int | None = None,
+) -> List[RetrievedChunk]:
+    """
+    Runs the vector and keyword queries concurrently, on separate async
+    sessions, and fuses their candidates with reciprocal rank fusion. Across
+    several repos, each query covers them all at once and every repo is held
+    to RETRIEVAL_MAX_PER_REPO of the top k. Repos embedded by different
+    models get a vector query, and a ranking in the fusion, per model.
+    """
+    repos = 1 if isinstance(repo_ids, int) else len(repo_ids)
+    # room for the quotas to pick from more than one repo
+    n = settings.RETRIEVAL_CANDIDATES * min(repos, 3)
+    groups = embedding if embedding and isinstance(embedding[0], tuple) else [(repo_ids, embedding)]
+    rankings = await asyncio.gather(
+        *[_vector_candidates(ids, emb, n) for ids, emb in groups],
+        _keyword_candidates(repo_ids, question, n),
+    )
+    return fuse(
+        list(rankings),
+        k or settings.RETRIEVAL_TOP_K,
+        settings.RETRIEVAL_MAX_PER_FILE,
+        settings.RETRIEVAL_RRF_K,
+        settings.RETRIEVAL_MAX_PER_REPO if repos > 1 else None,
+    )
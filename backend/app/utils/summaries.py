@@ -0,0 +1,145 @@
+import time
+from typing import Dict, List, Optional, Tuple
+
+from openai import OpenAI
+from sqlalchemy import case, delete, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.models import CodeChunk, File, Repo, RepoSummary
+from app.utils import metrics
+from app.utils.tokens import estimate_tokens
+
+SUMMARY_PROMPT = "Provide a concise 2–3 paragraph overview of this codebase:\n"
+
+# Files whose first chunk is considered for the summary, before the token budget applies
+SUMMARY_CANDIDATE_FILES = 200
+
+# -------------------------------------------------------------------------
+# Summary input
+# -------------------------------------------------------------------------
+
+def summary_source(session: Session, repo_id: int, max_tokens: Optional[int] = None) -> str:
+    """
+    Builds the text a repo summary is written from: the first chunk of the
+    repo's READMEs and top-level files, in that order, up to `max_tokens`.
+    """
+    budget = max_tokens or settings.SUMMARY_SOURCE_TOKENS
+    # READMEs first, then the shallowest files: they say the most about the whole repo
+    name = func.lower(func.regexp_replace(File.path, "^.*/", ""))
+    depth = func.length(File.path) - func.length(func.replace(File.path, "/", ""))
+    candidates = session.exec(
+        select(File.id, File.path)
+        .where(File.repo_id == repo_id)
+        .order_by(case((name.startswith("readme"), 0), else_=1), depth, File.path.collate("C"))
+        .limit(SUMMARY_CANDIDATE_FILES)
+    ).all()
+    if not candidates:
+        return ""
+
+    rows = session.exec(
+        select(CodeChunk.file_id, CodeChunk.content)
+        .where(CodeChunk.file_id.in_([file_id for file_id, _ in candidates]))
+        .distinct(CodeChunk.file_id)
+        .order_by(CodeChunk.file_id, func.coalesce(CodeChunk.start_line, 0))
+    ).all()
+    first_chunk = dict(rows)
+
+    parts: List[str] = []
+    used = 0
+    for file_id, path in candidates:
+        content = first_chunk.get(file_id)
+        if not content:
+            continue
+        part = f"# {path}\n{content}"
+        cost = estimate_tokens(part)
+        if used + cost > budget:
+            break
+        parts.append(part)
+        used += cost
+    return "\n\n".join(parts)
+
+# -------------------------------------------------------------------------
+# Storage
+# -------------------------------------------------------------------------
+
+# repo id -> (indexed commit, summary), shared by every request in the process
+_cache: Dict[int, Tuple[str, str]] = {}
+
+
+def save_summary(session: Session, repo_id: int, commit: str, summary: str) -> None:
+    session.execute(
+        insert(RepoSummary)
+        .values(repo_id=repo_id, commit=commit, summary=summary)
+        .on_conflict_do_nothing(constraint="uq_reposummary_repo_id_commit")
+    )
+    session.commit()
+    _cache[repo_id] = (commit, summary)
+
+
+def prune_summaries(session: Session, repo_id: int, commit: str) -> None:
+    """
+    Drops the summaries of commits other than `commit`. Run in the same
+    transaction that makes `commit` the repo's indexed commit.
+    """
+    session.execute(
+        delete(RepoSummary).where(RepoSummary.repo_id == repo_id, RepoSummary.commit != commit)
+    )
+
+
+def cached_summary(session: Session, repo_id: int) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Returns (indexed commit, summary) for a repo. The summary is None if none
+    has been stored for the indexed commit yet; the commit is None if the repo
+    was never indexed.
+    """
+    commit = session.exec(select(Repo.indexed_commit).where(Repo.id == repo_id)).first()
+    if commit is None:
+        return None, None
+
+    hit = _cache.get(repo_id)
+    if hit and hit[0] == commit:
+        return commit, hit[1]
+
+    summary = session.exec(
+        select(RepoSummary.summary).where(RepoSummary.repo_id == repo_id, RepoSummary.commit == commit)
+    ).first()
+    if summary is not None:
+        _cache[repo_id] = (commit, summary)
+    return commit, summary
+
+# -------------------------------------------------------------------------
+# Generation at index time
+# -------------------------------------------------------------------------
+
+def ensure_summary(session: Session, client: OpenAI, repo_id: int, commit: str) -> None:
+    """
+    Writes the summary for an indexed commit unless it already exists.
+    """
+    exists = session.exec(
+        select(RepoSummary.id).where(RepoSummary.repo_id == repo_id, RepoSummary.commit == commit)
+    ).first()
+    if exists is not None:
+        return
+
+    source = summary_source(session, repo_id)
+    if not source:
+        return
+    started = time.perf_counter()
+    try:
+        resp = client.chat.completions.create(
+            model=settings.CHAT_MODEL,
+            messages=[{"role": "user", "content": SUMMARY_PROMPT + source}],
+            temperature=0.5,
+            max_tokens=1000,
+        )
+    except Exception:
+        metrics.record_llm("index_summary", settings.CHAT_MODEL, time.perf_counter() - started, "error")
+        raise
+    usage = resp.usage
+    metrics.record_llm(
+        "index_summary", resp.model or settings.CHAT_MODEL, time.perf_counter() - started, "ok",
+        usage.prompt_tokens if usage else 0, usage.completion_tokens if usage else 0,
+    )
+    save_summary(session, repo_id, commit, resp.choices[0].message.content or "")
@@ -0,0 +1,65 @@
+import functools
+from typing import Optional
+
+import tiktoken
+
+from app.core.config import settings
+from app.utils import metrics
+
+# -------------------------------------------------------------------------
+# Token estimates
+# -------------------------------------------------------------------------
+
+# OpenAI's rule of thumb for English text and code
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate used for batching, where an exact count isn't worth a tokenizer pass.
+    """
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+# -------------------------------------------------------------------------
+# Exact counts with the chat model's tokenizer
+# -------------------------------------------------------------------------
+
+@functools.lru_cache(maxsize=None)
+def _encoding() -> Optional["tiktoken.Encoding"]:
+    # tiktoken downloads its BPE files on first use; without them (e.g. offline)
+    # counts fall back to the estimate rather than failing the request
+    try:
+        try:
+            return tiktoken.encoding_for_model(settings.CHAT_MODEL)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        metrics.log(f"Tokenizer unavailable ({type(e).__name__}), using estimated token counts")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Tokens in `text` for the chat model, counted locally.
+    """
+    if not text:
+        return 0
+    enc = _encoding()
+    if enc is None:
+        return estimate_tokens(text)
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """
+    The longest prefix of `text` that fits in `max_tokens`.
+    """
+    if max_tokens <= 0:
+        return ""
+    enc = _encoding()
+    if enc is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    tokens = enc.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return enc.decode(tokens[:max_tokens])
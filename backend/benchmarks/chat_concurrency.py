@@ -0,0 +1,230 @@
+"""
+Concurrent /api/chat streams one API process can sustain.
+
+Starts the API (uvicorn, one process) against a local fake OpenAI server and a
+seeded scratch repo, then runs `--concurrency` levels of clients, each sending
+`--rounds` chats one after another. For each level it reports completed and
+failed streams, time to first token, end-to-end latency and streams per second.
+A level counts as sustained when no stream fails and the p99 latency stays
+within `--max-slowdown` times the p50 of a single stream.
+
+Two database paths are compared:
+
+  async   app.db.async_engine: asyncpg sessions awaited on the event loop
+  sync    the path before it: sync sessions run on the default thread pool,
+          an engine with default pool settings and SQL echo on
+
+The answer cache is disabled so every request runs the agent graph.
+
+    python -m benchmarks.chat_concurrency --concurrency 1 10 25 50 100 --rounds 3 --latency 0.3
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import List, Optional, Tuple
+
+import httpx
+from sqlmodel import Session
+
+from app.db import engine
+from app.models import Repo
+from app.utils.summaries import save_summary
+from benchmarks.common import percentile, scratch_repo, seed_chunks
+from benchmarks.fake_openai import serve
+
+MODES = ("sync", "async")
+
+
+def use_sync_db() -> None:
+    """
+    Swaps the chat path's database calls for the ones before the async engine.
+    """
+    import sqlmodel
+    from app.agents import agent
+    from app.api.routers import chat
+    from app.core.config import settings
+    from app.models import File
+    from app.utils.retrieval import fuse, keyword_search, search_code_chunks
+    from app.utils.summaries import cached_summary, summary_source
+
+    legacy = sqlmodel.create_engine(settings.DATABASE_URL, echo=True)
+
+    def threaded(fn):
+        async def call(*args):
+            def run():
+                with Session(legacy) as sess:
+                    return fn(sess, *args)
+            return await asyncio.to_thread(run)
+        return call
+
+    def file_paths(sess, repo_ids, limit=agent.METADATA_FILES):
+        return {
+            repo_id: list(sess.exec(
+                sqlmodel.select(File.path).where(File.repo_id == repo_id).order_by(File.path.collate("C")).limit(limit)
+            ).all())
+            for repo_id in repo_ids
+        }
+
+    def repos(sess, repo_ids, full_names):
+        stmt = (
+            sqlmodel.select(Repo.id, Repo.full_name, Repo.indexed_commit, Repo.embedding_model)
+            .where(sqlmodel.or_(Repo.id.in_(repo_ids), Repo.full_name.in_(full_names)))
+            .order_by(Repo.id)
+        )
+        return list(sess.exec(stmt).all())
+
+    async def hybrid_search(repo_ids, embedding, question, k=None):
+        n = settings.RETRIEVAL_CANDIDATES
+        vector, keyword = await asyncio.gather(
+            threaded(search_code_chunks)(repo_ids, embedding, n),
+            threaded(keyword_search)(repo_ids, question, n),
+        )
+        return fuse([vector, keyword], k or settings.RETRIEVAL_TOP_K, settings.RETRIEVAL_MAX_PER_FILE, settings.RETRIEVAL_RRF_K)
+
+    agent.load_summary = threaded(cached_summary)
+    agent.load_summary_source = threaded(summary_source)
+    agent.store_summary = threaded(save_summary)
+    agent.load_file_paths = threaded(file_paths)
+    agent.hybrid_search = hybrid_search
+    chat.load_repos = threaded(repos)
+
+
+def run_server(port: int, mode: str) -> None:
+    import uvicorn
+    from app.main import app
+
+    if mode == "sync":
+        use_sync_db()
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(mode: str, openai_url: str) -> Tuple[subprocess.Popen, str]:
+    port = free_port()
+    env = dict(os.environ, OPENAI_BASE_URL=openai_url, ANSWER_CACHE_SIZE="0")
+    env.setdefault("OPENAI_API_KEY", "fake")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.chat_concurrency", "--serve", str(port), "--mode", mode],
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"API process exited with {proc.returncode}")
+        try:
+            httpx.get(f"{url}/health", timeout=1.0)
+            return proc, url
+        except httpx.TransportError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("API process did not start")
+
+
+# (time to first token, end to end) in seconds, or None for a failed stream
+Sample = Optional[Tuple[float, float]]
+
+
+async def one_chat(client: httpx.AsyncClient, repo_id: int, question: str) -> Sample:
+    start = time.perf_counter()
+    first = None
+    last = ""
+    try:
+        body = {"messages": [{"role": "user", "content": question}]}
+        async with client.stream("POST", "/api/chat", params={"repoId": repo_id}, json=body) as resp:
+            if resp.status_code != 200:
+                return None
+            async for line in resp.aiter_lines():
+                if line.startswith("0:") and first is None:
+                    first = time.perf_counter() - start
+                if line:
+                    last = line
+    except httpx.HTTPError:
+        return None
+    if not last.startswith("d:"):
+        return None
+    return first or 0.0, time.perf_counter() - start
+
+
+async def load(url: str, repo_id: int, concurrency: int, rounds: int, timeout: float) -> Tuple[List[Sample], float]:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+        async def worker(w: int) -> List[Sample]:
+            return [
+                await one_chat(client, repo_id, f"How does request {w}-{r} get handled?")
+                for r in range(rounds)
+            ]
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(worker(w) for w in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return [s for samples in results for s in samples], elapsed
+
+
+def run(levels: List[int], rounds: int, chunks: int, latency: float, token_delay: float, timeout: float, max_slowdown: float) -> None:
+    with serve(latency=latency, token_delay=token_delay, reply_tokens=50) as fake, scratch_repo("chat-concurrency") as repo:
+        seed_chunks(repo.id, chunks)
+        with Session(engine) as sess:
+            row = sess.get(Repo, repo.id)
+            row.indexed_commit = "bench"
+            sess.add(row)
+            sess.commit()
+            # the summary the indexer would have written
+            save_summary(sess, repo.id, "bench", "A benchmark repository.")
+
+        print(f"{'db':<6} {'streams':>8} {'ok':>6} {'failed':>7} {'ttft p50':>9} {'e2e p50':>8} {'e2e p99':>8} {'streams/s':>10}")
+        for mode in MODES:
+            proc, url = start_server(mode, fake.base_url)
+            sustained = 0
+            baseline = None
+            try:
+                for concurrency in levels:
+                    samples, elapsed = asyncio.run(load(url, repo.id, concurrency, rounds, timeout))
+                    ok = [s for s in samples if s is not None]
+                    failed = len(samples) - len(ok)
+                    if not ok:
+                        print(f"{mode:<6} {concurrency:>8} {0:>6} {failed:>7}")
+                        break
+                    ttft = [s[0] for s in ok]
+                    e2e = [s[1] for s in ok]
+                    baseline = baseline or percentile(e2e, 50)
+                    print(
+                        f"{mode:<6} {concurrency:>8} {len(ok):>6} {failed:>7} {percentile(ttft, 50):>9.2f} "
+                        f"{percentile(e2e, 50):>8.2f} {percentile(e2e, 99):>8.2f} {len(ok) / elapsed:>10.1f}"
+                    )
+                    if failed or percentile(e2e, 99) > max_slowdown * baseline:
+                        break
+                    sustained = concurrency
+            finally:
+                proc.terminate()
+                proc.wait()
+            print(f"{mode}: sustained {sustained} concurrent streams")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 25, 50, 100])
+    parser.add_argument("--rounds", type=int, default=3, help="chats each client sends one after another")
+    parser.add_argument("--chunks", type=int, default=2_000)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds before the first byte of every fake OpenAI response")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="seconds between streamed tokens")
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds before a stream counts as failed")
+    parser.add_argument("--max-slowdown", type=float, default=2.0, help="p99 / single-stream p50 above which a level is not sustained")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--mode", choices=MODES, default="async", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        run_server(args.serve, args.mode)
+    else:
+        run(args.concurrency, args.rounds, args.chunks, args.latency, args.token_delay, args.timeout, args.max_slowdown)
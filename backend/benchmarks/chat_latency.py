@@ -0,0 +1,124 @@
+"""
+Chat latency against a local fake OpenAI server.
+
+Seeds a throwaway repo with chunks, points the agent at benchmarks/fake_openai.py
+and reports time to first answer token and end-to-end latency per request for:
+
+  current  app.agents.agent.get_graph("full")
+  legacy   the same nodes wired as before: summarize_repo -> embed -> fetch_context
+           -> research loops -> aggregate, with the repo summary written by the
+           LLM on every request and on the critical path
+
+    python -m benchmarks.chat_latency --requests 10 --latency 0.3 --token-delay 0.005
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from typing import List, Tuple
+
+from sqlmodel import Session
+
+from app.db import async_engine, engine
+from app.models import Repo
+from benchmarks.common import percentile, scratch_repo, seed_chunks
+from benchmarks.fake_openai import serve
+
+
+def legacy_graph(agent):
+    from langgraph.graph import StateGraph, START, END
+
+    async def live_summary(state):
+        return {"summary": await agent.generate_summary(state["repo_ids"][0])}
+
+    builder = StateGraph(agent.State)
+    builder.add_node("summarize_repo", live_summary)
+    builder.add_node("fetch_metadata", agent.fetch_metadata_node)
+    builder.add_node("embed", agent.embed_node)
+    builder.add_node("fetch_context", agent.fetch_context_node)
+    builder.add_node("assemble_context", agent.assemble_context_node)
+    for scope in ("logic", "file", "arch"):
+        builder.add_node(f"research_{scope}_node", agent.research_node(scope))
+    builder.add_node("aggregate", agent.aggregate_node)
+
+    builder.add_edge(START, "summarize_repo")
+    builder.add_edge(START, "fetch_metadata")
+    builder.add_edge("summarize_repo", "embed")
+    builder.add_edge("fetch_metadata", "embed")
+    builder.add_edge("embed", "fetch_context")
+    builder.add_edge("fetch_context", "assemble_context")
+    for scope in ("logic", "file", "arch"):
+        builder.add_edge("assemble_context", f"research_{scope}_node")
+        builder.add_edge(f"research_{scope}_node", "aggregate")
+    builder.add_edge("aggregate", END)
+    return builder.compile()
+
+
+async def measure(graph, repo_id: int, question: str) -> Tuple[float, float]:
+    state = {"repo_ids": [repo_id], "messages": [{"role": "user", "content": question}]}
+    start = time.perf_counter()
+    first = None
+    async for token, metadata in graph.astream(state, stream_mode="messages"):
+        if metadata.get("langgraph_node") == "aggregate" and getattr(token, "content", "") and first is None:
+            first = time.perf_counter() - start
+    return first or 0.0, time.perf_counter() - start
+
+
+def mark_indexed(repo_id: int) -> None:
+    with Session(engine) as sess:
+        repo = sess.get(Repo, repo_id)
+        repo.indexed_commit = "bench"
+        sess.add(repo)
+        sess.commit()
+
+
+async def measure_graphs(agent, graphs, repo_id: int, requests: int) -> None:
+    # the summary the indexer would have written
+    await agent.generate_summary(repo_id, "bench")
+    print(f"{'graph':<8} {'ttft p50':>9} {'ttft p99':>9} {'e2e p50':>9} {'e2e p99':>9}   (seconds)")
+    for label, graph in graphs:
+        samples = [
+            await measure(graph, repo_id, f"How does request {i} get handled?")
+            for i in range(requests)
+        ]
+        report(label, samples)
+    await async_engine.dispose()
+
+
+def report(label: str, samples: List[Tuple[float, float]]) -> None:
+    ttft = [s[0] for s in samples]
+    total = [s[1] for s in samples]
+    print(
+        f"{label:<8} {percentile(ttft, 50):>9.2f} {percentile(ttft, 99):>9.2f} "
+        f"{percentile(total, 50):>9.2f} {percentile(total, 99):>9.2f}"
+    )
+
+
+def run(requests: int, chunks: int, latency: float, token_delay: float, reply_tokens: int) -> None:
+    with serve(latency=latency, token_delay=token_delay, reply_tokens=reply_tokens) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "fake")
+        # imported late so the models pick up the fake server's URL
+        from app.agents import agent
+
+        graphs = [("current", agent.get_graph("full")), ("legacy", legacy_graph(agent))]
+        with scratch_repo("chat-latency") as repo:
+            seed_chunks(repo.id, chunks)
+            mark_indexed(repo.id)
+            # one event loop throughout: pooled async DB connections belong to it
+            asyncio.run(measure_graphs(agent, graphs, repo.id, requests))
+        print(f"{server.chat_requests} chat requests, {server.requests} requests in total")
+        for node in agent.prompt_tokens.stats():
+            print(agent.prompt_tokens.format(node))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--chunks", type=int, default=2_000)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds before the first byte of every response")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="seconds between streamed tokens")
+    parser.add_argument("--reply-tokens", type=int, default=100)
+    args = parser.parse_args()
+    run(args.requests, args.chunks, args.latency, args.token_delay, args.reply_tokens)
@@ -0,0 +1,221 @@
+"""
+LLM calls and latency per chat, before and after question routing.
+
+Runs the labelled questions in benchmarks/data/chat_questions.json one at a
+time against a seeded scratch repo and a local fake OpenAI server, through:
+
+  legacy  every question down the full graph, with research loops that only
+          stop early when two passes return identical text
+  full    every question down the full graph (mode=full), with research loops
+          that stop on high confidence or a converged answer
+  auto    app.agents.agent.choose_plan routing each question to its plan
+
+and reports LLM calls per chat (chat completions the fake server answered,
+router calls included), time to first answer token and end-to-end latency,
+then the plans auto picked: how many questions the rules placed, and how
+often the rules and the router model agreed with the label.
+
+The fake server scripts its replies. The router model answers with the
+question's label. Each research scope answers a question the same way every
+run: with high confidence in the first pass (`--confident` of scope and
+question pairs), with a second pass that rewrites a few words of the first
+(`--stable`), or with a second pass that rewrites half of it. Other calls get
+filler text.
+
+    python -m benchmarks.chat_plans --latency 0.3 --token-delay 0.005 --confident 0.4 --stable 0.3
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from benchmarks.chat_latency import mark_indexed
+from benchmarks.common import percentile, scratch_repo, seed_chunks
+from benchmarks.fake_openai import serve
+
+QUESTIONS = Path(__file__).parent / "data" / "chat_questions.json"
+# opens every scripted research answer, so a refinement prompt can be told apart
+FINDING = "Finding:"
+
+
+def legacy_graph(agent):
+    """
+    The full graph with the research loop as it was before convergence checks.
+    """
+    from langgraph.graph import StateGraph, START, END
+
+    def research_node(scope: str):
+        @agent.with_timeout(f"research_{scope}", fallback={f"research_{scope}": None})
+        async def node(state):
+            context = state.get("context", "") or ""
+            question = agent.extract_text_from_message(state["messages"][-1])
+            answer = ""
+            for _ in range(2):
+                prompt = agent.research_prompt(scope, context, question, answer)
+                resp = await agent.get_llm().ainvoke([{"role": "user", "content": prompt}])
+                text_resp = agent.extract_text_from_message(resp)
+                if text_resp.strip() == answer.strip():
+                    break
+                answer = text_resp
+            return {f"research_{scope}": answer}
+        return node
+
+    builder = StateGraph(agent.State)
+    builder.add_node("summarize_repo", agent.summarize_repo_node)
+    builder.add_node("fetch_metadata", agent.fetch_metadata_node)
+    builder.add_node("embed", agent.embed_node)
+    builder.add_node("fetch_context", agent.fetch_context_node)
+    builder.add_node("assemble_context", agent.assemble_context_node)
+    for scope in ("logic", "file", "arch"):
+        builder.add_node(f"research_{scope}_node", research_node(scope))
+    builder.add_node("aggregate", agent.aggregate_node)
+    builder.add_edge(START, "embed")
+    builder.add_edge(START, "fetch_metadata")
+    builder.add_edge("embed", "fetch_context")
+    builder.add_edge("fetch_context", "assemble_context")
+    builder.add_edge("assemble_context", "summarize_repo")
+    for scope in ("logic", "file", "arch"):
+        builder.add_edge("assemble_context", f"research_{scope}_node")
+    builder.add_edge(
+        ["summarize_repo", "fetch_metadata", "research_logic_node", "research_file_node", "research_arch_node"],
+        "aggregate",
+    )
+    builder.add_edge("aggregate", END)
+    return builder.compile()
+
+
+class Replies:
+    """
+    Scripted replies of the fake server: router labels and research answers.
+    """
+
+    def __init__(self, labels: Dict[str, str], confident: float, stable: float, words: int):
+        self.labels = labels
+        self.confident = confident
+        self.stable = stable
+        self.words = words
+
+    def __call__(self, payload: dict) -> Optional[str]:
+        prompt = str(payload["messages"][-1].get("content", ""))
+        if prompt.startswith("Classify a question"):
+            return self.labels.get(prompt.rsplit("Question: ", 1)[-1].strip(), "full")
+        match = re.match(r"Research in the (\w+) scope", prompt)
+        if match is None:
+            return None
+        question = prompt.rsplit("Question:\n", 1)[-1].split("\nEnd with", 1)[0].strip()
+        return self.research(match.group(1), question, FINDING in prompt)
+
+    def research(self, scope: str, question: str, refining: bool) -> str:
+        seed = int.from_bytes(hashlib.sha256(f"{scope}\0{question}".encode()).digest()[:8], "little")
+        rng = random.Random(seed)
+        draw = rng.random()
+        words = [f"w{rng.randrange(1000)}" for _ in range(self.words)]
+        if draw < self.confident:
+            return f"{FINDING} {' '.join(words)}\nCONFIDENCE: high"
+        if refining:
+            rewrite = 0.05 if draw < self.confident + self.stable else 0.5
+            for i in rng.sample(range(self.words), int(self.words * rewrite)):
+                words[i] = f"r{rng.randrange(1000)}"
+        return f"{FINDING} {' '.join(words)}\nCONFIDENCE: medium"
+
+
+async def ask(agent, graph, repo_id: int, question: str, server, plan: Optional[str] = None) -> Tuple[str, int, float, float]:
+    """
+    (plan, LLM calls, seconds to first answer token, seconds in total) of one
+    chat; routed with choose_plan unless a graph is given.
+    """
+    state = {"repo_ids": [repo_id], "messages": [{"role": "user", "content": question}]}
+    calls = server.chat_requests
+    start = time.perf_counter()
+    if graph is None:
+        plan = await agent.choose_plan(question)
+        graph = agent.get_graph(plan)
+    first = None
+    async for token, metadata in graph.astream(state, stream_mode="messages"):
+        if metadata.get("langgraph_node") == "aggregate" and getattr(token, "content", "") and first is None:
+            first = time.perf_counter() - start
+    return plan, server.chat_requests - calls, first or 0.0, time.perf_counter() - start
+
+
+def report(label: str, samples: List[Tuple[str, int, float, float]]) -> None:
+    calls = [s[1] for s in samples]
+    ttft = [s[2] for s in samples]
+    total = [s[3] for s in samples]
+    print(
+        f"{label:<8} {len(samples):>5} {sum(calls) / len(calls):>6.2f} "
+        f"{percentile(ttft, 50):>9.2f} {percentile(ttft, 99):>9.2f} "
+        f"{percentile(total, 50):>9.2f} {percentile(total, 99):>9.2f}"
+    )
+
+
+async def measure(agent, server, repo_id: int, questions: List[dict]) -> None:
+    from app.db import async_engine
+    from app.utils.question_router import classify_question
+
+    # the summary the indexer would have written
+    await agent.generate_summary(repo_id, "bench")
+    runs = [("legacy", legacy_graph(agent), "full"), ("full", agent.get_graph("full"), "full"), ("auto", None, None)]
+    print(f"{'run':<8} {'chats':>5} {'calls':>6} {'ttft p50':>9} {'ttft p99':>9} {'e2e p50':>9} {'e2e p99':>9}   (seconds)")
+    routed = []
+    for label, graph, plan in runs:
+        samples = [await ask(agent, graph, repo_id, q["question"], server, plan) for q in questions]
+        report(label, samples)
+        if graph is None:
+            routed = samples
+    await async_engine.dispose()
+
+    print("\nauto, by plan picked")
+    for plan in ("summary", "direct", "full"):
+        samples = [s for s in routed if s[0] == plan]
+        if samples:
+            report(plan, samples)
+
+    by_rules = [(q, classify_question(q["question"])) for q in questions]
+    placed = [(q, plan) for q, plan in by_rules if plan is not None]
+    picked = Counter((q["plan"], s[0]) for q, s in zip(questions, routed))
+    print(
+        f"\nrules placed {len(placed)}/{len(questions)} questions, "
+        f"{sum(q['plan'] == plan for q, plan in placed)} as labelled; "
+        f"the router model placed the rest"
+    )
+    print(f"{'label':<8} " + " ".join(f"{p:>8}" for p in ("summary", "direct", "full")))
+    for label in ("summary", "direct", "full"):
+        print(f"{label:<8} " + " ".join(f"{picked[(label, p)]:>8}" for p in ("summary", "direct", "full")))
+
+
+def run(questions_path: Path, chunks: int, latency: float, token_delay: float, reply_tokens: int,
+        confident: float, stable: float) -> None:
+    questions = json.loads(questions_path.read_text())
+    replies = Replies({q["question"]: q["plan"] for q in questions}, confident, stable, reply_tokens)
+    with serve(latency=latency, token_delay=token_delay, reply_tokens=reply_tokens, reply=replies) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "fake")
+        # imported late so the models pick up the fake server's URL
+        from app.agents import agent
+
+        with scratch_repo("chat-plans") as repo:
+            seed_chunks(repo.id, chunks)
+            mark_indexed(repo.id)
+            # one event loop throughout: pooled async DB connections belong to it
+            asyncio.run(measure(agent, server, repo.id, questions))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=Path, default=QUESTIONS)
+    parser.add_argument("--chunks", type=int, default=2_000)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds before the first byte of every response")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="seconds between streamed tokens")
+    parser.add_argument("--reply-tokens", type=int, default=100)
+    parser.add_argument("--confident", type=float, default=0.4, help="share of research answers confident in one pass")
+    parser.add_argument("--stable", type=float, default=0.3, help="share whose second pass barely changes the first")
+    args = parser.parse_args()
+    run(args.questions, args.chunks, args.latency, args.token_delay, args.reply_tokens, args.confident, args.stable)
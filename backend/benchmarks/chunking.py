@@ -0,0 +1,81 @@
+"""
+Chunker throughput and chunk counts per repository.
+
+Chunks every indexable file of each repo with app.utils.chunking and with the
+old fixed 1000-character slicer, and reports chunks, chunks/s and chunk sizes
+for both. Repos are local directories or git URLs (shallow-cloned to a temp dir).
+No database is needed.
+
+    python -m benchmarks.chunking ../ https://github.com/tiangolo/fastapi.git --max-tokens 400
+"""
+
+import argparse
+import os
+import tempfile
+from typing import Iterator, List, Tuple
+
+from git import Repo as GitPythonRepo
+
+from app.utils.chunking import chunk_file
+from app.utils.index_rules import should_index
+from app.utils.tokens import estimate_tokens
+from benchmarks.common import percentile, timer
+
+
+def indexable_files(root: str) -> Iterator[Tuple[str, str]]:
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d != ".git"]
+        for name in filenames:
+            full = os.path.join(dirpath, name)
+            rel = os.path.relpath(full, root)
+            if should_index(rel):
+                yield rel, full
+
+
+def fixed_size_chunks(content: str, size: int = 1000) -> List[str]:
+    # the slicer app.scripts.indexer used before app.utils.chunking
+    return [c.strip() for c in (content[i:i + size] for i in range(0, len(content), size)) if c.strip()]
+
+
+def report(label: str, sizes: List[int], elapsed: float) -> None:
+    print(
+        f"  {label:<8} {len(sizes):>9} {len(sizes) / elapsed:>10.0f} "
+        f"{sum(sizes) / max(1, len(sizes)):>10.0f} {percentile(sizes, 99) if sizes else 0:>10}"
+    )
+
+
+def run(root: str, max_tokens: int, overlap_lines: int) -> None:
+    files = list(indexable_files(root))
+    total_bytes = sum(os.path.getsize(full) for _, full in files)
+    print(f"{root}: {len(files)} files, {total_bytes / 1e6:.1f} MB")
+    print(f"  {'chunker':<8} {'chunks':>9} {'chunks/s':>10} {'avg tok':>10} {'p99 tok':>10}")
+
+    sizes: List[int] = []
+    with timer() as t:
+        for rel, full in files:
+            with open(full, "r", encoding="utf-8", errors="ignore") as f:
+                sizes.extend(estimate_tokens(c.content) for c in chunk_file(rel, f, max_tokens, overlap_lines))
+    report("syntax", sizes, t[0])
+
+    sizes = []
+    with timer() as t:
+        for _, full in files:
+            with open(full, "r", encoding="utf-8", errors="ignore") as f:
+                sizes.extend(estimate_tokens(c) for c in fixed_size_chunks(f.read()))
+    report("fixed", sizes, t[0])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("repos", nargs="+", help="local directories or git URLs")
+    parser.add_argument("--max-tokens", type=int, default=400)
+    parser.add_argument("--overlap-lines", type=int, default=0)
+    args = parser.parse_args()
+
+    for repo in args.repos:
+        if os.path.isdir(repo):
+            run(repo, args.max_tokens, args.overlap_lines)
+            continue
+        with tempfile.TemporaryDirectory(prefix="bench_chunking_") as tmpdir:
+            GitPythonRepo.clone_from(repo, tmpdir, depth=1)
+            run(tmpdir, args.max_tokens, args.overlap_lines)
@@ -0,0 +1,169 @@
+"""
+Import time and cold start of each process role.
+
+For each role, starts `--runs` fresh interpreters that import its entry
+module and reports the import time (p50), the whole process's wall time and
+peak RSS, and which heavy dependencies the import loaded:
+
+  api     app.main with CHAT_ENABLED=false, an API process serving repos only
+  chat    app.main, an API process that also serves /api/chat
+  worker  app.scripts.worker, the index worker's parent process
+  index   app.scripts.indexer, what each index worker process runs
+
+`--top` lists the slowest imports of each role from `python -X importtime`,
+by cumulative time. `--serve` also starts the api and chat roles under
+uvicorn and reports the seconds until /health answers (after the chat
+warm-up, CHAT_WARM_UP) and the server's RSS then.
+
+The script imports nothing from app itself, so it can be copied into an
+older checkout to compare.
+
+    python -m benchmarks.cold_start --runs 5 --top 8 --serve
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Dict, List, Optional, Tuple
+
+ROLES = {
+    "api": ("app.main", {"CHAT_ENABLED": "false"}),
+    "chat": ("app.main", {"CHAT_ENABLED": "true"}),
+    "worker": ("app.scripts.worker", {}),
+    "index": ("app.scripts.indexer", {}),
+}
+HEAVY = ("langgraph", "langchain", "langchain_core", "langchain_openai", "openai", "tiktoken", "numpy", "onnxruntime", "git")
+
+PROBE = """
+import sys, time
+started = time.perf_counter()
+import {module}
+print(time.perf_counter() - started)
+print(" ".join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))]
+
+
+def role_env(extra: Dict[str, str]) -> Dict[str, str]:
+    env = dict(os.environ, **extra)
+    env.setdefault("OPENAI_API_KEY", "fake")
+    return env
+
+
+def probe(module: str, env: Dict[str, str]) -> Tuple[float, float, float, str]:
+    """
+    (import seconds, process seconds, peak RSS in MB, heavy modules loaded) of one fresh interpreter.
+    """
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY)],
+        env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+    )
+    out = proc.stdout.read()
+    _, status, usage = os.wait4(proc.pid, 0)
+    wall = time.perf_counter() - started
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode != 0:
+        raise RuntimeError(f"importing {module} failed with {proc.returncode}")
+    seconds, loaded = (out.splitlines() + [""])[:2]
+    return float(seconds), wall, usage.ru_maxrss / 1024, loaded
+
+
+def slowest_imports(module: str, env: Dict[str, str], top: int) -> List[Tuple[float, str]]:
+    """
+    The `top` imports with the largest cumulative time, nested ones included.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        rows.append((int(cumulative) / 1e6, name.rstrip()))
+    rows.sort(reverse=True)
+    return [(seconds, name) for seconds, name in rows if name.strip() != module][:top]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rss_mb(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def serve(env: Dict[str, str], timeout: float = 120) -> Tuple[float, Optional[float]]:
+    """
+    Seconds from starting uvicorn to /health answering, and the server's RSS then.
+    """
+    port = free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"API process exited with {proc.returncode}")
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1).read()
+                return time.perf_counter() - started, rss_mb(proc.pid)
+            except OSError:
+                time.sleep(0.02)
+        raise RuntimeError("API process did not start")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def run(roles: List[str], runs: int, top: int, serve_roles: bool) -> None:
+    print(f"{'role':<7} {'import p50':>10} {'process p50':>11} {'rss MB':>7}  heavy modules loaded   (seconds)")
+    for role in roles:
+        module, extra = ROLES[role]
+        env = role_env(extra)
+        samples = [probe(module, env) for _ in range(runs)]
+        print(
+            f"{role:<7} {percentile([s[0] for s in samples], 50):>10.2f} "
+            f"{percentile([s[1] for s in samples], 50):>11.2f} {max(s[2] for s in samples):>7.0f}  "
+            f"{samples[-1][3] or '-'}"
+        )
+        if top:
+            for seconds, name in slowest_imports(module, env, top):
+                print(f"          {seconds:>6.2f}  {name.strip()}")
+
+    if serve_roles:
+        print(f"\n{'server':<7} {'ready s':>10} {'rss MB':>11}")
+        for role in ("api", "chat"):
+            ready, rss = serve(role_env(ROLES[role][1]))
+            print(f"{role:<7} {ready:>10.2f} {rss or 0:>11.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--roles", nargs="+", choices=list(ROLES), default=list(ROLES))
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per role")
+    parser.add_argument("--top", type=int, default=0, help="slowest imports listed per role")
+    parser.add_argument("--serve", action="store_true", help="also time uvicorn until /health answers")
+    args = parser.parse_args()
+    run(args.roles, args.runs, args.top, args.serve)
@@ -0,0 +1,102 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Benchmarks run against the database in DATABASE_URL and create their own
+throwaway repos, which are deleted (with their files and chunks) on exit.
+"""
+
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Iterator, List
+
+from sqlalchemy import insert
+from sqlmodel import Session
+
+from app.db import engine
+from app.models import Repo, File, CodeChunk
+
+EMBEDDING_DIM = 1536
+
+
+def random_embedding(dim: int = EMBEDDING_DIM) -> List[float]:
+    vec = [random.gauss(0.0, 1.0) for _ in range(dim)]
+    norm = sum(x * x for x in vec) ** 0.5
+    return [x / norm for x in vec]
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+@contextmanager
+def timer() -> Iterator[List[float]]:
+    """
+    Yields a one-element list that holds the elapsed seconds after the block exits.
+    """
+    out = [0.0]
+    start = time.perf_counter()
+    try:
+        yield out
+    finally:
+        out[0] = time.perf_counter() - start
+
+
+@contextmanager
+def scratch_repo(label: str) -> Iterator[Repo]:
+    """
+    Creates an empty repo row for a benchmark and removes it afterwards.
+    """
+    name = f"{label}-{uuid.uuid4().hex[:8]}"
+    with Session(engine) as sess:
+        repo = Repo(
+            owner="bench",
+            name=name,
+            full_name=f"bench/{name}",
+            default_branch="main",
+        )
+        sess.add(repo)
+        sess.commit()
+        sess.refresh(repo)
+    try:
+        yield repo
+    finally:
+        with Session(engine) as sess:
+            obj = sess.get(Repo, repo.id)
+            if obj:
+                sess.delete(obj)
+                sess.commit()
+
+
+def seed_chunks(repo_id: int, count: int, chunks_per_file: int = 50, batch_size: int = 1000) -> None:
+    """
+    Inserts `count` chunks with random unit embeddings into the given repo.
+    """
+    with Session(engine) as sess:
+        remaining = count
+        while remaining > 0:
+            n_files = min(batch_size, remaining) // chunks_per_file or 1
+            files = []
+            for _ in range(n_files):
+                f = File(repo_id=repo_id, path=f"src/{uuid.uuid4().hex}.py")
+                sess.add(f)
+                files.append(f)
+            sess.flush()
+
+            rows = []
+            for f in files:
+                for i in range(min(chunks_per_file, remaining - len(rows))):
+                    rows.append({
+                        "file_id": f.id,
+                        "start_line": i * 20 + 1,
+                        "end_line": (i + 1) * 20,
+                        "content": f"def chunk_{f.id}_{i}():\n    return {i}\n",
+                        "embedding": random_embedding(),
+                    })
+            if rows:
+                sess.execute(insert(CodeChunk), rows)
+            remaining -= len(rows)
+            sess.commit()
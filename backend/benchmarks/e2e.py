@@ -0,0 +1,396 @@
+"""
+End-to-end offline benchmark of indexing and chat, with results as JSON.
+
+Generates a synthetic git repository of `--files` source files in the
+`--languages` mix (extension=weight), each with `--functions` functions,
+then runs against a local fake OpenAI server (`--latency`, `--token-delay`)
+and the database in DATABASE_URL:
+
+  index    index_repo in a fresh process, as an index worker runs it: seconds,
+           files, chunks and source MB per second, the process's peak RSS,
+           requests made to the fake server, and database growth (the repo's
+           chunk rows, and the whole database with indexes and the embedding
+           cache); then a re-index with nothing changed
+  chat     the API under uvicorn over the indexed repo, with the answer cache
+           off: `--questions` chats one at a time, then `--concurrency` levels
+           of clients each sending `--rounds` chats. Reports time to first
+           token, end-to-end latency, streams per second, failures, LLM calls
+           per chat and the API's peak RSS.
+
+Chats take turns through the questions in benchmarks/data/chat_questions.json,
+shuffled once, so every level runs the agent's plans in about that mix.
+
+Results are printed and written as JSON to `--output`, together with the
+commit, the package version and the settings they were measured with.
+`--baseline` compares them with an earlier results file and exits with
+status 1 when any metric is more than `--tolerance` worse.
+
+    python -m benchmarks.e2e --files 1000 --languages py=4 ts=3 go=2 md=1 --concurrency 8 32 --output e2e.json
+    python -m benchmarks.e2e --files 1000 --baseline e2e.json
+"""
+
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import httpx
+from git import Repo as GitPythonRepo
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.db import engine
+from benchmarks.chat_concurrency import one_chat, start_server
+from benchmarks.chat_plans import QUESTIONS
+from benchmarks.common import percentile, scratch_repo, timer
+from benchmarks.fake_openai import serve
+from benchmarks.git_ingest import write
+from benchmarks.index_resume import set_clone_url, start_index
+
+WORDS = ["request", "handler", "index", "chunk", "value", "result", "config", "parse", "token", "cache"]
+
+# extension -> (file header, one function, file footer); functions are
+# formatted with words a and b, their capitalised forms A and B, the file
+# number n, the function number i and a constant k
+TEMPLATES: Dict[str, Tuple[str, str, str]] = {
+    "py": (
+        "import math\n\n\n",
+        'def {a}_{b}_{n}_{i}(x, y):\n    """Computes the {a} of a {b}."""\n    {a} = x + y * {k}\n    return {a}\n\n\n',
+        "",
+    ),
+    "ts": (
+        "import {{ {A} }} from './{a}';\n\n",
+        "/** Computes the {a} of a {b}. */\nexport function {a}{B}{n}_{i}(x: number, y: number): number {{\n"
+        "  const {a} = x + y * {k};\n  return {a};\n}}\n\n",
+        "",
+    ),
+    "js": (
+        "'use strict';\n\n",
+        "// Computes the {a} of a {b}.\nfunction {a}{B}{n}_{i}(x, y) {{\n  const {a} = x + y * {k};\n  return {a};\n}}\n\n",
+        "module.exports = {{}};\n",
+    ),
+    "go": (
+        "package pkg{n}\n\n",
+        "// {A}{B}{i} computes the {a} of a {b}.\nfunc {A}{B}{i}(x, y int) int {{\n\t{a} := x + y*{k}\n\treturn {a}\n}}\n\n",
+        "",
+    ),
+    "java": (
+        "package bench;\n\npublic class Module{n} {{\n",
+        "    /** Computes the {a} of a {b}. */\n    public static int {a}{B}{i}(int x, int y) {{\n"
+        "        int {a} = x + y * {k};\n        return {a};\n    }}\n\n",
+        "}}\n",
+    ),
+    "rs": (
+        "use std::fmt;\n\n",
+        "/// Computes the {a} of a {b}.\npub fn {a}_{b}_{i}(x: i64, y: i64) -> i64 {{\n    let {a} = x + y * {k};\n    {a}\n}}\n\n",
+        "",
+    ),
+    "md": (
+        "# Module {n}\n\n",
+        "## The {a} of a {b}\n\nEach {b} has a {a}, computed from x and y as x + y * {k}. "
+        "Callers pass the {b} they hold and get its {a} back.\n\n",
+        "",
+    ),
+}
+
+# lower is better unless the metric's name ends with one of these
+HIGHER_IS_BETTER = ("per_second",)
+
+
+def parse_mix(specs: List[str]) -> Dict[str, float]:
+    mix = {}
+    for spec in specs:
+        ext, _, weight = spec.partition("=")
+        if ext not in TEMPLATES:
+            raise SystemExit(f"Unknown language {ext!r}; pick from {', '.join(TEMPLATES)}")
+        mix[ext] = float(weight or 1)
+    return mix
+
+
+def source_file(rng: random.Random, ext: str, n: int, functions: Tuple[int, int]) -> str:
+    header, function, footer = TEMPLATES[ext]
+    parts = [header.format(n=n, a=rng.choice(WORDS), A=rng.choice(WORDS).capitalize())]
+    for i in range(rng.randint(*functions)):
+        a, b = rng.sample(WORDS, 2)
+        parts.append(function.format(a=a, b=b, A=a.capitalize(), B=b.capitalize(), n=n, i=i, k=rng.randint(1, 100)))
+    parts.append(footer.format(n=n))
+    return "".join(parts)
+
+
+def make_repo(path: str, files: int, mix: Dict[str, float], functions: Tuple[int, int], salt: str) -> Dict[str, int]:
+    """
+    Writes and commits the synthetic repository; returns the files per language.
+    Contents are salted so the embedding cache holds nothing from earlier runs.
+    """
+    rng = random.Random(0)
+    exts = rng.choices(list(mix), weights=list(mix.values()), k=files)
+    for n, ext in enumerate(exts):
+        comment = "<!-- {} -->\n" if ext == "md" else ("# {}\n" if ext == "py" else "// {}\n")
+        write(path, f"src/pkg{n % 20}/module_{n}.{ext}", comment.format(salt) + source_file(rng, ext, n, functions))
+    git_repo = GitPythonRepo.init(path)
+    git_repo.git.add("-A")
+    git_repo.git(c=["user.name=bench", "user.email=bench@example.com"]).commit("-q", "-m", "fixture")
+    git_repo.close()
+    return {ext: exts.count(ext) for ext in mix}
+
+
+def database_bytes() -> int:
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT pg_database_size(current_database())")).scalar_one()
+
+
+def repo_stats(repo_id: int) -> Dict[str, float]:
+    with Session(engine) as sess:
+        files, source = sess.execute(
+            text("SELECT count(*), coalesce(sum(size), 0) FROM file WHERE repo_id = :id"), {"id": repo_id}
+        ).one()
+        chunks, row_bytes = sess.execute(text(
+            "SELECT count(*), coalesce(sum(pg_column_size(c.*)), 0) FROM codechunk c "
+            "JOIN file f ON f.id = c.file_id WHERE f.repo_id = :id"
+        ), {"id": repo_id}).one()
+    return {"files": files, "chunks": chunks, "source_mb": source / 1e6, "chunk_rows_mb": row_bytes / 1e6}
+
+
+def index(repo_id: int, env: Dict[str, str]) -> Tuple[float, float]:
+    """
+    Seconds and peak RSS (MB) of one index run in a fresh process.
+    """
+    with timer() as t:
+        proc = start_index(repo_id, env)
+        _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode != 0:
+        raise RuntimeError(f"index run exited with {proc.returncode}")
+    return t[0], usage.ru_maxrss / 1024
+
+
+def measure_index(repo_id: int, env: Dict[str, str], fake) -> Dict[str, float]:
+    before = database_bytes()
+    requests, chats = fake.requests, fake.chat_requests
+    seconds, rss = index(repo_id, env)
+    stats = repo_stats(repo_id)
+    result = {
+        **stats,
+        "seconds": seconds,
+        "files_per_second": stats["files"] / seconds,
+        "chunks_per_second": stats["chunks"] / seconds,
+        "source_mb_per_second": stats["source_mb"] / seconds,
+        "peak_rss_mb": rss,
+        "embedding_requests": (fake.requests - requests) - (fake.chat_requests - chats),
+        "chat_requests": fake.chat_requests - chats,
+        "db_growth_mb": (database_bytes() - before) / 1e6,
+    }
+    result["reindex_seconds"], _ = index(repo_id, env)
+    return result
+
+
+def peak_rss_mb(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def summarize(samples: List[Optional[Tuple[float, float]]], elapsed: float, calls: int) -> Dict[str, float]:
+    ok = [s for s in samples if s is not None]
+    result = {"chats": len(samples), "failed": len(samples) - len(ok), "llm_calls_per_chat": calls / len(samples)}
+    if ok:
+        ttft, e2e = [s[0] for s in ok], [s[1] for s in ok]
+        result.update({
+            "ttft_p50": percentile(ttft, 50), "ttft_p99": percentile(ttft, 99),
+            "e2e_p50": percentile(e2e, 50), "e2e_p99": percentile(e2e, 99),
+            "streams_per_second": len(ok) / elapsed,
+        })
+    return result
+
+
+async def chat_load(url: str, repo_id: int, questions: Iterator[str], clients: int, rounds: int, timeout: float):
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+        async def worker(w: int):
+            return [await one_chat(client, repo_id, next(questions)) for _ in range(rounds)]
+
+        with timer() as t:
+            results = await asyncio.gather(*(worker(w) for w in range(clients)))
+    return [s for samples in results for s in samples], t[0]
+
+
+def measure_chat(repo_id: int, fake, questions: Iterator[str], single: int, levels: List[int], rounds: int, timeout: float) -> Dict:
+    proc, url = start_server("async", fake.base_url)
+    try:
+        calls = fake.chat_requests
+        samples, elapsed = asyncio.run(chat_load(url, repo_id, questions, 1, single, timeout))
+        result = {"single": summarize(samples, elapsed, fake.chat_requests - calls), "concurrency": []}
+        for clients in levels:
+            calls = fake.chat_requests
+            samples, elapsed = asyncio.run(chat_load(url, repo_id, questions, clients, rounds, timeout))
+            result["concurrency"].append({"clients": clients, **summarize(samples, elapsed, fake.chat_requests - calls)})
+        result["api_peak_rss_mb"] = peak_rss_mb(proc.pid)
+    finally:
+        proc.terminate()
+        proc.wait()
+    return result
+
+
+def environment() -> Dict:
+    def git(*args: str) -> Optional[str]:
+        try:
+            return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    with engine.connect() as conn:
+        postgres = conn.execute(text("SHOW server_version")).scalar_one()
+        pgvector = conn.execute(text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")).scalar()
+    pyproject = (Path(__file__).parent.parent / "pyproject.toml").read_text()
+    version = next((line.split("=", 1)[1].strip().strip('"') for line in pyproject.splitlines() if line.startswith("version")), None)
+    return {
+        "version": version,
+        "commit": git("rev-parse", "HEAD"),
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "postgres": postgres,
+        "pgvector": pgvector,
+        "cpus": os.cpu_count(),
+    }
+
+
+def flatten(results: Dict) -> Dict[str, float]:
+    """
+    The comparable metrics of a results file, by dotted name.
+    """
+    metrics = {}
+    for key, value in results.get("index", {}).items():
+        if isinstance(value, (int, float)):
+            metrics[f"index.{key}"] = value
+    chat = results.get("chat", {})
+    for key, value in chat.get("single", {}).items():
+        metrics[f"chat.single.{key}"] = value
+    for level in chat.get("concurrency", []):
+        for key, value in level.items():
+            if key != "clients":
+                metrics[f"chat.clients_{level['clients']}.{key}"] = value
+    if chat.get("api_peak_rss_mb") is not None:
+        metrics["chat.api_peak_rss_mb"] = chat["api_peak_rss_mb"]
+    return metrics
+
+
+# counts that describe the workload rather than measure it
+NOT_COMPARED = ("files", "chunks", "source_mb", "chats")
+
+
+def compare(baseline: Dict, results: Dict, tolerance: float) -> List[str]:
+    """
+    Prints each metric against the baseline; returns the ones more than `tolerance` worse.
+    """
+    old, new = flatten(baseline), flatten(results)
+    regressions = []
+    changed = sorted(k for k in results["params"] if baseline.get("params", {}).get(k) != results["params"][k])
+    if changed:
+        print(f"\nbaseline was run with different {', '.join(changed)}: the comparison says little")
+    print(f"\n{'metric':<36} {'baseline':>10} {'current':>10} {'change':>8}   vs {baseline.get('environment', {}).get('commit')}")
+    for name in sorted(set(old) & set(new)):
+        if name.rsplit(".", 1)[1] in NOT_COMPARED:
+            continue
+        before, after = old[name], new[name]
+        change = (after - before) / before if before else (0.0 if after == before else float("inf"))
+        worse = -change if name.endswith(HIGHER_IS_BETTER) else change
+        flag = "  worse" if worse > tolerance else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:<36} {before:>10.3f} {after:>10.3f} {change:>+8.0%}{flag}")
+    return regressions
+
+
+def report(results: Dict) -> None:
+    idx = results["index"]
+    print(
+        f"index: {idx['files']} files, {idx['chunks']} chunks, {idx['source_mb']:.1f} MB in {idx['seconds']:.1f}s "
+        f"({idx['files_per_second']:.0f} files/s, {idx['chunks_per_second']:.0f} chunks/s), peak RSS {idx['peak_rss_mb']:.0f} MB, "
+        f"DB +{idx['db_growth_mb']:.1f} MB (chunk rows {idx['chunk_rows_mb']:.1f} MB), "
+        f"{idx['embedding_requests']} embedding requests; re-index {idx['reindex_seconds']:.1f}s"
+    )
+    chat = results["chat"]
+    print(f"\n{'clients':>7} {'chats':>6} {'failed':>7} {'calls':>6} {'ttft p50':>9} {'ttft p99':>9} {'e2e p50':>8} {'e2e p99':>8} {'streams/s':>10}")
+    for clients, level in [(1, chat["single"])] + [(lvl["clients"], lvl) for lvl in chat["concurrency"]]:
+        if "e2e_p50" not in level:
+            print(f"{clients:>7} {level['chats']:>6} {level['failed']:>7}")
+            continue
+        print(
+            f"{clients:>7} {level['chats']:>6} {level['failed']:>7} {level['llm_calls_per_chat']:>6.2f} "
+            f"{level['ttft_p50']:>9.2f} {level['ttft_p99']:>9.2f} {level['e2e_p50']:>8.2f} {level['e2e_p99']:>8.2f} "
+            f"{level['streams_per_second']:>10.2f}"
+        )
+    print(f"API peak RSS {chat['api_peak_rss_mb'] or 0:.0f} MB")
+
+
+def run(args: argparse.Namespace) -> int:
+    mix = parse_mix(args.languages)
+    questions = [q["question"] for q in json.loads(QUESTIONS.read_text())]
+    random.Random(0).shuffle(questions)
+    params = {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "tolerance")}
+    results: Dict = {
+        "environment": environment(),
+        "params": params,
+        "settings": {
+            name: getattr(settings, name)
+            for name in ("EMBEDDING_MODEL", "EMBEDDING_BATCH_SIZE", "EMBEDDING_CONCURRENCY", "CHAT_MODEL",
+                         "RETRIEVAL_TOP_K", "CONTEXT_MAX_TOKENS", "VECTOR_INDEX_MODE", "RESEARCH_MAX_PASSES")
+        },
+    }
+
+    with serve(latency=args.latency, token_delay=args.token_delay, reply_tokens=args.reply_tokens) as fake, \
+            tempfile.TemporaryDirectory(prefix="bench_e2e_") as tmpdir, scratch_repo("e2e") as repo:
+        env = dict(os.environ, OPENAI_BASE_URL=fake.base_url)
+        env.setdefault("OPENAI_API_KEY", "fake")
+        with timer() as t:
+            languages = make_repo(tmpdir, args.files, mix, tuple(args.functions), repo.full_name)
+        print(f"synthetic repo: {args.files} files ({', '.join(f'{ext} {n}' for ext, n in languages.items())}) in {t[0]:.1f}s")
+        set_clone_url(repo.id, tmpdir)
+
+        results["index"] = {**measure_index(repo.id, env, fake), "languages": languages}
+        results["chat"] = measure_chat(repo.id, fake, itertools.cycle(questions), args.questions, args.concurrency, args.rounds, args.timeout)
+
+    report(results)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + "\n")
+        print(f"results written to {args.output}")
+    if args.baseline:
+        regressions = compare(json.loads(Path(args.baseline).read_text()), results, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} metrics more than {args.tolerance:.0%} worse: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=1_000)
+    parser.add_argument("--languages", nargs="+", default=["py=4", "ts=3", "go=2", "md=1"], help="extension=weight")
+    parser.add_argument("--functions", type=int, nargs=2, default=[3, 12], metavar=("MIN", "MAX"), help="per file")
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds before the first byte of every fake response")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="seconds between streamed tokens")
+    parser.add_argument("--reply-tokens", type=int, default=100)
+    parser.add_argument("--questions", type=int, default=30, help="chats run one at a time")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[8, 32], help="concurrent clients")
+    parser.add_argument("--rounds", type=int, default=3, help="chats per client at each level")
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds per chat")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="results file to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative worsening counted as a regression")
+    sys.exit(run(parser.parse_args()))
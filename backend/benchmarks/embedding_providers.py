@@ -0,0 +1,111 @@
+"""
+The OpenAI embedding provider against a local ONNX model on CPU.
+
+For each provider, reports:
+
+  index     chunks/s through app.utils.embeddings.EmbeddingPipeline, as the
+            indexer embeds (`--chunks` synthetic chunks of `--chunk-size`
+            characters, cache writes rolled back)
+  query     p50/p99 latency of one question embedded at a time, as a lone
+            chat embeds it
+  burst     p50/p99 latency and questions/s when `--burst` questions arrive
+            at once, as under concurrent chats; the local provider batches
+            them (LOCAL_EMBEDDING_BATCH_SIZE, LOCAL_EMBEDDING_MAX_WAIT), and
+            is also run with batches of one to show what that buys
+
+OpenAI is stood in for by the local fake server with `--latency` seconds per
+request. The local model is `--local-model`, a directory or Hugging Face repo
+as LOCAL_EMBEDDING_MODEL takes (by default, LOCAL_EMBEDDING_MODEL itself).
+
+    python -m benchmarks.embedding_providers --latency 0.2 --chunks 1000 --burst 32
+"""
+
+import argparse
+import asyncio
+import uuid
+from typing import List, Tuple
+
+from openai import AsyncOpenAI, OpenAI
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.db import engine
+from app.utils.embedding_cache import EmbeddingCache, LRU
+from app.utils.embedding_providers import EmbeddingProvider, LocalEmbeddingProvider, OpenAIEmbeddingProvider
+from app.utils.embeddings import EmbeddingPipeline
+from benchmarks.common import percentile, timer
+from benchmarks.embedding_throughput import synthetic_chunks
+from benchmarks.fake_openai import serve
+
+QUESTIONS = [
+    "Where is the retry policy for rate-limited embedding requests?",
+    "How does the indexer decide which files changed since the last run?",
+    "Which endpoint streams the progress of an index run?",
+    "What happens when a chat names a repo group that does not exist?",
+]
+
+
+def index_throughput(provider: EmbeddingProvider, texts: List[str]) -> float:
+    with Session(engine) as sess:
+        cache = EmbeddingCache(provider.name, lru=LRU(0))
+        pipeline = EmbeddingPipeline(provider, cache)
+        with timer() as t:
+            for _ in pipeline.run(sess, enumerate(texts)):
+                pass
+        sess.rollback()
+    return pipeline.chunks / t[0]
+
+
+async def query_latency(provider: EmbeddingProvider, queries: int, burst: int) -> Tuple[List[float], List[float], float]:
+    run_id = uuid.uuid4().hex
+
+    async def one(n: int) -> float:
+        with timer() as t:
+            await provider.aembed([f"{QUESTIONS[n % len(QUESTIONS)]} ({run_id} {n})"])
+        return t[0] * 1000
+
+    # the first call pays for connection setup and model warm-up
+    await one(-1)
+    single = [await one(n) for n in range(queries)]
+    with timer() as t:
+        bursts = await asyncio.gather(*(one(queries + n) for n in range(burst)))
+    return single, list(bursts), burst / t[0]
+
+
+def report(label: str, provider: EmbeddingProvider, texts: List[str], queries: int, burst: int) -> None:
+    chunks_per_second = index_throughput(provider, texts)
+    single, bursts, rate = asyncio.run(query_latency(provider, queries, burst))
+    print(
+        f"{label:<8} {provider.dimension:>5} {chunks_per_second:>9.0f} "
+        f"{percentile(single, 50):>9.1f} {percentile(single, 99):>9.1f} "
+        f"{percentile(bursts, 50):>9.1f} {percentile(bursts, 99):>9.1f} {rate:>9.0f}"
+    )
+
+
+def run(latency: float, local_model: str, chunks: int, chunk_size: int, queries: int, burst: int) -> None:
+    texts = synthetic_chunks(chunks, chunk_size)
+    print(f"{chunks} chunks of {chunk_size} characters, {queries} single questions, bursts of {burst}")
+    print(f"{'provider':<8} {'dim':>5} {'chunks/s':>9} {'q p50':>9} {'q p99':>9} {'burst p50':>9} {'burst p99':>9} {'q/s':>9}   (ms)")
+
+    with serve(latency=latency) as server:
+        openai = OpenAIEmbeddingProvider(
+            "fake-embedding",
+            client=OpenAI(base_url=server.base_url, api_key="fake", max_retries=0),
+            async_client=AsyncOpenAI(base_url=server.base_url, api_key="fake"),
+        )
+        report("openai", openai, texts, queries, burst)
+
+    report("local", LocalEmbeddingProvider(local_model), texts, queries, burst)
+    report("local/1", LocalEmbeddingProvider(local_model, batch_size=1), texts, queries, burst)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per fake OpenAI request")
+    parser.add_argument("--local-model", default=settings.LOCAL_EMBEDDING_MODEL, help="directory or Hugging Face repo")
+    parser.add_argument("--chunks", type=int, default=1_000)
+    parser.add_argument("--chunk-size", type=int, default=1_000, help="characters per chunk")
+    parser.add_argument("--queries", type=int, default=50, help="questions embedded one at a time")
+    parser.add_argument("--burst", type=int, default=32, help="questions embedded at once")
+    args = parser.parse_args()
+    run(args.latency, args.local_model, args.chunks, args.chunk_size, args.queries, args.burst)
@@ -0,0 +1,230 @@
+"""
+A local stand-in for the OpenAI API, for benchmarks that must not hit the network.
+
+Embeddings are deterministic (seeded from the input text), so identical text always
+gets the same vector. Chat completions return a fixed number of filler tokens,
+streamed (SSE) or not, with a configurable delay per token; a `reply` callable
+can script the text of any of them instead. Latency (time to the first byte) and
+the share of requests answered with a 429 are configurable.
+
+    python -m benchmarks.fake_openai --port 8100 --latency 0.2 --reply-tokens 200 --token-delay 0.01
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Iterator, Optional
+
+import numpy as np
+
+from benchmarks.common import EMBEDDING_DIM
+
+
+def fake_embedding(text: str, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vec = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return vec / np.linalg.norm(vec)
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # socketserver's default backlog of 5 drops bursts of connects, which then retry after a second
+    request_queue_size = 128
+
+    def __init__(
+        self,
+        address,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        retry_after: float = 0.1,
+        reply_tokens: int = 50,
+        token_delay: float = 0.0,
+        reply: Optional[Callable[[dict], Optional[str]]] = None,
+    ):
+        super().__init__(address, FakeOpenAIHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.reply_tokens = reply_tokens
+        self.token_delay = token_delay
+        # chat request payload -> reply text, or None for filler
+        self.reply = reply
+        self.chat_requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.requests = 0
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    server: FakeOpenAIServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict, headers: dict | None = None) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+
+        with self.server._lock:
+            self.server.requests += 1
+            limited = random.random() < self.server.error_rate
+            if limited:
+                self.server.rate_limited += 1
+
+        if limited:
+            self._send_json(
+                429,
+                {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                {"retry-after": str(self.server.retry_after)},
+            )
+            return
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if self.path.rstrip("/").endswith("/embeddings"):
+            self._embeddings(payload)
+        elif self.path.rstrip("/").endswith("/chat/completions"):
+            self._chat(payload)
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown route {self.path}"}})
+
+    def _embeddings(self, payload: dict) -> None:
+        inputs = payload.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        as_base64 = payload.get("encoding_format") == "base64"
+
+        data = []
+        tokens = 0
+        for idx, text in enumerate(inputs):
+            vec = fake_embedding(text, payload.get("dimensions") or EMBEDDING_DIM)
+            tokens += max(1, len(text) // 4)
+            emb = base64.b64encode(vec.tobytes()).decode("ascii") if as_base64 else vec.tolist()
+            data.append({"object": "embedding", "index": idx, "embedding": emb})
+
+        self._send_json(200, {
+            "object": "list",
+            "data": data,
+            "model": payload.get("model", "fake"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        })
+
+
+    def _chat(self, payload: dict) -> None:
+        model = payload.get("model", "fake")
+        prompt_tokens = sum(max(1, len(str(m.get("content", ""))) // 4) for m in payload.get("messages", []))
+        text = self.server.reply(payload) if self.server.reply else None
+        if text is not None:
+            tokens = re.findall(r"\s*\S+", text) or [""]
+        else:
+            tokens = [f"word{i} " for i in range(self.server.reply_tokens)]
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(tokens),
+            "total_tokens": prompt_tokens + len(tokens),
+        }
+        with self.server._lock:
+            self.server.chat_requests += 1
+            self.server.prompt_tokens += prompt_tokens
+            self.server.completion_tokens += len(tokens)
+
+        if not payload.get("stream"):
+            time.sleep(self.server.token_delay * len(tokens))
+            self._send_json(200, {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens)},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+
+        def event(choices: list, **extra) -> None:
+            body = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": choices,
+                **extra,
+            }
+            self.wfile.write(f"data: {json.dumps(body)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        for i, token in enumerate(tokens):
+            delta = {"role": "assistant", "content": token} if i == 0 else {"content": token}
+            event([{"index": 0, "delta": delta, "finish_reason": None}])
+            time.sleep(self.server.token_delay)
+        event([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if (payload.get("stream_options") or {}).get("include_usage"):
+            event([], usage=usage)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+@contextmanager
+def serve(port: int = 0, **kwargs) -> Iterator[FakeOpenAIServer]:
+    """
+    Runs the fake server on a background thread for the duration of the block.
+    """
+    server = FakeOpenAIServer(("127.0.0.1", port), **kwargs)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--reply-tokens", type=int, default=50)
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    args = parser.parse_args()
+    with serve(
+        args.port,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        reply_tokens=args.reply_tokens,
+        token_delay=args.token_delay,
+    ) as server:
+        print(f"Fake OpenAI API listening on {server.base_url}")
+        threading.Event().wait()
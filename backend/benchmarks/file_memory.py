@@ -0,0 +1,104 @@
+"""
+Peak memory of reading and chunking a file, against file size.
+
+Commits synthetic files of growing size (many short lines, and a few huge
+minified lines) to a scratch git repository and streams each blob the way
+the indexer does: from the object database (app.utils.git_source), through
+app.utils.file_reader.BoundedLineReader and app.utils.chunking.chunk_file,
+discarding chunks as they come. The tracemalloc peak should stay flat as the
+files grow. Size limits are bypassed here so the reader itself is measured.
+No database is needed.
+
+    python -m benchmarks.file_memory --sizes-mb 1 10 100
+"""
+
+import argparse
+import functools
+import os
+import tempfile
+import tracemalloc
+from typing import Callable, List
+
+from git import Repo as GitPythonRepo
+
+from app.utils.chunking import chunk_file
+from app.utils.file_reader import SAMPLE_BYTES, BoundedLineReader, size_reason, sniff
+from app.utils.git_source import GitSource
+from benchmarks.common import timer
+
+
+def write_lines(path: str, size: int) -> None:
+    line = '  {"id": 12345, "name": "fixture row", "tags": ["a", "b", "c"]},\n'
+    with open(path, "w") as f:
+        f.write("[\n")
+        for _ in range(size // len(line)):
+            f.write(line)
+        f.write("]\n")
+
+
+def write_long_lines(path: str, size: int) -> None:
+    block = "var a=function(b){return b+1};" * 1024
+    with open(path, "w") as f:
+        for _ in range(4):
+            for _ in range(size // 4 // len(block)):
+                f.write(block)
+            f.write("\n")
+
+
+def commit(git_repo: GitPythonRepo, path: str) -> str:
+    """
+    Commits the file and returns its blob sha.
+    """
+    git_repo.git.add(path)
+    git_repo.git(c=["user.name=bench", "user.email=bench@example.com"]).commit("-q", "-m", path)
+    return git_repo.git.rev_parse(f"HEAD:{os.path.basename(path)}")
+
+
+def guard(source: GitSource, name: str, sha: str) -> str:
+    reason = size_reason(name, source.size(sha))
+    if not reason:
+        with source.open_blob(sha) as blob:
+            reason = sniff(name, blob.peek(SAMPLE_BYTES)[:SAMPLE_BYTES])
+    return reason or "indexed"
+
+
+def measure(source: GitSource, name: str, sha: str) -> List[float]:
+    tracemalloc.start()
+    chunks = 0
+    with timer() as t:
+        reopen = functools.partial(source.open_blob, sha)
+        with BoundedLineReader(reopen(), reopen=reopen) as f:
+            for _ in chunk_file(name, f):
+                chunks += 1
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return [chunks, peak / 1e6, t[0]]
+
+
+def run(sizes_mb: List[int]) -> None:
+    writers: List[tuple[str, Callable[[str, int], None]]] = [
+        ("fixture.json", write_lines),
+        ("bundle.js", write_long_lines),
+    ]
+    print(f"{'file':<14} {'size MB':>8} {'chunks':>9} {'peak MB':>9} {'seconds':>8}  guard")
+    with tempfile.TemporaryDirectory(prefix="bench_file_memory_") as tmpdir:
+        git_repo = GitPythonRepo.init(tmpdir)
+        for name, write in writers:
+            for size_mb in sizes_mb:
+                path = os.path.join(tmpdir, name)
+                write(path, size_mb * 1_000_000)
+                sha = commit(git_repo, path)
+                os.remove(path)
+                # read in place, as the indexer reads a local clone_url
+                source = GitSource(git_repo, "HEAD", promisor=False)
+                chunks, peak_mb, elapsed = measure(source, name, sha)
+                size = source.size(sha)
+                print(f"{name:<14} {size / 1e6:>8.0f} {chunks:>9.0f} {peak_mb:>9.2f} {elapsed:>8.2f}  {guard(source, name, sha)}")
+        git_repo.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes-mb", type=int, nargs="+", default=[1, 10, 100])
+    args = parser.parse_args()
+    run(args.sizes_mb)
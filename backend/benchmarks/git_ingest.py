@@ -0,0 +1,199 @@
+"""
+Getting a repo's indexable files from git into the chunker.
+
+Builds a local bare repository as a fixture, served over file:// with partial
+clone enabled: `--files` source files, plus `--junk-mb` of files that are never
+indexed (images, a vendored node_modules/ and an oversized .json). Then compares:
+
+  checkout     the path before it: a depth-1 clone with a working tree, each
+               indexable file reopened by path and chunked
+  mirror cold  app.utils.git_source: a new partial mirror, no blob over the
+               size limits fetched, read from the object database
+  mirror warm  the same mirror after `--changed` files are modified upstream:
+               one fetch, and only the changed blobs chunked
+  local        clone_url pointing at the bare repository, read in place
+
+and reports seconds and bytes written to disk for each.
+No database is needed.
+
+    python -m benchmarks.git_ingest --files 2000 --junk-mb 50
+"""
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+from typing import Dict, Tuple
+
+from git import Repo as GitPythonRepo
+
+from app.core.config import settings
+from app.scripts.indexer import chunk_files
+from app.utils.chunking import chunk_file
+from app.utils.file_reader import SAMPLE_BYTES, BoundedLineReader, size_reason, sniff
+from app.utils.git_source import GitSource
+from app.utils.index_rules import IndexRules
+from benchmarks.common import timer
+
+WORDS = ["request", "handler", "index", "chunk", "value", "result", "config", "parse", "token", "cache"]
+
+
+def source_file(rng: random.Random, n: int) -> str:
+    lines = []
+    for i in range(rng.randint(3, 12)):
+        a, b = rng.sample(WORDS, 2)
+        lines += [
+            f"def {a}_{b}_{n}_{i}(x, y):",
+            f"    \"\"\"Computes the {a} of a {b}.\"\"\"",
+            f"    {a} = x + y * {rng.randint(1, 100)}",
+            f"    return {a}",
+            "",
+        ]
+    return "\n".join(lines) + "\n"
+
+
+def write(root: str, path: str, data) -> None:
+    full = os.path.join(root, path)
+    os.makedirs(os.path.dirname(full), exist_ok=True)
+    with open(full, "wb" if isinstance(data, bytes) else "w") as f:
+        f.write(data)
+
+
+def build_fixture(tmpdir: str, files: int, junk_mb: int) -> GitPythonRepo:
+    """
+    Writes the fixture's first commit, returning the working repo that pushes
+    to the bare one at tmpdir/fixture.git.
+    """
+    rng = random.Random(0)
+    work = os.path.join(tmpdir, "work")
+    for n in range(files):
+        write(work, f"src/pkg{n % 20}/module_{n}.py", source_file(rng, n))
+    junk = junk_mb * 1_000_000
+    for n in range(max(1, junk // 2 // 5_000_000)):
+        write(work, f"assets/image_{n}.png", rng.randbytes(min(5_000_000, junk // 2)))
+    for n in range(200):
+        write(work, f"node_modules/dep{n}/index.js", "module.exports = 1;\n" * (junk // 4 // 200 // 20))
+    write(work, "data/fixtures.json", '{"row": "fixture"}\n' * (junk // 4 // 19))
+
+    git_repo = GitPythonRepo.init(work)
+    with git_repo.config_writer() as cw:
+        cw.set_value("user", "name", "bench")
+        cw.set_value("user", "email", "bench@example.com")
+    git_repo.git.add("-A")
+    git_repo.git.commit("-q", "-m", "fixture")
+
+    bare = os.path.join(tmpdir, "fixture.git")
+    GitPythonRepo.clone_from(work, bare, bare=True)
+    bare_repo = GitPythonRepo(bare)
+    # what a partial-clone capable server allows
+    bare_repo.git.config("uploadpack.allowFilter", "true")
+    bare_repo.git.config("uploadpack.allowAnySHA1InWant", "true")
+    git_repo.create_remote("bench", bare)
+    return git_repo
+
+
+def modify(git_repo: GitPythonRepo, changed: int) -> None:
+    rng = random.Random(1)
+    paths = sorted(p for p in git_repo.git.ls_files().splitlines() if p.startswith("src/"))
+    for path in rng.sample(paths, min(changed, len(paths))):
+        with open(os.path.join(git_repo.working_tree_dir, path), "a") as f:
+            f.write(f"# changed {rng.random()}\n")
+    git_repo.git.commit("-q", "-a", "-m", "change")
+    git_repo.git.push("-q", "bench", "HEAD:master")
+
+
+def disk_bytes(path: str, skip_git: bool = False) -> int:
+    total = 0
+    for root, dirs, names in os.walk(path):
+        if skip_git and ".git" in dirs:
+            dirs.remove(".git")
+        for name in names:
+            full = os.path.join(root, name)
+            if not os.path.islink(full):
+                total += os.path.getsize(full)
+    return total
+
+
+def checkout(url: str, dest: str) -> Tuple[int, int]:
+    git_repo = GitPythonRepo.clone_from(url, dest, depth=1)
+    tree = git_repo.head.commit.tree
+    files = chunks = 0
+    for blob in IndexRules.from_tree(tree).indexable_blobs(tree):
+        files += 1
+        file_path = os.path.join(dest, blob.path)
+        if size_reason(blob.path, os.path.getsize(file_path)):
+            continue
+        with open(file_path, "rb") as f:
+            if sniff(blob.path, f.read(SAMPLE_BYTES)):
+                continue
+        with BoundedLineReader(file_path) as f:
+            chunks += sum(1 for _ in chunk_file(blob.path, f))
+    git_repo.close()
+    return files, chunks
+
+
+def indexable(source: GitSource) -> Dict[str, str]:
+    tree = source.commit.tree
+    return {blob.path: blob.hexsha for blob in IndexRules.from_tree(tree).indexable_blobs(tree)}
+
+
+def ingest(source: GitSource, blobs: Dict[str, str]) -> int:
+    return sum(len(pending.chunks) for pending in chunk_files(source, blobs))
+
+
+def report(label: str, seconds: float, disk: int, files: int, chunks: int) -> None:
+    print(f"{label:<12} {seconds:>8.2f} {disk / 1e6:>8.1f} {files:>7} {chunks:>8}")
+
+
+def run(files: int, junk_mb: int, changed: int) -> None:
+    with tempfile.TemporaryDirectory(prefix="bench_git_ingest_") as tmpdir:
+        work = build_fixture(tmpdir, files, junk_mb)
+        bare = os.path.join(tmpdir, "fixture.git")
+        url = f"file://{bare}"
+        print(f"fixture: {disk_bytes(work.working_tree_dir, skip_git=True) / 1e6:.1f} MB of files, "
+              f"{disk_bytes(bare) / 1e6:.1f} MB packed")
+        print(f"{'ingest':<12} {'seconds':>8} {'disk MB':>8} {'files':>7} {'chunks':>8}")
+
+        dest = os.path.join(tmpdir, "checkout")
+        with timer() as t:
+            files_read, chunks = checkout(url, dest)
+        report("checkout", t[0], disk_bytes(dest), files_read, chunks)
+        shutil.rmtree(dest)
+
+        settings.INDEX_MIRROR_DIR = os.path.join(tmpdir, "mirrors")
+        with timer() as t:
+            source = GitSource.open(1, "bench/fixture", url)
+            first = indexable(source)
+            chunks = ingest(source, first)
+        report("mirror cold", t[0], disk_bytes(settings.INDEX_MIRROR_DIR), len(first), chunks)
+        source.close()
+
+        modify(work, changed)
+        before = disk_bytes(settings.INDEX_MIRROR_DIR)
+        with timer() as t:
+            source = GitSource.open(1, "bench/fixture", url)
+            current = indexable(source)
+            # what diff_index finds against the rows written by the first run
+            to_index = {p: sha for p, sha in current.items() if first.get(p) != sha}
+            chunks = ingest(source, to_index)
+        added = disk_bytes(settings.INDEX_MIRROR_DIR) - before
+        report("mirror warm", t[0], added, len(to_index), chunks)
+        source.close()
+
+        with timer() as t:
+            source = GitSource.open(2, "bench/local", bare)
+            current = indexable(source)
+            chunks = ingest(source, current)
+        report("local", t[0], 0, len(current), chunks)
+        source.close()
+        work.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=2_000, help="source files in the fixture")
+    parser.add_argument("--junk-mb", type=int, default=50, help="MB of files that are never indexed")
+    parser.add_argument("--changed", type=int, default=20, help="files modified before the warm run")
+    args = parser.parse_args()
+    run(args.files, args.junk_mb, args.changed)
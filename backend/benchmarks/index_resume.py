@@ -0,0 +1,145 @@
+"""
+Work lost when an index run is killed part way through.
+
+Indexes a synthetic local git repository (`--files` source files) against a
+local fake OpenAI server, in a subprocess, three times:
+
+  full     one uninterrupted run, for reference
+  killed   a run of a copy of the repo, SIGKILLed at `--kill-at` of the full run's time
+  resumed  a second run of that copy, as a reclaimed job would do
+
+Contents are salted per repo, so the embedding cache only holds what the
+killed run committed. While the killed run is going, its persisted progress
+is sampled as GET /api/repos/{id} would serve it. Reports the files each run
+wrote, whether the resumed run picked up the killed one, and the time lost:
+killed + resumed - full.
+
+    python -m benchmarks.index_resume --files 2000 --latency 0.1 --kill-at 0.5
+"""
+
+import argparse
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, Optional
+
+from git import Repo as GitPythonRepo
+from sqlmodel import Session
+
+from app.db import engine
+from app.models import IndexProgress, Repo
+from app.utils.index_progress import describe
+from benchmarks.common import scratch_repo, timer
+from benchmarks.fake_openai import serve
+from benchmarks.git_ingest import source_file, write
+
+
+def make_repo(path: str, files: int, salt: str) -> str:
+    rng = random.Random(0)
+    for n in range(files):
+        write(path, f"src/pkg{n % 20}/module_{n}.py", f"# {salt}\n" + source_file(rng, n))
+    git_repo = GitPythonRepo.init(path)
+    git_repo.git.add("-A")
+    git_repo.git(c=["user.name=bench", "user.email=bench@example.com"]).commit("-q", "-m", "fixture")
+    git_repo.close()
+    return path
+
+
+def set_clone_url(repo_id: int, url: str) -> None:
+    with Session(engine) as sess:
+        repo = sess.get(Repo, repo_id)
+        repo.clone_url = url
+        sess.add(repo)
+        sess.commit()
+
+
+def load_progress(repo_id: int) -> Optional[Dict]:
+    with Session(engine) as sess:
+        progress = sess.get(IndexProgress, repo_id)
+        return describe(progress) if progress else None
+
+
+def start_index(repo_id: int, env: Dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.index_resume", "--index", str(repo_id)],
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def index(repo_id: int, env: Dict[str, str]) -> float:
+    with timer() as t:
+        proc = start_index(repo_id, env)
+        if proc.wait() != 0:
+            raise RuntimeError(f"index run exited with {proc.returncode}")
+    return t[0]
+
+
+def report(label: str, seconds: float, progress: Optional[Dict]) -> None:
+    progress = progress or {}
+    print(
+        f"{label:<8} {seconds:>8.1f} {progress.get('files_done', 0):>8} {progress.get('files_total', 0):>8} "
+        f"{progress.get('files_unchanged', 0):>10} {str(progress.get('resumed', False)):>8}"
+    )
+
+
+def run(files: int, latency: float, kill_at: float, batch_size: int) -> None:
+    with serve(latency=latency) as fake, tempfile.TemporaryDirectory(prefix="bench_index_resume_") as tmpdir:
+        env = dict(
+            os.environ,
+            OPENAI_BASE_URL=fake.base_url,
+            EMBEDDING_BATCH_SIZE=str(batch_size),
+            EMBEDDING_CONCURRENCY="1",
+        )
+        env.setdefault("OPENAI_API_KEY", "fake")
+        print(f"{'run':<8} {'seconds':>8} {'written':>8} {'to index':>8} {'unchanged':>10} {'resumed':>8}")
+
+        with scratch_repo("index-resume") as repo:
+            set_clone_url(repo.id, make_repo(os.path.join(tmpdir, "full"), files, repo.full_name))
+            full = index(repo.id, env)
+            report("full", full, load_progress(repo.id))
+
+        with scratch_repo("index-resume") as repo:
+            set_clone_url(repo.id, make_repo(os.path.join(tmpdir, "killed"), files, repo.full_name))
+            samples = []
+            with timer() as t:
+                proc = start_index(repo.id, env)
+                deadline = time.perf_counter() + kill_at * full
+                while time.perf_counter() < deadline and proc.poll() is None:
+                    time.sleep(min(1.0, full / 10))
+                    samples.append(load_progress(repo.id))
+                proc.send_signal(signal.SIGKILL)
+                proc.wait()
+            killed = t[0]
+            report("killed", killed, load_progress(repo.id))
+            resumed = index(repo.id, env)
+            report("resumed", resumed, load_progress(repo.id))
+
+        print(f"time lost to the kill: {killed + resumed - full:.1f}s of a {full:.1f}s run")
+        print("progress of the killed run:")
+        for progress in samples:
+            if progress and progress["phase"] == "embed_write":
+                print(
+                    f"  {progress['files_done']:>6}/{progress['files_total']} files, "
+                    f"{progress['bytes_done'] / 1e3:.0f}/{progress['bytes_total'] / 1e3:.0f} kB, "
+                    f"{progress['chunks_done']} chunks, eta {progress['eta_seconds'] or '-'}s"
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=2_000)
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds per fake embedding request")
+    parser.add_argument("--kill-at", type=float, default=0.5, help="fraction of the full run's time at which to kill")
+    parser.add_argument("--batch-size", type=int, default=32, help="EMBEDDING_BATCH_SIZE of the index runs")
+    parser.add_argument("--index", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.index:
+        from app.scripts.indexer import index_repo
+        index_repo(args.index)
+    else:
+        run(args.files, args.latency, args.kill_at, args.batch_size)
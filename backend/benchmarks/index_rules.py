@@ -0,0 +1,114 @@
+"""
+Path filtering over a large synthetic repository tree.
+
+Builds an in-memory tree of about 1M paths, a monorepo with packages that each
+carry node_modules/, dist/ and vendor/ directories, and compares:
+
+  legacy   the old should_index (basename + Path + prefix scan) on every leaf
+  leaves   IndexRules.should_index on every leaf
+  pruned   IndexRules walking the tree and skipping excluded directories,
+           as app.scripts.indexer does with GitPython's tree.traverse(prune=...)
+
+No database is needed.
+
+    python -m benchmarks.index_rules --paths 1000000
+"""
+
+import argparse
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+from app.utils.index_rules import (
+    INDEXABLE_EXTENSIONS,
+    INDEXABLE_FILENAMES,
+    INDEXABLE_PATH_PREFIXES,
+    IndexRules,
+)
+
+Tree = Dict[str, "Tree"]  # a leaf is an empty dict
+
+
+def legacy_should_index(path: str) -> bool:
+    # app.utils.index_rules.should_index before the rule engine
+    name = os.path.basename(path)
+    suffix = Path(path).suffix.lower()
+    if name in INDEXABLE_FILENAMES or suffix in INDEXABLE_EXTENSIONS:
+        return True
+    return any(prefix in path for prefix in INDEXABLE_PATH_PREFIXES)
+
+
+def build_tree(target: int) -> Tuple[Tree, List[str]]:
+    """
+    Returns the tree and its leaf paths. About 10% of leaves are source files;
+    the rest are dependencies and build output.
+    """
+    root: Tree = {}
+    paths: List[str] = []
+
+    def add(path: str) -> None:
+        node = root
+        for part in path.split("/"):
+            node = node.setdefault(part, {})
+        paths.append(path)
+
+    pkg = 0
+    while len(paths) < target:
+        base = f"packages/pkg{pkg}"
+        for i in range(40):
+            add(f"{base}/src/module{i % 8}/file{i}.ts")
+        for i in range(10):
+            add(f"{base}/docs/page{i}.md")
+        add(f"{base}/package.json")
+        add(f"{base}/package-lock.json")
+        for dep in range(30):
+            for i in range(10):
+                add(f"{base}/node_modules/dep{dep}/lib/index{i}.js")
+        for i in range(60):
+            add(f"{base}/dist/chunk{i}.js")
+            add(f"{base}/dist/chunk{i}.js.map")
+        for i in range(20):
+            add(f"{base}/vendor/lib{i}/lib.go")
+        pkg += 1
+    return root, paths
+
+
+def walk(tree: Tree, rules: IndexRules, prefix: str = "") -> Iterator[str]:
+    for name, child in tree.items():
+        path = prefix + name
+        if child:
+            if not rules.excluded_dir(path):
+                yield from walk(child, rules, path + "/")
+        elif rules.should_index(path, check_parents=False):
+            yield path
+
+
+def run(target: int) -> None:
+    tree, paths = build_tree(target)
+    print(f"{len(paths)} paths")
+    print(f"{'mode':<8} {'kept':>9} {'seconds':>8} {'paths/s':>12}")
+
+    def report(mode: str, kept: int, elapsed: float) -> None:
+        print(f"{mode:<8} {kept:>9} {elapsed:>8.2f} {len(paths) / elapsed:>12.0f}")
+
+    start = time.perf_counter()
+    kept = sum(1 for p in paths if legacy_should_index(p))
+    report("legacy", kept, time.perf_counter() - start)
+
+    rules = IndexRules()
+    start = time.perf_counter()
+    kept = sum(1 for p in paths if rules.should_index(p))
+    report("leaves", kept, time.perf_counter() - start)
+
+    rules = IndexRules()
+    start = time.perf_counter()
+    kept = sum(1 for _ in walk(tree, rules))
+    report("pruned", kept, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paths", type=int, default=1_000_000)
+    args = parser.parse_args()
+    run(args.paths)
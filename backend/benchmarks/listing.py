@@ -0,0 +1,137 @@
+"""
+Listing endpoints under concurrent load.
+
+Seeds the database in DATABASE_URL with `--repos` repos and one repo of
+`--files` files (plus a few thousand chunks), then runs each query below
+`--requests` times, `--workers` at a time, and reports p50/p99 latency and
+throughput:
+
+  repos_all        legacy GET /repos: every repo row
+  repos_page       GET /repos, first page
+  repos_deep       GET /repos, a page from the middle (keyset cursor)
+  metadata_legacy  legacy fetch_metadata: every File row of the repo as ORM objects
+  metadata         fetch_metadata now: the first paths only
+  files_prefix     GET /repos/{id}/files?prefix=..., first page
+  files_deep       GET /repos/{id}/files, a page from the middle
+  chunks           GET /repos/{id}/files/{file_id}/chunks, first page
+
+    python -m benchmarks.listing --repos 5000 --files 100000 --requests 200 --workers 8
+"""
+
+import argparse
+import asyncio
+import uuid
+from typing import Awaitable, Callable, List, Tuple
+
+from fastapi import Response
+from sqlalchemy import delete, insert, text
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.agents.agent import load_file_paths
+from app.api.routers.repos import list_chunks, list_files, list_repos
+from app.db import async_engine, async_session, engine
+from app.models import CodeChunk, File, Repo
+from app.utils.pagination import encode_cursor
+from benchmarks.common import percentile, scratch_repo, seed_chunks, timer
+
+
+def seed_repos(label: str, count: int, batch: int = 5_000) -> None:
+    with Session(engine) as sess:
+        for start in range(0, count, batch):
+            sess.execute(insert(Repo), [
+                {"owner": "bench", "name": f"{label}-{i}", "full_name": f"bench/{label}-{i}", "default_branch": "main"}
+                for i in range(start, min(count, start + batch))
+            ])
+        sess.commit()
+
+
+def drop_repos(label: str) -> None:
+    with Session(engine) as sess:
+        sess.execute(delete(Repo).where(Repo.full_name.like(f"bench/{label}-%")))
+        sess.commit()
+
+
+def seed_files(repo_id: int, count: int, batch: int = 10_000) -> None:
+    with Session(engine) as sess:
+        for start in range(0, count, batch):
+            sess.execute(insert(File), [
+                {"repo_id": repo_id, "path": f"src/mod{i % 100}/pkg{i % 37}/file{i}.py"}
+                for i in range(start, min(count, start + batch))
+            ])
+        sess.commit()
+        sess.execute(text("ANALYZE repo"))
+        sess.execute(text("ANALYZE file"))
+        sess.execute(text("ANALYZE codechunk"))
+        sess.commit()
+
+
+async def all_repos(sess: AsyncSession) -> List[Repo]:
+    return (await sess.exec(select(Repo))).all()
+
+
+async def legacy_metadata(sess: AsyncSession, repo_id: int) -> List[str]:
+    return [f.path for f in (await sess.exec(select(File).where(File.repo_id == repo_id))).all()]
+
+
+async def load(fn: Callable[[AsyncSession], Awaitable[object]], requests: int, workers: int) -> Tuple[List[float], float]:
+    gate = asyncio.Semaphore(workers)
+
+    async def one() -> float:
+        async with gate, async_session() as sess:
+            with timer() as t:
+                await fn(sess)
+        return t[0] * 1000
+
+    with timer() as total:
+        samples = await asyncio.gather(*(one() for _ in range(requests)))
+    return list(samples), requests / total[0]
+
+
+async def measure(cases, requests: int, workers: int) -> None:
+    print(f"{'query':<16} {'p50 ms':>9} {'p99 ms':>9} {'req/s':>9}")
+    for name, fn in cases:
+        samples, rate = await load(fn, requests, workers)
+        print(f"{name:<16} {percentile(samples, 50):>9.2f} {percentile(samples, 99):>9.2f} {rate:>9.0f}")
+    await async_engine.dispose()
+
+
+def run(repos: int, files: int, requests: int, workers: int) -> None:
+    label = f"listing-{uuid.uuid4().hex[:8]}"
+    seed_repos(label, repos)
+    try:
+        with scratch_repo("listing") as repo:
+            seed_files(repo.id, files)
+            seed_chunks(repo.id, 2_000, chunks_per_file=500)
+            with Session(engine) as sess:
+                middle_repo = sess.exec(select(Repo.id).order_by(Repo.id).offset(repos // 2)).first()
+                middle_file = sess.exec(
+                    select(File.path, File.id).where(File.repo_id == repo.id)
+                    .order_by(File.path.collate("C"), File.id).offset(files // 2)
+                ).first()
+                chunked_file = sess.exec(select(CodeChunk.file_id).join(CodeChunk.file).where(File.repo_id == repo.id)).first()
+
+            cases = [
+                ("repos_all", all_repos),
+                ("repos_page", lambda s: list_repos(Response(), 100, None, None, s)),
+                ("repos_deep", lambda s: list_repos(Response(), 100, encode_cursor(middle_repo), None, s)),
+                ("metadata_legacy", lambda s: legacy_metadata(s, repo.id)),
+                ("metadata", lambda s: load_file_paths(repo.id)),
+                ("files_prefix", lambda s: list_files(repo.id, Response(), 100, None, "src/mod42/", s)),
+                ("files_deep", lambda s: list_files(repo.id, Response(), 100, encode_cursor(*middle_file), None, s)),
+                ("chunks", lambda s: list_chunks(repo.id, chunked_file, Response(), 100, None, s)),
+            ]
+            print(f"{repos} repos, {files} files, {requests} requests per query, {workers} at a time")
+            asyncio.run(measure(cases, requests, workers))
+    finally:
+        drop_repos(label)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repos", type=int, default=5_000)
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+    run(args.repos, args.files, args.requests, args.workers)
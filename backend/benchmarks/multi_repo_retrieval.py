@@ -0,0 +1,145 @@
+"""
+Vector retrieval across several repos, against repo count and chunk count.
+
+Seeds `--repos` scratch repos, growing each to every size in `--chunks`
+(chunks per repo, random unit embeddings), and for each size queries sets of
+`--sets` repos with perturbed copies of stored embeddings:
+
+  one query  app.utils.retrieval.search_code_chunks over the whole set
+             (File.repo_id IN (...)), as a multi-repo chat runs it
+  per repo   one search_code_chunks per repo in the set, one after another,
+             as asking the same question once per repo did
+  exact      the one query with index scans disabled, as ground truth
+
+and reports p50/p99 latency, the rows the one query returns (k unless the
+repo filter starved it), how often they include the chunk a query was made
+from (hit), their recall@k against exact, and whether the plan of the query
+without search_code_chunks' ef_search scaling uses the HNSW index. Random embeddings have no structure, so beyond the
+source chunk the exact neighbours are all nearly equidistant and recall@k
+is a floor for what real code embeddings get.
+
+    python -m benchmarks.multi_repo_retrieval --repos 12 --chunks 2000 10000 --sets 1 4 12
+"""
+
+import argparse
+import random
+from contextlib import ExitStack
+from typing import List, Tuple
+
+import numpy as np
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app.db import engine
+from app.utils.bulk_writer import BulkWriter
+from app.utils.retrieval import search_code_chunks, vector_query
+from benchmarks.common import EMBEDDING_DIM, percentile, scratch_repo, timer
+
+CHUNKS_PER_FILE = 20
+
+
+def seed(repo_id: int, start: int, count: int, rng: np.random.Generator) -> None:
+    vectors = rng.standard_normal((count, EMBEDDING_DIM), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    with Session(engine) as sess:
+        writer = BulkWriter(sess, repo_id)
+        for offset in range(0, count, CHUNKS_PER_FILE):
+            block = vectors[offset:offset + CHUNKS_PER_FILE]
+            n = start + offset
+            writer.add(
+                f"src/module_{n // CHUNKS_PER_FILE}.py",
+                None,
+                [(i, i + 1, f"def chunk_{n + i}(): pass\n", block[i]) for i in range(len(block))],
+            )
+        writer.flush()
+
+
+def sample_queries(repo_ids: List[int], count: int) -> List[Tuple[int, List[float]]]:
+    """
+    (chunk id, query) for random chunks in the set: the chunk's embedding, slightly perturbed.
+    """
+    with Session(engine) as sess:
+        rows = sess.execute(text(
+            "SELECT c.id, c.embedding::text FROM codechunk c JOIN file f ON f.id = c.file_id "
+            "WHERE f.repo_id = ANY(:ids) ORDER BY random() LIMIT :n"
+        ), {"ids": repo_ids, "n": count}).all()
+    queries = []
+    for chunk_id, row in rows:
+        vec = np.array([float(x) for x in row.strip("[]").split(",")], dtype=np.float32)
+        vec += np.random.standard_normal(EMBEDDING_DIM).astype(np.float32) * 0.002
+        queries.append((chunk_id, (vec / np.linalg.norm(vec)).tolist()))
+    return queries
+
+
+def uses_hnsw(repo_ids: List[int], query: List[float], k: int) -> bool:
+    """
+    Whether the plan of search_code_chunks' query for this set scans an HNSW index.
+    """
+    sql = vector_query(repo_ids, query, k).compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+    with Session(engine) as sess:
+        plan = sess.execute(text(f"EXPLAIN {sql}")).scalars().all()
+    return any("Index Scan using ix_codechunk_embedding_" in line for line in plan)
+
+
+def measure(sets: List[int], repo_ids: List[int], queries: int, k: int, ef_search: int) -> None:
+    for size in sets:
+        ids = repo_ids[:size]
+        qs = sample_queries(ids, queries)
+        one, per_repo, rows, hits, recall = [], [], [], [], []
+        with Session(engine) as sess:
+            for source, q in qs:
+                with timer() as t:
+                    got = search_code_chunks(sess, ids, q, k=k, ef_search=ef_search)
+                one.append(t[0] * 1000)
+                sess.rollback()
+
+                with timer() as t:
+                    for repo_id in ids:
+                        search_code_chunks(sess, repo_id, q, k=k, ef_search=ef_search)
+                per_repo.append(t[0] * 1000)
+                sess.rollback()
+
+                sess.execute(text("SET LOCAL enable_indexscan = off"))
+                exact = search_code_chunks(sess, ids, q, k=k)
+                sess.rollback()
+                rows.append(len(got))
+                hits.append(source in {c.id for c in got})
+                recall.append(len({c.id for c in got} & {c.id for c in exact}) / max(1, len(exact)))
+
+        print(
+            f"{size:>5} {percentile(one, 50):>9.1f} {percentile(one, 99):>9.1f} "
+            f"{percentile(per_repo, 50):>9.1f} {percentile(per_repo, 99):>9.1f} "
+            f"{sum(rows) / len(rows):>5.1f} {sum(hits) / len(hits):>6.2f} {sum(recall) / len(recall):>8.2f} {str(uses_hnsw(ids, qs[0][1], k)):>6}"
+        )
+
+
+def run(repos: int, sizes: List[int], sets: List[int], queries: int, k: int, ef_search: int) -> None:
+    rng = np.random.default_rng(0)
+    random.seed(0)
+    with ExitStack() as stack:
+        repo_ids = [stack.enter_context(scratch_repo("multi-repo")).id for _ in range(repos)]
+        seeded = 0
+        for size in sorted(sizes):
+            for repo_id in repo_ids:
+                seed(repo_id, seeded, size - seeded, rng)
+            seeded = size
+            with engine.connect() as conn:
+                conn.execute(text("ANALYZE codechunk"))
+                conn.execute(text("ANALYZE file"))
+                conn.commit()
+
+            print(f"\n{repos} repos x {size} chunks ({repos * size} chunks), k={k}, ef_search={ef_search}")
+            print(f"{'repos':>5} {'one p50':>9} {'one p99':>9} {'per p50':>9} {'per p99':>9} {'rows':>5} {'hit':>6} {'recall':>8} {'hnsw':>6}   (ms)")
+            measure([s for s in sets if s <= repos], repo_ids, queries, k, ef_search)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repos", type=int, default=12)
+    parser.add_argument("--chunks", type=int, nargs="+", default=[2_000, 10_000], help="chunks per repo")
+    parser.add_argument("--sets", type=int, nargs="+", default=[1, 4, 12], help="repos queried together")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--ef-search", type=int, default=40)
+    args = parser.parse_args()
+    run(args.repos, args.chunks, args.sets, args.queries, args.k, args.ef_search)
@@ -0,0 +1,51 @@
+"""
+Retrieval latency against chunk count.
+
+Seeds a scratch repo with random embeddings in steps and measures
+p50/p99 latency of app.utils.retrieval.search_code_chunks at each size.
+
+    python -m benchmarks.retrieval_latency --sizes 1000 10000 50000 --queries 200
+"""
+
+import argparse
+from typing import List
+
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app.db import engine
+from app.utils.retrieval import search_code_chunks
+from benchmarks.common import percentile, random_embedding, scratch_repo, seed_chunks, timer
+
+
+def run(sizes: List[int], queries: int, k: int, ef_search: int) -> None:
+    print(f"{'chunks':>10} {'p50 ms':>10} {'p99 ms':>10}")
+    with scratch_repo("retrieval") as repo:
+        seeded = 0
+        for size in sorted(sizes):
+            seed_chunks(repo.id, size - seeded)
+            seeded = size
+            with engine.connect() as conn:
+                conn.execute(text("ANALYZE codechunk"))
+                conn.commit()
+
+            samples = []
+            with Session(engine) as sess:
+                for _ in range(queries):
+                    q = random_embedding()
+                    with timer() as t:
+                        search_code_chunks(sess, repo.id, q, k=k, ef_search=ef_search)
+                    samples.append(t[0] * 1000)
+                    sess.rollback()
+
+            print(f"{size:>10} {percentile(samples, 50):>10.2f} {percentile(samples, 99):>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--ef-search", type=int, default=40)
+    args = parser.parse_args()
+    run(args.sizes, args.queries, args.k, args.ef_search)
@@ -0,0 +1,134 @@
+"""
+Retrieval quality and latency: vector, keyword and hybrid search.
+
+Indexes this backend's own app/ package into a scratch repo (chunked with
+app.utils.chunking, written with BulkWriter) and runs the labelled questions in
+benchmarks/data/retrieval_questions.json. A question counts as recalled at k if
+any of its expected files is among the top k results. Reports recall@k and
+p50/p99 latency for:
+
+  vector   app.utils.retrieval.search_code_chunks
+  keyword  app.utils.retrieval.keyword_search
+  hybrid   app.utils.retrieval.hybrid_search (both, fused with RRF)
+
+Embeddings come from the OpenAI API, or from benchmarks/fake_openai.py with
+--fake. Fake embeddings are random, so with --fake only the keyword numbers
+(and the latency of all three) mean anything.
+
+    python -m benchmarks.retrieval_recall --k 3 5 --max-per-file 2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Dict, List
+
+from openai import OpenAI
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.db import engine
+from app.utils.bulk_writer import BulkWriter
+from app.utils.chunking import chunk_file
+from app.utils.embeddings import embed_with_retry
+from app.utils.retrieval import fuse, hybrid_search, keyword_search, search_code_chunks
+from benchmarks.common import percentile, scratch_repo, timer
+from benchmarks.fake_openai import serve
+
+BACKEND = Path(__file__).resolve().parent.parent
+QUESTIONS = Path(__file__).resolve().parent / "data" / "retrieval_questions.json"
+
+
+def embed_all(client: OpenAI, texts: List[str], batch: int = 128) -> List[List[float]]:
+    out: List[List[float]] = []
+    for i in range(0, len(texts), batch):
+        out += embed_with_retry(client, texts[i:i + batch], settings.EMBEDDING_MODEL, max_retries=3)
+    return out
+
+
+def index_backend(client: OpenAI, repo_id: int) -> int:
+    files: Dict[str, list] = {}
+    for path in sorted(BACKEND.glob("app/**/*.py")):
+        rel = path.relative_to(BACKEND).as_posix()
+        with open(path, encoding="utf-8") as f:
+            files[rel] = list(chunk_file(rel, f))
+
+    texts = [c.content for chunks in files.values() for c in chunks]
+    embeddings = iter(embed_all(client, texts))
+    with Session(engine) as sess:
+        writer = BulkWriter(sess, repo_id)
+        for rel, chunks in files.items():
+            writer.add(rel, None, [(c.start_line, c.end_line, c.content, next(embeddings)) for c in chunks])
+        writer.flush()
+        sess.execute(text("ANALYZE codechunk"))
+        sess.commit()
+    return len(texts)
+
+
+def run(ks: List[int], candidates: int, max_per_file: int, fake: bool) -> None:
+    questions = json.loads(QUESTIONS.read_text())
+    top = max(ks)
+
+    with serve(latency=0.0) if fake else nullcontext() as server:
+        client = OpenAI(base_url=server.base_url, api_key="fake") if server else OpenAI()
+        with scratch_repo("retrieval-recall") as repo:
+            n_chunks = index_backend(client, repo.id)
+            query_embeddings = embed_all(client, [q["question"] for q in questions])
+            print(f"{n_chunks} chunks, {len(questions)} questions, {candidates} candidates per query")
+
+            results: Dict[str, List[List[str]]] = {"vector": [], "keyword": [], "hybrid": []}
+            latency: Dict[str, List[float]] = {"vector": [], "keyword": [], "hybrid": []}
+            with Session(engine) as sess:
+                for q, emb in zip(questions, query_embeddings):
+                    with timer() as tv:
+                        vector = search_code_chunks(sess, repo.id, emb, k=candidates)
+                    sess.rollback()
+                    with timer() as tk:
+                        keyword = keyword_search(sess, repo.id, q["question"], candidates)
+                    sess.rollback()
+                    with timer() as tf:
+                        hybrid = fuse([vector, keyword], top, max_per_file, settings.RETRIEVAL_RRF_K)
+
+                    results["vector"].append([c.path for c in vector[:top]])
+                    results["keyword"].append([c.path for c in keyword[:top]])
+                    results["hybrid"].append([c.path for c in hybrid])
+                    latency["vector"].append(tv[0] * 1000)
+                    latency["keyword"].append(tk[0] * 1000)
+                    # run sequentially here; hybrid_search overlaps the two queries
+                    latency["hybrid"].append(max(tv[0], tk[0]) * 1000 + tf[0] * 1000)
+
+            header = " ".join(f"{'recall@' + str(k):>10}" for k in ks)
+            print(f"{'method':<8} {header} {'p50 ms':>8} {'p99 ms':>8}")
+            for method, ranked in results.items():
+                recalls = []
+                for k in ks:
+                    hits = sum(
+                        1 for q, paths in zip(questions, ranked)
+                        if set(q["paths"]) & set(paths[:k])
+                    )
+                    recalls.append(f"{hits / len(questions):>10.2f}")
+                print(
+                    f"{method:<8} {' '.join(recalls)} "
+                    f"{percentile(latency[method], 50):>8.1f} {percentile(latency[method], 99):>8.1f}"
+                )
+
+            # one end-to-end call through the async path the agent uses
+            with timer() as t:
+                asyncio.run(hybrid_search(repo.id, query_embeddings[0], questions[0]["question"]))
+            print(f"hybrid_search, both queries concurrent: {t[0] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--candidates", type=int, default=settings.RETRIEVAL_CANDIDATES, help="results per query before fusion")
+    parser.add_argument("--max-per-file", type=int, default=settings.RETRIEVAL_MAX_PER_FILE)
+    parser.add_argument("--fake", action="store_true", help="embed with a local fake server instead of the OpenAI API")
+    args = parser.parse_args()
+    if not args.fake and not os.environ.get("OPENAI_API_KEY"):
+        parser.error("OPENAI_API_KEY is not set; pass --fake to run offline")
+    run(args.k, args.candidates, args.max_per_file, args.fake)
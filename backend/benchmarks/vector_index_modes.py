@@ -0,0 +1,177 @@
+"""
+Index size, build time, latency and recall of each VECTOR_INDEX_MODE.
+
+Seeds a scratch repo with `--chunks` embeddings of `--dim` dimensions and,
+for each mode in `--modes`, builds its HNSW index with
+app.utils.retrieval.ensure_vector_index, then runs `--queries` searches
+through search_code_chunks at each `--rerank` factor. Reports the index's
+size and build time, p50/p99 latency, and recall@k against an exact scan
+of the full float32 embeddings. The index of each mode is dropped before
+the next is built, so the planner can only use the one under test.
+
+Embeddings are clustered, and their variance falls off across dimensions
+(as in embeddings trained for truncation, like text-embedding-3's), so
+truncation and quantization lose what they would on real vectors rather
+than everything. Queries are fresh draws from the same clusters.
+
+`--dim` defaults to one no production model here uses, so seeding doesn't
+pay for another index's upkeep and every build starts from nothing;
+halfvec and binary need pgvector 0.7 or later and are skipped before that.
+
+    python -m benchmarks.vector_index_modes --chunks 20000 --dim 1024 --rerank 1 4 10
+"""
+
+import argparse
+from typing import List, Tuple
+
+import numpy as np
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.db import engine
+from app.utils.bulk_writer import BulkWriter
+from app.utils.retrieval import VECTOR_INDEX_MODES, ensure_vector_index, index_mode, search_code_chunks, vector_query
+from benchmarks.common import percentile, scratch_repo, timer
+
+CHUNKS_PER_FILE = 20
+# pgvector release that added halfvec and binary_quantize
+MODES_SINCE = {"halfvec": (0, 7), "binary": (0, 7)}
+
+
+def embeddings(count: int, dim: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    `count` unit vectors around `clusters` random centres, with per-dimension
+    scale falling as 1/sqrt(i + 1).
+    """
+    scale = 1 / np.sqrt(np.arange(1, dim + 1, dtype=np.float32))
+    centres = rng.standard_normal((clusters, dim), dtype=np.float32) * scale
+    points = centres[rng.integers(0, clusters, count)]
+    points += rng.standard_normal((count, dim), dtype=np.float32) * scale * 0.6
+    return points / np.linalg.norm(points, axis=1, keepdims=True)
+
+
+def seed(repo_id: int, vectors: np.ndarray) -> None:
+    with Session(engine) as sess:
+        writer = BulkWriter(sess, repo_id)
+        for offset in range(0, len(vectors), CHUNKS_PER_FILE):
+            block = vectors[offset:offset + CHUNKS_PER_FILE]
+            writer.add(
+                f"src/module_{offset // CHUNKS_PER_FILE}.py",
+                None,
+                [(i, i + 1, f"def chunk_{offset + i}(): pass\n", block[i]) for i in range(len(block))],
+            )
+        writer.flush()
+    with engine.connect() as conn:
+        conn.execute(text("ANALYZE codechunk"))
+        conn.execute(text("ANALYZE file"))
+        conn.commit()
+
+
+def pgvector_version() -> Tuple[int, ...]:
+    with engine.connect() as conn:
+        version = conn.execute(text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")).scalar_one()
+    return tuple(int(part) for part in version.split("."))
+
+
+def drop_index(name: str) -> None:
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+
+def index_size(name: str) -> float:
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT pg_relation_size(CAST(:name AS regclass))"), {"name": name}).scalar_one() / 1e6
+
+
+def exact_ids(repo_id: int, queries: List[List[float]], k: int) -> List[set]:
+    out = []
+    with Session(engine) as sess:
+        for q in queries:
+            sess.execute(text("SET LOCAL enable_indexscan = off"))
+            out.append({row.id for row in sess.exec(vector_query(repo_id, q, k, exact=True)).all()})
+            sess.rollback()
+    return out
+
+
+def uses_index(repo_id: int, query: List[float], k: int, name: str) -> bool:
+    sql = vector_query(repo_id, query, k).compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+    with Session(engine) as sess:
+        plan = sess.execute(text(f"EXPLAIN {sql}")).scalars().all()
+    return any(name in line for line in plan)
+
+
+def measure(repo_id: int, queries: List[List[float]], truth: List[set], k: int, ef_search: int) -> Tuple[List[float], float]:
+    latencies, recall = [], []
+    with Session(engine) as sess:
+        for q, expected in zip(queries, truth):
+            with timer() as t:
+                got = search_code_chunks(sess, repo_id, q, k=k, ef_search=ef_search)
+            sess.rollback()
+            latencies.append(t[0] * 1000)
+            recall.append(len({c.id for c in got} & expected) / k)
+    return latencies, sum(recall) / len(recall)
+
+
+def run(chunks: int, dim: int, modes: List[str], truncate: int, reranks: List[int], queries: int, k: int, ef_search: int) -> None:
+    rng = np.random.default_rng(0)
+    clusters = max(1, chunks // 50)
+    data = embeddings(chunks + queries, dim, clusters, rng)
+    query_vectors = [v.tolist() for v in data[chunks:]]
+    version = pgvector_version()
+    settings.VECTOR_INDEX_DIMENSIONS = truncate
+
+    with scratch_repo("vector-modes") as repo:
+        with timer() as t:
+            seed(repo.id, data[:chunks])
+        print(f"{chunks} chunks of {dim} dimensions seeded in {t[0]:.0f}s; pgvector {'.'.join(map(str, version))}")
+        truth = exact_ids(repo.id, query_vectors, k)
+        with Session(engine) as sess:
+            exact_ms = []
+            for q in query_vectors:
+                sess.execute(text("SET LOCAL enable_indexscan = off"))
+                with timer() as t:
+                    sess.exec(vector_query(repo.id, q, k, exact=True)).all()
+                sess.rollback()
+                exact_ms.append(t[0] * 1000)
+        print(f"exact scan: p50 {percentile(exact_ms, 50):.1f} ms, p99 {percentile(exact_ms, 99):.1f} ms")
+        print(f"{'mode':<14} {'index MB':>9} {'build s':>8} {'rerank':>7} {'p50':>8} {'p99':>8} {f'recall@{k}':>10} {'index':>6}   (ms)")
+
+        for mode in modes:
+            if version < MODES_SINCE.get(mode, (0,)):
+                print(f"{mode:<14} needs pgvector {'.'.join(map(str, MODES_SINCE[mode]))}, skipped")
+                continue
+            settings.VECTOR_INDEX_MODE = mode
+            effective = index_mode(dim)
+            label = f"truncated{truncate}" if effective == "truncated" else str(effective)
+            with timer() as t:
+                name = ensure_vector_index(dim)
+            if name is None:
+                print(f"{label:<14} no HNSW index at {dim} dimensions, skipped")
+                continue
+            build, size = t[0], index_size(name)
+            try:
+                for rerank in (reranks if effective != "vector" else [1]):
+                    settings.VECTOR_RERANK_FACTOR = rerank
+                    latencies, recall = measure(repo.id, query_vectors, truth, k, ef_search)
+                    print(
+                        f"{label:<14} {size:>9.1f} {build:>8.1f} {rerank if effective != 'vector' else '-':>7} "
+                        f"{percentile(latencies, 50):>8.1f} {percentile(latencies, 99):>8.1f} {recall:>10.3f} "
+                        f"{str(uses_index(repo.id, query_vectors[0], k, name)):>6}"
+                    )
+            finally:
+                drop_index(name)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=20_000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--modes", nargs="+", choices=sorted(VECTOR_INDEX_MODES), default=["vector", "halfvec", "binary", "truncated"])
+    parser.add_argument("--truncate", type=int, default=256, help="VECTOR_INDEX_DIMENSIONS of the truncated mode")
+    parser.add_argument("--rerank", type=int, nargs="+", default=[1, 4, 10], help="VECTOR_RERANK_FACTORs of the compact modes")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--ef-search", type=int, default=40)
+    args = parser.parse_args()
+    run(args.chunks, args.dim, args.modes, args.truncate, args.rerank, args.queries, args.k, args.ef_search)
@@ -0,0 +1,67 @@
+"""
+Row write throughput: per-object ORM inserts against BulkWriter.
+
+The ORM path mirrors how the indexer used to persist files: session.add per
+chunk, a flush per file and a single commit at the end.
+
+    python -m benchmarks.write_throughput --files 500 --chunks-per-file 20
+"""
+
+import argparse
+import uuid
+from datetime import datetime, timezone
+
+from sqlmodel import Session
+
+from app.db import engine
+from app.models import File, CodeChunk
+from app.utils.bulk_writer import BulkWriter
+from benchmarks.common import random_embedding, scratch_repo, timer
+
+
+def synthetic_files(count: int, chunks_per_file: int):
+    embedding = random_embedding()
+    for _ in range(count):
+        path = f"src/{uuid.uuid4().hex}.py"
+        yield path, [
+            (i * 40 + 1, (i + 1) * 40, f"def f_{i}():\n    return {i}\n" * 20, embedding)
+            for i in range(chunks_per_file)
+        ]
+
+
+def write_orm(repo_id: int, files) -> None:
+    with Session(engine) as sess:
+        for path, chunks in files:
+            f = File(repo_id=repo_id, path=path, indexed_at=datetime.now(timezone.utc))
+            sess.add(f)
+            sess.flush()
+            for start_line, end_line, content, embedding in chunks:
+                sess.add(CodeChunk(file_id=f.id, start_line=start_line, end_line=end_line, content=content, embedding=embedding))
+        sess.commit()
+
+
+def write_bulk(repo_id: int, files) -> None:
+    with Session(engine) as sess:
+        writer = BulkWriter(sess, repo_id)
+        for path, chunks in files:
+            writer.add(path, None, chunks)
+        writer.flush()
+
+
+def run(n_files: int, chunks_per_file: int) -> None:
+    rows = n_files * (chunks_per_file + 1)
+    print(f"{'path':>6} {'rows':>8} {'seconds':>8} {'rows/s':>10}")
+    for name, write in (("orm", write_orm), ("bulk", write_bulk)):
+        with scratch_repo(f"write-{name}") as repo:
+            files = list(synthetic_files(n_files, chunks_per_file))
+            with timer() as t:
+                write(repo.id, files)
+            print(f"{name:>6} {rows:>8} {t[0]:>8.2f} {rows / t[0]:>10.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--chunks-per-file", type=int, default=20)
+    args = parser.parse_args()
+    run(args.files, args.chunks_per_file)
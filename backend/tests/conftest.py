@@ -0,0 +1,4 @@
+import os
+
+# app.core.config requires it; these tests don't connect
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg2://postgres@localhost/postgres")
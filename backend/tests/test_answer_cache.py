@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from app.utils import answer_cache as answer_cache_module
+from app.utils.answer_cache import AnswerCache, normalize_question
+
+VECTORS = {
+    "what does it do": [1.0, 0.0],
+    "what is this project for": [0.96, 0.28],
+    "where is auth handled": [0.0, 1.0],
+}
+
+
+class Embedder:
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, question):
+        self.calls.append(question)
+        return VECTORS[normalize_question(question)]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache_module.time, "time", lambda: now[0])
+    return now
+
+
+def lookup(cache, question, commit="c1", scope="1", embed=None):
+    answer, _ = asyncio.run(cache.lookup(scope, commit, question, embed or Embedder()))
+    return answer.answer if answer else None
+
+
+def put(cache, question, answer, commit="c1", scope="1"):
+    cache.put(scope, commit, question, VECTORS[normalize_question(question)], answer, tokens=10)
+
+
+def test_normalized_questions_hit_without_embedding(clock):
+    cache = AnswerCache(max_entries=10, ttl=60, min_similarity=0.9)
+    put(cache, "What does it do?", "A tool.")
+    embed = Embedder()
+    assert lookup(cache, "  what   DOES it do!", embed=embed) == "A tool."
+    assert embed.calls == []
+    assert cache.stats()["exact_hits"] == 1
+
+
+def test_similar_questions_hit_above_the_threshold(clock):
+    cache = AnswerCache(max_entries=10, ttl=60, min_similarity=0.9)
+    put(cache, "what does it do", "A tool.")
+    assert lookup(cache, "What is this project for?") == "A tool."
+    assert lookup(cache, "Where is auth handled?") is None
+    assert (cache.stats()["semantic_hits"], cache.stats()["saved_tokens"]) == (1, 10)
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = AnswerCache(max_entries=10, ttl=60, min_similarity=0.9)
+    put(cache, "what does it do", "A tool.")
+    clock[0] += 59
+    assert lookup(cache, "what does it do") == "A tool."
+    clock[0] += 2
+    assert lookup(cache, "what does it do") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entries_are_evicted(clock):
+    cache = AnswerCache(max_entries=2, ttl=60, min_similarity=0.99)
+    put(cache, "what does it do", "A tool.")
+    put(cache, "where is auth handled", "In auth.py.")
+    # a hit makes the first entry the most recently used
+    assert lookup(cache, "what does it do") == "A tool."
+    put(cache, "what does it do", "A tool.", scope="2")
+    assert lookup(cache, "where is auth handled") is None
+    assert lookup(cache, "what does it do") == "A tool."
+    assert lookup(cache, "what does it do", scope="2") == "A tool."
+
+
+def test_a_new_commit_drops_the_previous_commits_answers(clock):
+    cache = AnswerCache(max_entries=10, ttl=60, min_similarity=0.9)
+    put(cache, "what does it do", "Old.", commit="c1")
+    put(cache, "what does it do", "Other repo.", scope="2")
+    assert lookup(cache, "what does it do", commit="c2") is None
+    assert cache.stats()["entries"] == 1
+    assert lookup(cache, "what does it do", scope="2") == "Other repo."
+
+
+def test_a_cache_without_entries_stores_nothing(clock):
+    cache = AnswerCache(max_entries=0, ttl=60, min_similarity=0.9)
+    assert not cache.enabled
+    put(cache, "what does it do", "A tool.")
+    assert cache.stats()["entries"] == 0
+
+
+def test_routed_and_forced_answers_of_one_commit_live_side_by_side(clock):
+    # how the chat route scopes them: a forced mode gets a scope of its own
+    cache = AnswerCache(max_entries=10, ttl=60, min_similarity=0.9)
+    put(cache, "what does it do", "Routed.")
+    put(cache, "what does it do", "Forced.", scope="1/full")
+    assert lookup(cache, "what does it do") == "Routed."
+    assert lookup(cache, "what does it do", scope="1/full") == "Forced."
+    assert cache.stats()["entries"] == 2
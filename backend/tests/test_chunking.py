@@ -0,0 +1,70 @@
+import io
+
+from app.utils.chunking import Chunk, chunk_file
+
+
+def chunks(path, text, **kwargs):
+    return list(chunk_file(path, io.StringIO(text), **kwargs))
+
+
+def test_python_definitions_stay_whole_with_their_line_numbers():
+    source = (
+        "import os\n"
+        "\n"
+        "\n"
+        "def a():\n"
+        "    return 1\n"
+        "\n"
+        "\n"
+        "@dec\n"
+        "def b(x):\n"
+        "    if x:\n"
+        "        return 2\n"
+        "    return 3\n"
+    )
+    assert [(c.start_line, c.end_line) for c in chunks("m.py", source, max_tokens=15)] == [(1, 5), (8, 12)]
+
+
+def test_python_that_does_not_parse_splits_at_blank_lines():
+    source = "def a(:\n    pass\n\ndef b(:\n    pass\n"
+    assert chunks("m.py", source, max_tokens=5) == [
+        Chunk(1, 2, "def a(:\n    pass"),
+        Chunk(4, 5, "def b(:\n    pass"),
+    ]
+
+
+def test_braces_in_strings_do_not_end_a_unit():
+    source = 'function a() {\n  return "}";\n}\nconst b = () => {\n  return 2;\n};\n'
+    assert chunks("m.js", source, max_tokens=10) == [
+        Chunk(1, 3, 'function a() {\n  return "}";\n}'),
+        Chunk(4, 6, "const b = () => {\n  return 2;\n};"),
+    ]
+
+
+def test_markdown_cuts_before_headings_outside_code_fences():
+    source = "# A\ntext\n```\n# not a heading\n```\n# B\nmore\n"
+    assert [(c.start_line, c.end_line) for c in chunks("r.md", source, max_tokens=10)] == [(1, 5), (6, 7)]
+
+
+def test_a_line_over_budget_is_sliced():
+    source = "a" * 20 + "\nb\n"
+    assert chunks("x.txt", source, max_tokens=2) == [
+        Chunk(1, 1, "a" * 8),
+        Chunk(1, 1, "a" * 8),
+        Chunk(1, 2, "aaaa\nb"),
+    ]
+
+
+def test_overlap_repeats_the_last_lines_of_the_previous_chunk():
+    source = "a1\na2\na3\na4\na5\n"
+    assert [(c.start_line, c.end_line) for c in chunks("x.txt", source, max_tokens=2, overlap_lines=1)] == [
+        (1, 2), (2, 3), (3, 4), (4, 5),
+    ]
+
+
+def test_every_line_is_covered_in_order():
+    source = "".join(f"line {i}\n" + ("\n" if i % 7 == 0 else "") for i in range(1, 200))
+    result = chunks("x.txt", source, max_tokens=20)
+    assert all(len(c.content) <= 80 for c in result)
+    assert "\n".join(c.content for c in result).split() == source.split()
+    assert all(a.end_line < b.start_line for a, b in zip(result, result[1:]))
@@ -0,0 +1,26 @@
+from app.scripts.indexer import diff_index
+
+
+def test_unchanged_files_are_left_alone():
+    existing = {"a.py": [(1, "sha-a")], "b.py": [(2, "sha-b")]}
+    current = {"a.py": "sha-a", "b.py": "sha-b"}
+    assert diff_index(existing, current) == ([], [])
+
+
+def test_added_changed_and_removed_files():
+    existing = {"same.py": [(1, "sha-same")], "changed.py": [(2, "sha-old")], "removed.py": [(3, "sha-gone")]}
+    current = {"same.py": "sha-same", "changed.py": "sha-new", "added.py": "sha-added"}
+    to_index, stale_ids = diff_index(existing, current)
+    assert to_index == ["changed.py", "added.py"]
+    assert sorted(stale_ids) == [2, 3]
+
+
+def test_duplicate_rows_for_a_path_are_replaced():
+    # e.g. left behind by a run that died between writes
+    existing = {"a.py": [(1, "sha-a"), (2, "sha-a")]}
+    assert diff_index(existing, {"a.py": "sha-a"}) == (["a.py"], [1, 2])
+
+
+def test_rows_without_a_blob_sha_are_reindexed():
+    existing = {"a.py": [(1, None)]}
+    assert diff_index(existing, {"a.py": "sha-a"}) == (["a.py"], [1])
@@ -0,0 +1,100 @@
+import asyncio
+import threading
+from typing import List
+
+import pytest
+
+from app.utils.embedding_providers import LocalEmbeddingProvider
+
+
+class Lengths(LocalEmbeddingProvider):
+    """
+    The local provider's batching around a "model" that embeds a text as its
+    length. Until `gate` is set, it blocks in its first batch.
+    """
+    def __init__(self, batch_size: int = 8, max_wait: float = 0.05):
+        self.name = "local:lengths"
+        self.dimension = 1
+        self.concurrency = 1
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.batches: List[List[str]] = []
+        self.started = threading.Event()
+        self.gate = threading.Event()
+        self._start_batcher()
+
+    def _run(self, texts: List[str]) -> List[List[float]]:
+        self.batches.append(texts)
+        self.started.set()
+        self.gate.wait(5)
+        if "boom" in texts:
+            raise RuntimeError("model failed")
+        return [[float(len(text))] for text in texts]
+
+
+async def busy(provider: Lengths) -> asyncio.Task:
+    """
+    Takes the provider's only inference thread, so later questions queue up.
+    """
+    first = asyncio.create_task(provider.aembed(["a"]))
+    assert await asyncio.to_thread(provider.started.wait, 5)
+    return first
+
+
+def test_questions_that_queue_up_are_embedded_in_one_batch():
+    async def main():
+        provider = Lengths()
+        first = await busy(provider)
+        rest = [asyncio.create_task(provider.aembed([text])) for text in ["bb", "ccc", "dddd"]]
+        await asyncio.sleep(0.01)
+        provider.gate.set()
+        return provider, await asyncio.wait_for(asyncio.gather(first, *rest), 5)
+
+    provider, vectors = asyncio.run(main())
+    assert vectors == [[[1.0]], [[2.0]], [[3.0]], [[4.0]]]
+    assert provider.batches == [["a"], ["bb", "ccc", "dddd"]]
+
+
+def test_batches_are_capped_at_batch_size():
+    provider = Lengths(batch_size=2)
+    provider.gate.set()
+    vectors = asyncio.run(asyncio.wait_for(provider.aembed(["a", "bb", "ccc"]), 5))
+    assert vectors == [[1.0], [2.0], [3.0]]
+    assert provider.batches == [["a", "bb"], ["ccc"]]
+
+
+def test_a_cancelled_question_does_not_fail_the_rest_of_its_batch():
+    async def main():
+        provider = Lengths()
+        first = await busy(provider)
+        kept = asyncio.create_task(provider.aembed(["bb"]))
+        cancelled = asyncio.create_task(provider.aembed(["ccc"]))
+        also_kept = asyncio.create_task(provider.aembed(["dddd"]))
+        await asyncio.sleep(0.01)
+        cancelled.cancel()
+        await asyncio.sleep(0.01)
+        provider.gate.set()
+        vectors = await asyncio.wait_for(asyncio.gather(first, kept, also_kept), 5)
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        return provider, vectors
+
+    provider, vectors = asyncio.run(main())
+    assert vectors == [[[1.0]], [[2.0]], [[4.0]]]
+    # the cancelled text is never embedded
+    assert provider.batches == [["a"], ["bb", "dddd"]]
+
+
+def test_a_failed_batch_fails_each_of_its_callers():
+    async def main():
+        provider = Lengths()
+        first = await busy(provider)
+        boom = asyncio.create_task(provider.aembed(["boom"]))
+        other = asyncio.create_task(provider.aembed(["bb"]))
+        await asyncio.sleep(0.01)
+        provider.gate.set()
+        return await asyncio.wait_for(asyncio.gather(first, boom, other, return_exceptions=True), 5)
+
+    first, boom, other = asyncio.run(main())
+    assert first == [[1.0]]
+    assert isinstance(boom, RuntimeError) and isinstance(other, RuntimeError)
@@ -0,0 +1,95 @@
+"""
+Reading and chunking a file must take about the same peak memory whatever
+its size: the size limits, which would skip these files, are bypassed.
+"""
+
+import functools
+import os
+import tracemalloc
+
+import pytest
+from git import Repo as GitPythonRepo
+
+from app.core.config import settings
+from app.utils.chunking import chunk_file, python_splitter
+from app.utils.file_reader import BoundedLineReader
+from app.utils.git_source import GitSource
+
+SIZES = (1_000_000, 4_000_000)
+# allowed growth of the peak from the smaller file to the larger one
+SLACK = 256 * 1024
+
+
+def write_json(f, size: int) -> None:
+    line = '  {"id": 12345, "name": "fixture row", "tags": ["a", "b", "c"]},\n'
+    f.write("[\n" + line * (size // len(line)) + "]\n")
+
+
+def write_minified(f, size: int) -> None:
+    block = "var a=function(b){return b+1};" * 1024
+    for _ in range(4):
+        f.write(block * (size // 4 // len(block)) + "\n")
+
+
+def write_python(f, size: int) -> None:
+    function = 'def handler_{n}(x, y):\n    """Computes the handler."""\n    value = x + y * {n}\n    return value\n\n\n'
+    written = n = 0
+    while written < size:
+        text = function.format(n=n)
+        f.write(text)
+        written += len(text)
+        n += 1
+
+
+WRITERS = {"fixture.json": write_json, "bundle.js": write_minified, "module.py": write_python}
+
+
+def peak(open_reader, name: str) -> int:
+    tracemalloc.start()
+    try:
+        with open_reader() as f:
+            chunks = sum(1 for _ in chunk_file(name, f))
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert chunks > 0
+    return peak_bytes
+
+
+def write(directory, name: str, size: int) -> str:
+    path = os.path.join(directory, name)
+    with open(path, "w") as f:
+        WRITERS[name](f, size)
+    return path
+
+
+@pytest.mark.parametrize("name", list(WRITERS))
+def test_peak_memory_is_flat_reading_files(tmp_path, name):
+    peaks = [peak(functools.partial(BoundedLineReader, write(tmp_path, name, size)), name) for size in SIZES]
+    assert peaks[1] < peaks[0] + SLACK, peaks
+
+
+@pytest.mark.parametrize("name", list(WRITERS))
+def test_peak_memory_is_flat_streaming_blobs(tmp_path, name):
+    git_repo = GitPythonRepo.init(tmp_path)
+    peaks = []
+    for size in SIZES:
+        write(tmp_path, name, size)
+        git_repo.git.add(name)
+        git_repo.git(c=["user.name=test", "user.email=test@example.com"]).commit("-q", "-m", name)
+        source = GitSource(git_repo, "HEAD", promisor=False)
+        reopen = functools.partial(source.open_blob, git_repo.git.rev_parse(f"HEAD:{name}"))
+        peaks.append(peak(lambda: BoundedLineReader(reopen(), reopen=reopen), name))
+    git_repo.close()
+    assert peaks[1] < peaks[0] + SLACK, peaks
+
+
+def test_python_files_over_the_parse_limit_are_split_at_blank_lines(tmp_path, monkeypatch):
+    path = str(tmp_path / "module.py")
+    with open(path, "w") as f:
+        f.write("def f():\n    x = 1\n\n    return x\n")
+    with BoundedLineReader(path) as f:
+        assert [level for _, level in python_splitter(f)] == [None, 1, None, 0]
+    monkeypatch.setattr(settings, "CHUNK_MAX_PARSE_CHARS", 10)
+    with BoundedLineReader(path) as f:
+        assert [level for _, level in python_splitter(f)] == [None, None, 0, None]
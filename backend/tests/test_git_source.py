@@ -0,0 +1,70 @@
+import git
+import pytest
+
+from app.core.config import settings
+from app.scripts.indexer import chunk_files
+from app.utils.git_source import GitSource, mirror_path
+
+
+@pytest.fixture
+def remote(tmp_path, monkeypatch):
+    """
+    A bare repo served over file:// with partial clone enabled, holding one
+    small file and one over every size limit.
+    """
+    monkeypatch.setattr(settings, "INDEX_MIRROR_DIR", str(tmp_path / "mirrors"))
+    monkeypatch.setattr(settings, "INDEX_MAX_FILE_BYTES", 1_000)
+    monkeypatch.setattr(settings, "INDEX_MAX_DATA_FILE_BYTES", 500)
+    work = tmp_path / "work"
+    repo = git.Repo.init(work)
+    (work / "app.py").write_text("def main():\n    return 1\n")
+    (work / "big.py").write_text("x = 1\n" * 1_000)
+    repo.git.add(A=True)
+    repo.index.commit("fixture")
+    bare = tmp_path / "remote.git"
+    git.Repo.clone_from(str(work), str(bare), bare=True).git.config("uploadpack.allowFilter", "true")
+    blobs = {blob.path: blob.hexsha for blob in repo.head.commit.tree.traverse() if blob.type == "blob"}
+    return f"file://{bare}", blobs
+
+
+def test_the_mirror_leaves_out_blobs_over_the_size_limits(remote):
+    url, blobs = remote
+    source = GitSource.open(1, "o/r", url)
+    assert source.omitted(blobs["big.py"])
+    assert not source.omitted(blobs["app.py"])
+    assert source.size(blobs["big.py"]) is None
+    assert source.size(blobs["app.py"]) == 25
+
+    files = {pending.path: pending for pending in chunk_files(source, blobs)}
+    # skipped for good: it keeps its sha so the next diff counts it unchanged
+    assert files["big.py"].blob_sha == blobs["big.py"]
+    assert files["big.py"].chunks == []
+    assert files["app.py"].chunks
+    # nothing was fetched on demand
+    assert source.omitted(blobs["big.py"])
+    assert blobs["big.py"] not in source.repo.git.cat_file("--batch-all-objects", "--batch-check")
+    source.close()
+
+
+def test_a_mirror_fetched_with_another_filter_is_fetched_again(remote, monkeypatch):
+    url, blobs = remote
+    GitSource.open(1, "o/r", url).close()
+    monkeypatch.setattr(settings, "INDEX_MAX_FILE_BYTES", 10_000)
+    source = GitSource.open(1, "o/r", url)
+    assert source.repo.git.config("remote.origin.partialclonefilter") == "blob:limit=10000"
+    assert not source.omitted(blobs["big.py"])
+    assert source.repo.git_dir == mirror_path(1, "o/r")
+    source.close()
+
+
+def test_an_unreadable_blob_is_recorded_without_its_sha(tmp_path):
+    repo = git.Repo.init(tmp_path)
+    (tmp_path / "app.py").write_text("x = 1\n")
+    repo.git.add(A=True)
+    repo.index.commit("fixture")
+    source = GitSource.open(1, "o/r", str(tmp_path))
+    [pending] = chunk_files(source, {"gone.py": "0" * 40})
+    # so the next run's diff sees it as changed and retries it
+    assert pending.blob_sha is None
+    assert pending.chunks == []
+    source.close()
@@ -0,0 +1,93 @@
+import re
+
+import git
+
+from app.utils.index_rules import IndexRules, glob_to_regex, should_index
+
+
+def matches(pattern, path):
+    return re.fullmatch(glob_to_regex(pattern), path) is not None
+
+
+def test_patterns_without_a_slash_match_at_any_depth():
+    assert matches("*.log", "debug.log")
+    assert matches("*.log", "a/b/debug.log")
+    assert not matches("*.log", "debug.log.txt")
+
+
+def test_patterns_with_a_slash_are_anchored_to_the_root():
+    assert matches("docs/*.md", "docs/index.md")
+    assert not matches("docs/*.md", "src/docs/index.md")
+    assert matches("/build", "build")
+    assert not matches("/build", "src/build")
+
+
+def test_star_does_not_cross_directories_but_double_star_does():
+    assert not matches("src/*.py", "src/pkg/mod.py")
+    assert matches("src/**/*.py", "src/mod.py")
+    assert matches("src/**/*.py", "src/pkg/sub/mod.py")
+    assert matches("**/fixtures", "a/b/fixtures")
+    assert matches("vendor/**", "vendor/x/y.go")
+
+
+def test_a_trailing_slash_only_matches_directories():
+    # directories are matched with a trailing slash
+    assert matches("logs/", "a/logs/")
+    assert not matches("logs/", "a/logs")
+
+
+def test_character_classes_and_escapes():
+    assert matches("file[0-9].py", "file7.py")
+    assert not matches("file[!0-9].py", "file7.py")
+    assert matches(r"\#notes.md", "#notes.md")
+
+
+def test_default_rules():
+    assert should_index("src/app.py")
+    assert should_index("Dockerfile")
+    assert should_index(".github/workflows/ci.yml")
+    assert not should_index("assets/logo.png")
+    assert not should_index("web/node_modules/react/index.js")
+    assert not should_index("static/app.min.js")
+    assert not should_index("poetry.lock")
+
+
+def test_the_last_matching_pattern_wins():
+    rules = IndexRules(repo_rules="*.md\n!docs/*.md\n")
+    assert not rules.should_index("README.md")
+    assert rules.should_index("docs/guide.md")
+
+
+def test_repo_rules_can_force_include_but_gitignore_negation_cannot():
+    assert IndexRules(repo_rules="!data/*.csv").should_index("data/table.csv")
+    assert not IndexRules(gitignore="!data/*.csv").should_index("data/table.csv")
+    # re-including a default exclude
+    assert IndexRules(repo_rules="!vendor/").should_index("vendor/lib/x.go")
+
+
+def test_nothing_under_an_excluded_directory_is_reincluded():
+    rules = IndexRules(gitignore="generated/\n", repo_rules="!generated/keep.py\n")
+    assert rules.excluded_dir("generated")
+    assert rules.excluded_dir("generated/deep")
+    assert not rules.should_index("generated/keep.py")
+
+
+def test_indexable_blobs_prunes_excluded_trees(tmp_path):
+    repo = git.Repo.init(tmp_path)
+    for path, text in {
+        ".gitignore": "tmp/\n",
+        ".frzndocsignore": "!notes.csv\n",
+        "src/app.py": "x = 1\n",
+        "notes.csv": "a,b\n",
+        "logo.png": "png",
+        "tmp/scratch.py": "y = 2\n",
+        "node_modules/pkg/index.js": "z\n",
+    }.items():
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text(text)
+    repo.git.add(A=True, force=True)
+    repo.index.commit("fixture")
+
+    tree = repo.head.commit.tree
+    paths = sorted(blob.path for blob in IndexRules.from_tree(tree).indexable_blobs(tree))
+    assert paths == ["notes.csv", "src/app.py"]
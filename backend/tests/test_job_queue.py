@@ -0,0 +1,130 @@
+import os
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, SQLModel
+
+from app.models import IndexJob, IndexStatus, JobStatus, Repo
+from app.utils import job_queue
+from app.utils.job_queue import claim_job, complete_job, enqueue_index_job, fail_job, heartbeat
+
+
+@pytest.fixture
+def db_session():
+    """
+    A session on TEST_DATABASE_URL, a scratch Postgres database. The tables and
+    everything written, commits included, are rolled back afterwards.
+    """
+    url = os.environ.get("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    engine = create_engine(url)
+    try:
+        with engine.connect() as conn:
+            outer = conn.begin()
+            SQLModel.metadata.create_all(conn, tables=[Repo.__table__, IndexJob.__table__])
+            # the queue's commits release savepoints inside `outer`
+            with Session(bind=conn, join_transaction_mode="create_savepoint") as session:
+                yield session
+            outer.rollback()
+    finally:
+        engine.dispose()
+
+
+@pytest.fixture
+def repo(db_session):
+    repo = Repo(owner="octo", name="demo", full_name="octo/demo", default_branch="main")
+    db_session.add(repo)
+    db_session.commit()
+    return repo
+
+
+def enqueue(session, repo_id, max_attempts=3):
+    job = enqueue_index_job(session, repo_id)
+    job.max_attempts = max_attempts
+    session.commit()
+    return job.id
+
+
+def make_stale(session, job_id):
+    job = session.get(IndexJob, job_id)
+    job.heartbeat_at = job_queue._now() - timedelta(hours=1)
+    session.add(job)
+    session.commit()
+
+
+def test_claim_takes_a_queued_job_once(db_session, repo):
+    job_id = enqueue(db_session, repo.id)
+    job = claim_job(db_session, "w1")
+    assert (job.id, job.status, job.attempts, job.locked_by) == (job_id, JobStatus.running, 1, "w1")
+    # a live heartbeat keeps it from other workers
+    assert claim_job(db_session, "w2") is None
+
+
+def test_heartbeat_only_from_the_owner(db_session, repo):
+    enqueue(db_session, repo.id)
+    job = claim_job(db_session, "w1")
+    assert heartbeat(db_session, job.id, "w1")
+    assert not heartbeat(db_session, job.id, "w2")
+
+
+def test_a_stale_job_is_reclaimed_and_the_old_owner_locked_out(db_session, repo):
+    job_id = enqueue(db_session, repo.id)
+    claim_job(db_session, "w1")
+    make_stale(db_session, job_id)
+
+    job = claim_job(db_session, "w2")
+    assert (job.id, job.attempts, job.locked_by) == (job_id, 2, "w2")
+    assert not heartbeat(db_session, job_id, "w1")
+    assert not complete_job(db_session, job_id, "w1")
+    assert not fail_job(db_session, job_id, "w1", "late")
+    db_session.refresh(job)
+    assert (job.status, job.locked_by) == (JobStatus.running, "w2")
+
+    assert complete_job(db_session, job_id, "w2")
+    db_session.refresh(job)
+    assert (job.status, job.locked_by) == (JobStatus.done, None)
+
+
+def test_failures_requeue_until_the_last_attempt(db_session, repo):
+    job_id = enqueue(db_session, repo.id, max_attempts=2)
+    claim_job(db_session, "w1")
+    assert fail_job(db_session, job_id, "w1", "RuntimeError: first")
+    job = db_session.get(IndexJob, job_id)
+    db_session.refresh(repo)
+    assert (job.status, job.last_error, repo.index_status) == (JobStatus.queued, "RuntimeError: first", IndexStatus.pending)
+
+    claim_job(db_session, "w1")
+    assert fail_job(db_session, job_id, "w1", "RuntimeError: second")
+    db_session.refresh(job)
+    db_session.refresh(repo)
+    assert (job.status, job.attempts, repo.index_status) == (JobStatus.failed, 2, IndexStatus.error)
+    assert claim_job(db_session, "w1") is None
+
+
+def test_a_stale_job_on_its_last_attempt_is_failed_not_retried(db_session, repo):
+    job_id = enqueue(db_session, repo.id, max_attempts=1)
+    claim_job(db_session, "w1")
+    make_stale(db_session, job_id)
+
+    assert claim_job(db_session, "w2") is None
+    job = db_session.get(IndexJob, job_id)
+    db_session.refresh(job)
+    db_session.refresh(repo)
+    assert (job.status, job.last_error, repo.index_status) == (
+        JobStatus.failed, "worker stopped heartbeating", IndexStatus.error,
+    )
+
+
+def test_one_active_job_per_repo(db_session, repo):
+    job_id = enqueue(db_session, repo.id)
+    with pytest.raises(IntegrityError):
+        enqueue(db_session, repo.id)
+    db_session.rollback()
+
+    claim_job(db_session, "w1")
+    complete_job(db_session, job_id, "w1")
+    # finished jobs don't count
+    enqueue(db_session, repo.id)
@@ -0,0 +1,135 @@
+import urllib.request
+
+import pytest
+
+from app.utils import metrics
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """
+    Records metrics into a registry of their own, with metrics enabled.
+    """
+    monkeypatch.setattr(metrics, "enabled", True)
+    monkeypatch.setattr(metrics, "_registry", [])
+    return metrics._registry
+
+
+def test_counter_exposition(registry):
+    counter = metrics.Counter("test_requests", "Requests served.", ["route", "outcome"])
+    counter.inc(route="/a", outcome="ok")
+    counter.inc(2, route="/a", outcome="ok")
+    counter.inc(0.5, route='/b "quoted"\\', outcome="error")
+    assert counter.render().splitlines() == [
+        "# HELP test_requests Requests served.",
+        "# TYPE test_requests counter",
+        'test_requests_total{route="/a",outcome="ok"} 3',
+        'test_requests_total{route="/b \\"quoted\\"\\\\",outcome="error"} 0.5',
+    ]
+
+
+def test_counter_without_labels(registry):
+    counter = metrics.Counter("test_chunks", "Chunks written.")
+    counter.inc(4)
+    assert counter.samples() == ["test_chunks_total 4"]
+
+
+def test_histogram_buckets_are_cumulative_and_inclusive(registry):
+    histogram = metrics.Histogram("test_seconds", "Latency.", ["outcome"], buckets=(1, 0.1, 0.5))
+    # a value on a bound falls in that bound's bucket (le means <=)
+    for value in (0.05, 0.1, 0.3, 0.5, 2):
+        histogram.observe(value, outcome="ok")
+    assert histogram.render().splitlines() == [
+        "# HELP test_seconds Latency.",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{outcome="ok",le="0.1"} 2',
+        'test_seconds_bucket{outcome="ok",le="0.5"} 4',
+        'test_seconds_bucket{outcome="ok",le="1"} 4',
+        'test_seconds_bucket{outcome="ok",le="+Inf"} 5',
+        'test_seconds_sum{outcome="ok"} 2.95',
+        'test_seconds_count{outcome="ok"} 5',
+    ]
+
+
+def test_render_skips_metrics_without_samples(registry):
+    used = metrics.Counter("test_used", "Used.")
+    metrics.Histogram("test_unused", "Never observed.")
+    used.inc()
+    assert metrics.render() == "# HELP test_used Used.\n# TYPE test_used counter\ntest_used_total 1\n"
+
+
+def test_nothing_is_recorded_when_disabled(registry, monkeypatch):
+    monkeypatch.setattr(metrics, "enabled", False)
+    counter = metrics.Counter("test_off", "Off.")
+    histogram = metrics.Histogram("test_off_seconds", "Off.", ["outcome"])
+    counter.inc()
+    histogram.observe(1, outcome="ok")
+    with metrics.timer(histogram):
+        pass
+    assert counter.samples() == histogram.samples() == []
+
+
+def test_timer_labels_the_outcome(registry):
+    histogram = metrics.Histogram("test_phase_seconds", "Phase.", ["phase", "outcome"])
+    with metrics.timer(histogram, phase="diff"):
+        pass
+    with pytest.raises(TimeoutError):
+        with metrics.timer(histogram, phase="diff"):
+            raise TimeoutError
+    counts = [line for line in histogram.samples() if line.startswith("test_phase_seconds_count")]
+    assert counts == [
+        'test_phase_seconds_count{phase="diff",outcome="ok"} 1',
+        'test_phase_seconds_count{phase="diff",outcome="timeout"} 1',
+    ]
+
+
+def test_histogram_label_sets_and_values_past_the_last_bucket(registry):
+    histogram = metrics.Histogram("test_tokens", "Tokens.", ["node"], buckets=(0.25, 2.5))
+    histogram.observe(10, node="b")
+    histogram.observe(0.25, node="a")
+    assert histogram.samples() == [
+        'test_tokens_bucket{node="a",le="0.25"} 1',
+        'test_tokens_bucket{node="a",le="2.5"} 1',
+        'test_tokens_bucket{node="a",le="+Inf"} 1',
+        'test_tokens_sum{node="a"} 0.25',
+        'test_tokens_count{node="a"} 1',
+        'test_tokens_bucket{node="b",le="0.25"} 0',
+        'test_tokens_bucket{node="b",le="2.5"} 0',
+        'test_tokens_bucket{node="b",le="+Inf"} 1',
+        'test_tokens_sum{node="b"} 10',
+        'test_tokens_count{node="b"} 1',
+    ]
+
+
+def test_llm_calls_record_tokens_and_cost_of_dated_snapshots(registry, monkeypatch):
+    monkeypatch.setattr(metrics.settings, "MODEL_PRICES", {"test-model": [2.0, 8.0], "test-model-mini": [0.5, 1.0]})
+    # empty copies of the metrics record_llm writes to
+    for name in ("LLM_SECONDS", "LLM_TOKENS", "COST"):
+        metric = getattr(metrics, name)
+        monkeypatch.setattr(metrics, name, type(metric)(metric.name, metric.documentation, metric.labels))
+    metrics.record_llm("aggregate", "test-model-2025-04-14", 1.0, "ok", 1_000, 500)
+    metrics.record_llm("router", "test-model-mini", 1.0, "ok", 1_000_000, 0)
+    assert metrics.LLM_TOKENS.samples() == [
+        'frzn_llm_tokens_total{caller="aggregate",model="test-model-2025-04-14",kind="input"} 1000',
+        'frzn_llm_tokens_total{caller="aggregate",model="test-model-2025-04-14",kind="output"} 500',
+        'frzn_llm_tokens_total{caller="router",model="test-model-mini",kind="input"} 1000000',
+        'frzn_llm_tokens_total{caller="router",model="test-model-mini",kind="output"} 0',
+    ]
+    # the longest matching price applies: $2 + $4 per million, then $0.50 per million
+    assert metrics.COST.samples() == [
+        'frzn_openai_cost_usd_total{caller="aggregate",model="test-model-2025-04-14"} 0.006',
+        'frzn_openai_cost_usd_total{caller="router",model="test-model-mini"} 0.5',
+    ]
+
+
+def test_serve_exposes_the_registry(registry):
+    counter = metrics.Counter("test_served", "Served.")
+    counter.inc()
+    server = metrics.serve(0)
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/metrics") as resp:
+            assert resp.headers["Content-Type"] == metrics.CONTENT_TYPE
+            assert resp.read().decode() == metrics.render()
+    finally:
+        server.shutdown()
+        server.server_close()
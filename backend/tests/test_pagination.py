@@ -0,0 +1,47 @@
+import pytest
+from fastapi import HTTPException, Response
+
+from app.api.routers.repos import _after, _page
+from app.utils.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+
+
+def test_cursors_round_trip():
+    cursor = encode_cursor("src/main.py", 42)
+    assert "=" not in cursor
+    assert decode_cursor(cursor, (str, int)) == ("src/main.py", 42)
+    assert decode_cursor(encode_cursor("ünïcode/päth", 1), (str, int)) == ("ünïcode/päth", 1)
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    encode_cursor(1),               # too few values
+    encode_cursor(1, 2, 3),         # too many
+    encode_cursor("1", 2),          # wrong type
+    encode_cursor(True, 2),         # bools aren't ints
+])
+def test_bad_cursors_are_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, (int, int))
+
+
+def test_a_bad_cursor_is_a_400():
+    with pytest.raises(HTTPException) as e:
+        _after("garbage", (int,))
+    assert e.value.status_code == 400
+    assert _after(None, (int,)) is None
+
+
+def test_a_full_page_has_no_next_cursor():
+    response = Response()
+    assert _page(response, [1, 2, 3], 3, lambda r: (r,)) == [1, 2, 3]
+    assert NEXT_CURSOR_HEADER not in response.headers
+
+
+def test_the_extra_row_is_dropped_and_the_cursor_points_at_the_last_kept_row():
+    response = Response()
+    rows = [(1, 10), (1, 11), (2, 12), (3, 13)]
+    assert _page(response, rows, 3, lambda r: r) == rows[:3]
+    # the next page starts after (2, 12): the row left out comes first
+    after = decode_cursor(response.headers[NEXT_CURSOR_HEADER], (int, int))
+    assert after == (2, 12)
+    assert [r for r in rows if r > after] == [(3, 13)]
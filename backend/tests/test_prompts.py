@@ -0,0 +1,78 @@
+import pytest
+
+from app.utils import tokens
+from app.utils.prompts import fit_sections, pack_context, render_chunks
+from app.utils.retrieval import RetrievedChunk
+from app.utils.tokens import count_tokens
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    # 4 characters a token, with no tokenizer files to download
+    monkeypatch.setattr(tokens, "_encoding", lambda: None)
+
+
+def chunk(chunk_id, file_id, start, end, content):
+    return RetrievedChunk(chunk_id, file_id, f"f{file_id}.py", start, end, content, 1)
+
+
+A = chunk(1, 1, 1, 2, "def a():\n    return 1")
+B = chunk(2, 1, 3, 4, "def b():\n    return 2")
+C = chunk(3, 2, 10, 10, "x = 1")
+
+
+def test_adjacent_and_overlapping_chunks_of_a_file_merge():
+    overlapping = chunk(4, 1, 2, 3, "    return 1\ndef b():")
+    assert render_chunks([B, C, overlapping, A]) == (
+        "# f1.py:1-4\ndef a():\n    return 1\ndef b():\n    return 2\n\n# f2.py:10-10\nx = 1"
+    )
+
+
+def test_the_budget_is_inclusive():
+    both = count_tokens(render_chunks([A, B]))
+    assert pack_context([A, B], both) == render_chunks([A, B])
+    assert pack_context([A, B], both - 1) == render_chunks([A])
+
+
+def test_a_chunk_that_does_not_fit_makes_way_for_a_smaller_one():
+    big = chunk(5, 3, 1, 1, "y" * 400)
+    budget = count_tokens(render_chunks([A, C]))
+    assert pack_context([A, big, C], budget) == render_chunks([A, C])
+
+
+def test_duplicate_content_is_packed_once():
+    copy = chunk(6, 4, 1, 2, "def a():\n  return 1")
+    assert pack_context([A, copy, C], 1_000) == render_chunks([A, C])
+
+
+def test_the_best_chunk_is_truncated_when_nothing_fits():
+    context = pack_context([A, C], 3)
+    assert context == render_chunks([A])[:12]
+    assert pack_context([], 3) == ""
+
+
+def test_sections_within_budget_are_untouched():
+    sections = ["a" * 40, "b" * 40]
+    assert fit_sections(sections, 20) == sections
+
+
+def test_small_sections_stay_whole_and_leave_their_share_to_the_rest():
+    # 10, 100 and 1000 tokens into 100: 10 whole, then 45 each
+    small, medium, large = fit_sections(["x" * 40, "y" * 400, "z" * 4_000], 100)
+    assert small == "x" * 40
+    assert (len(medium), len(large)) == (180, 180)
+    assert fit_sections(["x" * 40, "y" * 400], 0) == ["", ""]
+
+
+def test_counts_fall_back_to_estimates_without_a_tokenizer(monkeypatch, capsys):
+    def unavailable(*args, **kwargs):
+        raise OSError("no network")
+
+    monkeypatch.undo()
+    monkeypatch.setattr(tokens.tiktoken, "encoding_for_model", unavailable)
+    tokens._encoding.cache_clear()
+    try:
+        assert count_tokens("abcdefgh") == 2
+        assert "Tokenizer unavailable (OSError)" in capsys.readouterr().out
+    finally:
+        tokens._encoding.cache_clear()
@@ -0,0 +1,52 @@
+import pytest
+
+from app.utils.question_router import classify_question, parse_plan
+
+
+@pytest.mark.parametrize("question", [
+    "What does this repo do?",
+    "what is this project for",
+    "Can you give me a high-level overview of the codebase?",
+    "Summarize this library.",
+    "What's the project's purpose?",
+])
+def test_overview_questions_get_the_summary_plan(question):
+    assert classify_question(question) == "summary"
+
+
+@pytest.mark.parametrize("question", [
+    "Where is parse_config defined?",
+    "where's `settings.py`?",
+    "Which file registers the /api/chat route?",
+    "Find the retry decorator",
+    "What is the default of CHAT_CACHE_TTL?",
+])
+def test_lookups_get_the_direct_plan(question):
+    assert classify_question(question) == "direct"
+
+
+@pytest.mark.parametrize("question", [
+    "How does indexing work?",
+    "Where and why is embed_question called?",
+    "Explain the architecture of this project",
+    "Which file has the bug that makes uploads fail?",
+])
+def test_reasoning_words_win_and_get_the_full_plan(question):
+    assert classify_question(question) == "full"
+
+
+@pytest.mark.parametrize("question", [
+    "",
+    "   ",
+    "tokens.py",
+    "Where is " + " ".join(["the"] * 20) + " handler defined?",
+])
+def test_questions_no_rule_is_confident_about_are_left_to_the_router_model(question):
+    assert classify_question(question) is None
+
+
+def test_parse_plan_reads_the_first_word_of_the_reply():
+    assert parse_plan("Direct.") == "direct"
+    assert parse_plan("  summary - it asks for an overview") == "summary"
+    assert parse_plan("I think full") is None
+    assert parse_plan("") is None
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from app.agents import agent
+
+
+class FakeLLM:
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, messages):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return AIMessage(content="An overview.")
+
+
+@pytest.fixture
+def stored(monkeypatch):
+    """
+    Summaries stored per repo; repo 1 is indexed at commit "c1" without one.
+    """
+    summaries = {}
+    llm = FakeLLM()
+
+    async def load_summary(repo_id):
+        return "c1", summaries.get((repo_id, "c1"))
+
+    async def store_summary(repo_id, commit, summary):
+        summaries[(repo_id, commit)] = summary
+
+    monkeypatch.setattr(agent, "load_summary", load_summary)
+    monkeypatch.setattr(agent, "store_summary", store_summary)
+    monkeypatch.setattr(agent, "get_llm", lambda: llm)
+    return summaries, llm
+
+
+def test_concurrent_chats_generate_a_missing_summary_once(stored, monkeypatch):
+    summaries, llm = stored
+
+    async def load_summary_source(repo_id):
+        return "# README.md\nA demo."
+
+    monkeypatch.setattr(agent, "load_summary_source", load_summary_source)
+
+    async def chats():
+        return await asyncio.gather(*(agent.repo_summary(1) for _ in range(5)))
+
+    assert asyncio.run(chats()) == ["An overview."] * 5
+    assert llm.calls == 1
+    assert summaries == {(1, "c1"): "An overview."}
+
+
+def test_no_summary_is_generated_without_source(stored, monkeypatch):
+    summaries, llm = stored
+
+    async def load_summary_source(repo_id):
+        return ""
+
+    monkeypatch.setattr(agent, "load_summary_source", load_summary_source)
+    assert asyncio.run(agent.repo_summary(1)) is None
+    assert llm.calls == 0
+    assert summaries == {}
@@ -0,0 +1,52 @@
+from app.utils.retrieval import RetrievedChunk, fuse, keyword_terms, literal_needle
+
+
+def chunk(chunk_id, file_id=None, repo_id=1):
+    return RetrievedChunk(chunk_id, file_id if file_id is not None else chunk_id, f"f{chunk_id}.py", 1, 2, "", repo_id)
+
+
+def ids(chunks):
+    return [c.id for c in chunks]
+
+
+def test_chunks_found_by_both_rankings_come_first():
+    vector = [chunk(1), chunk(2), chunk(3)]
+    keyword = [chunk(4), chunk(3), chunk(5)]
+    # 3: 1/63 + 1/62 beats 1 and 4, each 1/61 from one ranking
+    assert ids(fuse([vector, keyword], k=5, max_per_file=5)) == [3, 1, 4, 2, 5]
+
+
+def test_ties_keep_the_first_ranking_first():
+    assert ids(fuse([[chunk(1)], [chunk(2)]], k=2, max_per_file=1)) == [1, 2]
+
+
+def test_at_most_k_and_max_per_file():
+    ranking = [chunk(1, file_id=10), chunk(2, file_id=10), chunk(3, file_id=10), chunk(4, file_id=20), chunk(5)]
+    assert ids(fuse([ranking], k=3, max_per_file=2)) == [1, 2, 4]
+
+
+def test_rrf_k_flattens_rank_differences():
+    vector = [chunk(1), chunk(2)]
+    keyword = [chunk(3), chunk(2), chunk(4), chunk(1)]
+    # 1 wins on its one first place when rank gaps weigh a lot, 2 on its two second places otherwise
+    assert ids(fuse([vector, keyword], k=1, max_per_file=1, rrf_k=0)) == [1]
+    assert ids(fuse([vector, keyword], k=1, max_per_file=1, rrf_k=60)) == [2]
+
+
+def test_max_per_repo_leaves_room_for_other_repos_then_fills_up():
+    ranking = [chunk(1, repo_id=1), chunk(2, repo_id=1), chunk(3, repo_id=1), chunk(4, repo_id=2)]
+    assert ids(fuse([ranking], k=3, max_per_file=1, max_per_repo=2)) == [1, 2, 4]
+    # no other repo's chunks left: the passed-over ones fill the free places
+    assert ids(fuse([ranking[:3]], k=3, max_per_file=1, max_per_repo=2)) == [1, 2, 3]
+
+
+def test_keyword_terms():
+    assert keyword_terms("How does the parse_config() function handle YAML? yaml!") == [
+        "parse", "config", "function", "handle", "yaml",
+    ]
+
+
+def test_literal_needle_prefers_quoted_text_and_identifiers():
+    assert literal_needle("Where is `retry after` set?") == "retry after"
+    assert literal_needle("What calls app.utils.retrieval.fuse or getUser?") == "app.utils.retrieval.fuse"
+    assert literal_needle("how does indexing work") is None
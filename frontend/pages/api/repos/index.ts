@@ -3,6 +3,8 @@
 import type { NextApiRequest, NextApiResponse } from 'next';
 
 const BACKEND_URL = process.env.BACKEND_URL || 'http://localhost:8000';
+// the backend's largest page (LIST_MAX_PAGE_SIZE)
+const PAGE_SIZE = 1000;
 
 export default async function handler(
     req: NextApiRequest,
@@ -10,20 +12,30 @@ export default async function handler(
 ) {
     if (req.method === 'GET') {
         try {
-            const response = await fetch(`${BACKEND_URL}/api/repos`, {
-                method: 'GET',
-                headers: { 'Content-Type': 'application/json' },
-            });
+            // The backend pages GET /api/repos; follow X-Next-Cursor so the
+            // repo list isn't cut at the first page
+            const repos: unknown[] = [];
+            let cursor: string | null = null;
+            do {
+                const params = new URLSearchParams({ limit: String(PAGE_SIZE) });
+                if (cursor) params.set('cursor', cursor);
+                const response = await fetch(`${BACKEND_URL}/api/repos?${params}`, {
+                    method: 'GET',
+                    headers: { 'Content-Type': 'application/json' },
+                });
 
-            if (!response.ok) {
-                const text = await response.text();
-                return res
-                    .status(response.status)
-                    .json({ error: text || 'Backend error' });
-            }
+                if (!response.ok) {
+                    const text = await response.text();
+                    return res
+                        .status(response.status)
+                        .json({ error: text || 'Backend error' });
+                }
 
-            const data = await response.json();
-            return res.status(200).json(data);
+                repos.push(...(await response.json()));
+                cursor = response.headers.get('X-Next-Cursor');
+            } while (cursor);
+
+            return res.status(200).json(repos);
 
         } catch (err: any) {
             console.error('Error fetching /repos:', err);